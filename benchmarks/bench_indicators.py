@@ -0,0 +1,271 @@
+"""
+指标计算微基准：对比新旧实现的耗时，并校验结果一致。
+
+用法：python benchmarks/bench_indicators.py [--bars 730 5000 50000] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+fetcher = importlib.import_module("获取数据")
+indicator_engine = importlib.import_module("indicator_engine")
+
+
+def synthetic_ohlcv(bars: int, seed: int = 7, freq: str = "D") -> pd.DataFrame:
+    """
+    生成带少量平盘（并列值）的随机游走日线，列与 fetch_daily_ohlcv 返回值一致。
+    日频索引最多约 9 万根（pandas 时间戳上限为 2262 年），更大规模可改用 freq="h"。
+    """
+    rng = np.random.default_rng(seed)
+    close = np.round(2000 * np.exp(np.cumsum(rng.normal(0, 0.03, bars))), 2)
+    flat = rng.random(bars) < 0.05
+    close[1:][flat[1:]] = close[:-1][flat[1:]]
+    spread = rng.uniform(0.0, 0.03, (2, bars))
+    index = pd.date_range("2015-01-01", periods=bars, freq=freq, tz="Asia/Shanghai")
+    return pd.DataFrame(
+        {
+            "open": close,
+            "high": close * (1 + spread[0]),
+            "low": close * (1 - spread[1]),
+            "close": close,
+            "volume": rng.uniform(1e5, 3e5, bars),
+        },
+        index=index,
+    )
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def legacy_price_percentile(close: pd.Series, window: int = 20) -> pd.Series:
+    """原 add_price_percentile 的逐窗口 pandas apply 实现，仅作基准对照。"""
+    return close.rolling(window=window, min_periods=window).apply(
+        lambda x: pd.Series(x).rank(pct=True).iloc[-1],
+        raw=False,
+    )
+
+
+def bench_price_percentile(bars: int, repeat: int, window: int = 20) -> Dict[str, Any]:
+    close = synthetic_ohlcv(bars)["close"]
+    legacy = legacy_price_percentile(close, window).to_numpy()
+    kernel = fetcher.rolling_rank_pct(close.to_numpy(), window)
+    if not np.array_equal(legacy, kernel, equal_nan=True):
+        raise AssertionError("rolling_rank_pct 与原实现结果不一致")
+    legacy_s = best_of(lambda: legacy_price_percentile(close, window), repeat)
+    kernel_s = best_of(lambda: fetcher.rolling_rank_pct(close.to_numpy(), window), repeat)
+    return {
+        "name": f"price_percentile_{window}",
+        "bars": bars,
+        "legacy_s": legacy_s,
+        "new_s": kernel_s,
+    }
+
+
+def legacy_dmi(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
+    """原 add_dmi_indicators 的实现，仅作基准对照。"""
+    high = df["high"]
+    low = df["low"]
+    close = df["close"]
+
+    up_move = high.diff()
+    down_move = -low.diff()
+    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    tr = pd.concat(
+        [high - low, (high - close.shift(1)).abs(), (low - close.shift(1)).abs()], axis=1
+    ).max(axis=1)
+    atr = pd.Series(tr, index=df.index).ewm(alpha=1 / period, adjust=False).mean()
+    plus_smoothed = pd.Series(plus_dm, index=df.index).ewm(alpha=1 / period, adjust=False).mean()
+    minus_smoothed = pd.Series(minus_dm, index=df.index).ewm(alpha=1 / period, adjust=False).mean()
+    atr_safe = atr.replace(0, np.nan)
+    plus_di = 100 * plus_smoothed / atr_safe
+    minus_di = 100 * minus_smoothed / atr_safe
+    dm_sum = (plus_di + minus_di).replace(0, np.nan)
+    dx = 100 * (plus_di - minus_di).abs() / dm_sum
+    adx = dx.ewm(alpha=1 / period, adjust=False).mean()
+    plus_di.iloc[:period] = np.nan
+    minus_di.iloc[:period] = np.nan
+    adx.iloc[: period * 2] = np.nan
+    return pd.DataFrame({"+di": plus_di, "-di": minus_di, "adx": adx})
+
+
+def legacy_atr(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
+    """原 add_atr_indicator 的实现，仅作基准对照。"""
+    high = df["high"]
+    low = df["low"]
+    close = df["close"]
+    prev_close = close.shift(1)
+    tr = pd.concat(
+        [(high - low).abs(), (high - prev_close).abs(), (low - prev_close).abs()], axis=1
+    ).max(axis=1)
+    atr = tr.ewm(alpha=1 / period, adjust=False).mean()
+    return pd.DataFrame(
+        {
+            f"atr_{period}": atr,
+            f"atr_pct_{period}": (atr / close.replace(0, np.nan)) * 100,
+        }
+    )
+
+
+def legacy_dmi_atr(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
+    return pd.concat([legacy_dmi(df, period), legacy_atr(df, period)], axis=1)
+
+
+def bench_true_range_family(bars: int, repeat: int, period: int = 14) -> Dict[str, Any]:
+    df = synthetic_ohlcv(bars)
+    legacy = legacy_dmi_atr(df, period)
+    fused = fetcher.add_volatility_indicators(df.copy(), dmi_period=period, atr_periods=[period])
+    for col in legacy.columns:
+        if not np.array_equal(legacy[col].to_numpy(), fused[col].to_numpy(), equal_nan=True):
+            raise AssertionError(f"融合内核 {col} 与原实现结果不一致")
+    legacy_s = best_of(lambda: legacy_dmi_atr(df, period), repeat)
+    fused_s = best_of(
+        lambda: fetcher.add_volatility_indicators(df.copy(), dmi_period=period, atr_periods=[period]),
+        repeat,
+    )
+    return {
+        "name": f"dmi_atr_{period}",
+        "bars": bars,
+        "legacy_s": legacy_s,
+        "new_s": fused_s,
+    }
+
+
+def bench_multi_period_atr(bars: int, repeat: int, periods: Iterable[int] = (7, 14, 28)) -> Dict[str, Any]:
+    df = synthetic_ohlcv(bars)
+    periods = list(periods)
+
+    def legacy() -> None:
+        legacy_dmi(df, 14)
+        for period in periods:
+            legacy_atr(df, period)
+
+    legacy_s = best_of(legacy, repeat)
+    fused_s = best_of(
+        lambda: fetcher.add_volatility_indicators(df.copy(), dmi_period=14, atr_periods=periods),
+        repeat,
+    )
+    return {
+        "name": "dmi_14+atr_" + "/".join(str(p) for p in periods),
+        "bars": bars,
+        "legacy_s": legacy_s,
+        "new_s": fused_s,
+    }
+
+
+def bench_indicator_panel(bars: int, repeat: int, symbols: int = 5) -> Dict[str, Any]:
+    frames = {f"S{i}": synthetic_ohlcv(bars, seed=i) for i in range(symbols)}
+    panel = fetcher.add_indicator_set(fetcher.IndicatorPanel(frames))
+    for name, df in frames.items():
+        single = fetcher.add_indicator_set(df.copy())
+        stacked = panel.frame(name)
+        for col in single.columns:
+            if not np.array_equal(single[col].to_numpy(dtype=float), stacked[col].to_numpy(dtype=float), equal_nan=True):
+                raise AssertionError(f"面板计算 {name}.{col} 与逐品种计算结果不一致")
+    legacy_s = best_of(lambda: [fetcher.add_indicator_set(df.copy()) for df in frames.values()], repeat)
+    panel_s = best_of(lambda: fetcher.add_indicator_set(fetcher.IndicatorPanel(frames)), repeat)
+    return {
+        "name": f"indicator_set_x{symbols}",
+        "bars": bars,
+        "legacy_s": legacy_s,
+        "new_s": panel_s,
+    }
+
+
+def bench_incremental_indicators(bars: int, repeat: int, slide: int = 30) -> Dict[str, Any]:
+    """
+    增量引擎在窗口追加新 K 线与窗口后移 slide 天两种情况下都须满足与全量计算的容差约定；
+    耗时对比全量计算与同一窗口追加一根 K 线的增量更新。
+    """
+    df = synthetic_ohlcv(bars + slide + 1)
+    columns = indicator_engine.IncrementalIndicatorEngine().columns
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, "state.json")
+        cache_path = os.path.join(tmp, "cache.npz")
+
+        def incremental(window: pd.DataFrame) -> pd.DataFrame:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return indicator_engine.update_indicator_frame(window, state_path, cache_path)
+
+        incremental(df.iloc[:bars])
+        for start, stop in ((0, bars + 1), (slide, bars + slide), (slide, bars + slide + 1)):
+            window = df.iloc[start:stop]
+            problems = indicator_engine.indicator_mismatches(
+                incremental(window), fetcher.add_indicator_set(window.copy()), columns
+            )
+            if problems:
+                raise AssertionError(f"增量指标 [{start}:{stop}] 与全量计算不一致：" + "；".join(problems))
+
+        window = df.iloc[slide : bars + slide]
+        full_s = best_of(lambda: fetcher.add_indicator_set(window.copy()), repeat)
+
+        def append_one() -> None:
+            incremental(window)
+            start = time.perf_counter()
+            incremental(df.iloc[slide : bars + slide + 1])
+            timings.append(time.perf_counter() - start)
+
+        timings: List[float] = []
+        for _ in range(repeat):
+            append_one()
+    return {
+        "name": "incremental_append_1",
+        "bars": bars,
+        "legacy_s": full_s,
+        "new_s": min(timings),
+    }
+
+
+BENCHMARKS: List[Callable[[int, int], Dict[str, Any]]] = [
+    bench_price_percentile,
+    bench_true_range_family,
+    bench_multi_period_atr,
+    bench_indicator_panel,
+    bench_incremental_indicators,
+]
+
+
+def run(bar_counts: Iterable[int], repeat: int) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    for bars in bar_counts:
+        for bench in BENCHMARKS:
+            result = bench(bars, repeat)
+            speedup = result["legacy_s"] / result["new_s"] if result["new_s"] else float("inf")
+            print(
+                f"{result['name']:<24} bars={bars:>7}  旧实现 {result['legacy_s'] * 1000:9.2f} ms"
+                f"  新实现 {result['new_s'] * 1000:9.2f} ms  加速 {speedup:7.1f}x"
+            )
+            results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bars", type=int, nargs="+", default=[730, 5000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.bars, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
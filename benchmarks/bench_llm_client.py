@@ -0,0 +1,82 @@
+"""
+模型请求客户端基准：对比逐次 requests.post 与共享连接池的耗时和新建连接数，
+并用不访问网络的 FakeProvider 演示 429 / 5xx 重试（Retry-After 与抖动退避）及每次尝试的耗时记录。
+
+用法：python benchmarks/bench_llm_client.py [--requests 20] [--latency 0.01]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from llm_client import DeepSeekProvider, FakeProvider, LlmHttpClient  # noqa: E402
+from llm_standin import StandinConfig, standin_env, start_server  # noqa: E402
+
+BODY = {"model": "standin", "messages": [{"role": "user", "content": "ping"}], "stream": False}
+
+
+def bench_connection_reuse(count: int, latency: float) -> Dict[str, Any]:
+    server, config = start_server(config=StandinConfig(first_token_delay=latency))
+    url = standin_env(server)["DEEPSEEK_API_URL"]
+    try:
+        start = time.perf_counter()
+        for _ in range(count):
+            requests.post(url, json=BODY, timeout=10).raise_for_status()
+        bare = time.perf_counter() - start
+        bare_connections = config.connections
+
+        client = LlmHttpClient()
+        provider = DeepSeekProvider("standin", url=url)
+        start = time.perf_counter()
+        for _ in range(count):
+            client.post(provider, BODY).raise_for_status()
+        pooled = time.perf_counter() - start
+        pooled_connections = config.connections - bare_connections
+    finally:
+        server.shutdown()
+    return {
+        "requests": count,
+        "bare_s": bare,
+        "bare_connections": bare_connections,
+        "pooled_s": pooled,
+        "pooled_connections": pooled_connections,
+    }
+
+
+def bench_fake_retries() -> Dict[str, Any]:
+    client = LlmHttpClient()
+    provider = FakeProvider(statuses=(429, 503, 429), retry_after=0.05, backoff_seconds=0.1)
+    start = time.perf_counter()
+    response = client.post(provider, provider.body("system", ["block"], stream=False))
+    elapsed = time.perf_counter() - start
+    text, _ = provider.parse(response.json())
+    return {"elapsed_s": elapsed, "calls": provider.adapter.calls, "text": text, "stats": client.format_stats()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.01, help="替身服务器每次响应前的等待秒数")
+    args = parser.parse_args()
+
+    reuse = bench_connection_reuse(args.requests, args.latency)
+    print(
+        f"{reuse['requests']} 次请求：逐次 requests.post {reuse['bare_s'] * 1000:.0f} ms / {reuse['bare_connections']} 个连接，"
+        f"共享连接池 {reuse['pooled_s'] * 1000:.0f} ms / {reuse['pooled_connections']} 个连接"
+    )
+    fake = bench_fake_retries()
+    print(f"FakeProvider 重试：{fake['calls']} 次请求，{fake['elapsed_s'] * 1000:.0f} ms，回复 {fake['text']!r}")
+    print(fake["stats"])
+
+
+if __name__ == "__main__":
+    main()
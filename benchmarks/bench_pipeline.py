@@ -0,0 +1,311 @@
+"""
+离线流水线基准：逐阶段计时日线分页拉取、各 add_* 指标、compute_signal_info、各 export_*、各 plot_*、
+aggregate_snapshot 与 build_payload，并报告吞吐量（根/秒）与峰值内存（tracemalloc，单独一轮测量）。
+
+网络阶段经 upstream_standin.py 的替身服务器回放 benchmarks/fixtures 中录制的响应（OKX 行情按当前时间合成），
+不访问外网，也不读写项目的本地缓存、新闻库与爆仓日志；计算与导出阶段使用合成日线，可扩展到 1e4~1e6 根。
+--record 改为请求真实上游，将快照各数据源的响应写入 fixtures 目录。
+
+用法：python benchmarks/bench_pipeline.py [--bars 730 10000 100000 1000000] [--repeat 3]
+        [--plot-max-bars 730] [--latency 0] [--no-plots] [--no-replay] [--json results.json]
+      python benchmarks/bench_pipeline.py --record
+"""
+
+from __future__ import annotations
+
+import os
+
+# 在导入项目模块前关闭本地缓存、新闻库、爆仓日志、衍生品历史库与计量日志，避免基准读写 data/ 或命中缓存
+for _key in (
+    "HTTP_CACHE_PATH",
+    "NEWS_STORE_PATH",
+    "LIQUIDATION_LOG_DIR",
+    "SNAPSHOT_METRICS_PATH",
+    "LLM_CACHE_PATH",
+    "HISTORY_STORE_PATH",
+):
+    os.environ[_key] = ""
+os.environ.setdefault("USE_LOCAL_PROXY", "0")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import sys
+import tempfile
+import tracemalloc
+import warnings
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fetch_onchain_and_news as snapshot  # noqa: E402
+import model_analysis  # noqa: E402
+from bench_indicators import best_of, synthetic_ohlcv  # noqa: E402
+from okx_client import get_okx_client, shared_okx_adapter  # noqa: E402
+from upstream_standin import FIXTURE_DIR, RecordingAdapter, UpstreamConfig, mount_replay, start_server  # noqa: E402
+
+fetcher = importlib.import_module("获取数据")
+
+# 日频合成索引的上限（pandas 时间戳最大到 2262 年），超过后改用小时频率，指标计算不受影响
+MAX_DAILY_BARS = 80_000
+
+
+def measure(stage: str, func: Callable[[], Any], bars: int, repeat: int, trace_memory: bool = True) -> Dict[str, Any]:
+    """
+    取 repeat 次中的最短耗时；峰值内存在计时之后另跑一次测量，避免 tracemalloc 的开销计入耗时。
+    各阶段自身的打印输出被丢弃。
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = best_of(func, repeat)
+        peak_mb = None
+        if trace_memory:
+            tracemalloc.start()
+            try:
+                func()
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            finally:
+                tracemalloc.stop()
+    result = {
+        "stage": stage,
+        "bars": bars,
+        "best_s": seconds,
+        "bars_per_s": bars / seconds if seconds else float("inf"),
+        "peak_mb": peak_mb,
+    }
+    peak = f"{peak_mb:9.1f} MB" if peak_mb is not None else " " * 12
+    print(f"{stage:<42} bars={bars:>8}  {seconds * 1000:10.2f} ms  {result['bars_per_s']:14,.0f} 根/秒  峰值 {peak}")
+    return result
+
+
+def synthetic_derivatives(df: pd.DataFrame, seed: int = 11) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    与 df 同索引的开仓量历史与爆仓聚合，列与 fetch_open_interest_volume_history / fetch_liquidation_aggregates 一致。
+    """
+    rng = np.random.default_rng(seed)
+    rows = len(df)
+    oi = pd.DataFrame(
+        {
+            "open_interest_usd": 8e9 * np.exp(np.cumsum(rng.normal(0, 0.02, rows))),
+            "perp_volume_usd": rng.uniform(5e9, 2e10, rows),
+        },
+        index=df.index,
+    )
+    oi["open_interest_usd_change_pct"] = oi["open_interest_usd"].pct_change() * 100
+    oi["perp_volume_usd_change_pct"] = oi["perp_volume_usd"].pct_change() * 100
+    liquidations = pd.DataFrame(
+        {
+            "liquidation_long_usd": rng.uniform(0, 5e7, rows),
+            "liquidation_short_usd": rng.uniform(0, 5e7, rows),
+            "liquidation_long_sz": rng.uniform(0, 2e4, rows),
+            "liquidation_short_sz": rng.uniform(0, 2e4, rows),
+        },
+        index=df.index,
+    )
+    return oi, liquidations
+
+
+def bench_scaled(
+    bars: int, repeat: int, workdir: Path, plot_max_bars: int, charts: bool, trace_memory: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    合成 bars 根日线，按 add_indicator_set 的顺序逐个计时指标，再计时信号、导出与绘图。
+    """
+    timed = partial(measure, repeat=repeat, trace_memory=trace_memory)
+    freq = "D" if bars <= MAX_DAILY_BARS else "h"
+    df = synthetic_ohlcv(bars, freq=freq)
+    results: List[Dict[str, Any]] = []
+    indicators: List[Tuple[str, Callable[[pd.DataFrame], pd.DataFrame]]] = [
+        ("add_bollinger_bands", fetcher.add_bollinger_bands),
+        ("add_rsi_indicators", lambda frame: fetcher.add_rsi_indicators(frame, periods=[6, 14, 24])),
+        ("add_macd_indicators", fetcher.add_macd_indicators),
+        ("add_volatility_indicators", lambda frame: fetcher.add_volatility_indicators(frame, dmi_period=14, atr_periods=[14])),
+        ("add_dmi_indicators", lambda frame: fetcher.add_dmi_indicators(frame, period=14)),
+        ("add_atr_indicator", lambda frame: fetcher.add_atr_indicator(frame, period=14)),
+        ("add_price_moving_averages", lambda frame: fetcher.add_price_moving_averages(frame, windows=fetcher.DEFAULT_MA_WINDOWS)),
+        ("add_volume_indicators", lambda frame: fetcher.add_volume_indicators(frame, ma_window=20)),
+        ("add_price_percentile", lambda frame: fetcher.add_price_percentile(frame, window=20)),
+    ]
+    for name, func in indicators:
+        # 每次都在同一份 df 上追加列，与 add_indicator_set 逐步构建的过程一致
+        results.append(timed(name, lambda func=func: func(df), bars))
+
+    oi, liquidations = synthetic_derivatives(df)
+    results.append(timed("compute_signal_info", lambda: fetcher.compute_signal_info(df), bars))
+    # columns 变体导出全部 K 线，对应给前端图表导出数千根 K 线的用法
+    exports: List[Tuple[str, Callable[[], Any]]] = [
+        ("export_recent_signals", lambda: fetcher.export_recent_signals(df, path=str(workdir / "signals_60d.json"))),
+        (
+            "export_recent_signals[columns]",
+            lambda: fetcher.export_recent_signals(
+                df, path=str(workdir / "signals_all.json"), lookback=len(df), orient="columns"
+            ),
+        ),
+        ("export_atr_metrics", lambda: fetcher.export_atr_metrics(df, period=14, lookback=360, path=str(workdir / "atr_metrics.json"))),
+        ("export_open_interest_history", lambda: fetcher.export_open_interest_history(oi, path=str(workdir / "oi.json"))),
+        ("export_liquidation_history", lambda: fetcher.export_liquidation_history(liquidations, path=str(workdir / "liq.json"))),
+    ]
+    for name, func in exports:
+        results.append(timed(name, func, bars))
+
+    if charts:
+        # 图表只画最后 plot_max_bars 根（百万根 K 线的折线图没有意义，且绘图耗时与点数线性相关）
+        chart_df = df.tail(plot_max_bars)
+        chart_bars = len(chart_df)
+        plots: List[Tuple[str, Callable[[], Any]]] = [
+            (
+                "plot_price_volume_rsi",
+                lambda: fetcher.plot_price_volume_rsi(
+                    chart_df,
+                    output_path=str(workdir / "daily.png"),
+                    show=False,
+                    ma_windows=fetcher.DEFAULT_MA_WINDOWS,
+                    plot_mas=False,
+                    atr_period=14,
+                ),
+            ),
+            (
+                "plot_open_interest_and_liquidations",
+                lambda: fetcher.plot_open_interest_and_liquidations(
+                    chart_df,
+                    oi.tail(plot_max_bars),
+                    liquidations.tail(30),
+                    output_path=str(workdir / "oi.png"),
+                ),
+            ),
+        ]
+        for name, func in plots:
+            results.append(timed(name, func, chart_bars))
+    return results
+
+
+def bench_replay(repeat: int, workdir: Path, latency: float, days: int, trace_memory: bool = True) -> List[Dict[str, Any]]:
+    """
+    经替身服务器跑一遍真实请求路径：ccxt 分页、OKX 开仓量与爆仓翻页、快照聚合，最后用导出的信号与快照构建提示词。
+    """
+    timed = partial(measure, repeat=repeat, trace_memory=trace_memory)
+    server, config = start_server(config=UpstreamConfig(latency=latency))
+    results: List[Dict[str, Any]] = []
+    try:
+        okx_adapter = shared_okx_adapter()
+        mount_replay(get_okx_client(fetcher.resolve_proxy()).session, server, okx_adapter)
+        exchange = fetcher.build_exchange()
+        exchange.load_markets()
+        session = mount_replay(snapshot._build_session(), server, okx_adapter)
+
+        store_dir = workdir / "ohlcv"
+        results.append(
+            timed("fetch_daily_ohlcv[full]", lambda: fetcher.fetch_daily_ohlcv(exchange, days=days, store_dir=None), days)
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            fetcher.fetch_daily_ohlcv(exchange, days=days, store_dir=str(store_dir))
+        results.append(
+            timed(
+                "fetch_daily_ohlcv[incremental]",
+                lambda: fetcher.fetch_daily_ohlcv(exchange, days=days, store_dir=str(store_dir)),
+                days,
+            )
+        )
+        results.append(
+            timed("fetch_open_interest_volume_history", lambda: fetcher.fetch_open_interest_volume_history(limit=180), 180)
+        )
+        results.append(
+            timed("fetch_liquidation_aggregates", lambda: fetcher.fetch_liquidation_aggregates(hours=24 * 30, log_dir=""), 30)
+        )
+
+        signals_path = workdir / "signals_60d.json"
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = fetcher.fetch_daily_ohlcv(exchange, days=days, store_dir=None).iloc[:-1].copy()
+            df = fetcher.add_indicator_set(df)
+            df = fetcher.join_open_interest(df, fetcher.fetch_open_interest_volume_history(limit=180), "ETH")
+            df = df.join(fetcher.fetch_liquidation_aggregates(hours=24 * 30, log_dir=""), how="left")
+            fetcher.export_recent_signals(df, path=str(signals_path), lookback=60)
+
+        snapshot_path = workdir / "global_onchain_news_snapshot.json"
+        holder: Dict[str, Any] = {}
+
+        def aggregate() -> None:
+            holder["snapshot"] = snapshot.aggregate_snapshot(session)
+
+        results.append(timed("aggregate_snapshot", aggregate, 1))
+        snapshot.save_snapshot(holder["snapshot"], snapshot_path, raw_dir=workdir / "snapshot_raw")
+        signals = model_analysis.load_signals(signals_path)
+        onchain = model_analysis.load_onchain_snapshot(snapshot_path)
+        results.append(timed("build_payload", lambda: model_analysis.build_payload(signals, onchain), len(signals)))
+
+        incomplete = holder["snapshot"].get("incomplete_sources") or []
+        print(f"替身服务器请求数：{dict(sorted(config.requests.items()))}")
+        if config.missing:
+            print(f"缺少 fixture（按 404 返回）：{dict(config.missing)}")
+        if incomplete:
+            print(f"快照未完成的数据源：{incomplete}")
+    finally:
+        server.shutdown()
+    return results
+
+
+def record_fixtures(fixtures_dir: Path) -> None:
+    """
+    请求真实上游跑一次 aggregate_snapshot，把各数据源的 200 响应写入 fixtures_dir（OKX 仍由替身合成）。
+    """
+    session = snapshot._build_session()
+    recorder = RecordingAdapter(fixtures_dir)
+    session.mount("https://", recorder)
+    session.mount("http://", recorder)
+    result = snapshot.aggregate_snapshot(session)
+    for path in sorted(set(recorder.recorded)):
+        print(f"已录制 {path.relative_to(fixtures_dir)}")
+    if result.get("incomplete_sources"):
+        print(f"未完成的数据源：{result['incomplete_sources']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, nargs="+", default=[730, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--days", type=int, default=730, help="替身阶段 fetch_daily_ohlcv 拉取的天数")
+    parser.add_argument("--plot-max-bars", type=int, default=730)
+    parser.add_argument("--latency", type=float, default=0.0, help="替身服务器每个请求的附加延迟（秒）")
+    parser.add_argument("--no-plots", action="store_true")
+    parser.add_argument("--no-replay", action="store_true", help="只跑合成数据的计算与导出阶段")
+    parser.add_argument("--no-memory", action="store_true", help="不单独测量峰值内存")
+    parser.add_argument("--json", type=Path, default=None, help="将结果写入 JSON 文件")
+    parser.add_argument("--record", action="store_true", help="请求真实上游并更新 fixtures")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURE_DIR)
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.fixtures)
+        return
+    os.environ.setdefault("ETHERSCAN_API_KEY", "replay")
+    # compute_signal_info 的 fillna 降级提示在每次重复时都会出现，淹没结果表
+    warnings.simplefilter("ignore", FutureWarning)
+    charts = not args.no_plots and fetcher.plotting_available()
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp:
+        workdir = Path(tmp)
+        # 导出与快照函数的部分默认路径是相对路径，切到临时目录以免改写仓库中的文件
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            if not args.no_replay:
+                results.extend(bench_replay(args.repeat, workdir, args.latency, args.days, not args.no_memory))
+            for bars in args.bars:
+                results.extend(bench_scaled(bars, args.repeat, workdir, args.plot_max_bars, charts, not args.no_memory))
+        finally:
+            os.chdir(cwd)
+    if args.json:
+        args.json.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+启动耗时报告：在子进程中以 -X importtime 导入各脚本，汇总总导入耗时与最重的模块，
+并检查仅导出数据的路径是否避开了 matplotlib / ccxt。
+
+用法：python benchmarks/bench_startup.py [--module 获取数据 ...] [--top 10] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ("matplotlib", "matplotlib.pyplot", "ccxt")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    解析 -X importtime 输出，返回 (模块名, 自身耗时 us, 累计耗时 us) 列表。
+    """
+    rows: List[Tuple[str, int, int]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        rows.append((parts[2].strip(), self_us, cumulative_us))
+    return rows
+
+
+def import_report(module: str, code: str = "") -> Dict[str, Any]:
+    """
+    在全新解释器中导入 module（可附加执行 code），返回导入明细与进程墙钟耗时。
+    """
+    script = f"import importlib; importlib.import_module({module!r}){'; ' + code if code else ''}"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_s = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败：{proc.stderr.strip().splitlines()[-1:]}")
+    rows = parse_importtime(proc.stderr)
+    loaded = {name for name, _, _ in rows}
+    total_us = sum(self_us for _, self_us, _ in rows)
+    return {
+        "module": module,
+        "wall_s": wall_s,
+        "import_s": total_us / 1e6,
+        "rows": rows,
+        "heavy": [name for name in HEAVY_MODULES if name in loaded],
+    }
+
+
+def best_report(module: str, repeat: int, code: str = "") -> Dict[str, Any]:
+    reports = [import_report(module, code) for _ in range(repeat)]
+    return min(reports, key=lambda r: r["wall_s"])
+
+
+def print_report(label: str, report: Dict[str, Any], top: int) -> None:
+    heavy = "、".join(report["heavy"]) if report["heavy"] else "无"
+    print(
+        f"{label:<28} 进程 {report['wall_s'] * 1000:8.1f} ms  导入 {report['import_s'] * 1000:8.1f} ms"
+        f"  已加载重型模块：{heavy}"
+    )
+    top_level = [row for row in report["rows"] if "." not in row[0]]
+    for name, _, cumulative_us in sorted(top_level, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"    {name:<32} {cumulative_us / 1000:8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", nargs="+", default=["获取数据", "fetch_onchain_and_news", "model_analysis"])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for module in args.module:
+        print_report(f"{module}（仅数据）", best_report(module, args.repeat), args.top)
+    if "获取数据" in args.module:
+        plotting = best_report("获取数据", args.repeat, "import 获取数据; 获取数据.plotting_available()")
+        print_report("获取数据（含绘图）", plotting, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+本地模型替身服务器：模拟 DeepSeek（OpenAI 兼容 chat/completions，含 SSE 流式）与 Gemini
+（generateContent / streamGenerateContent?alt=sse）两种协议，用于离线测试与基准。
+
+用法：python benchmarks/llm_standin.py [--port 8765] [--first-token-delay 0.5] [--chunk-delay 0.02]
+        [--fail-first 2] [--cut-after 40]
+启动后按提示设置 DEEPSEEK_API_URL / GEMINI_API_URL 即可让 model_analysis.py 连到本机。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_REPORT = "\n".join(
+    [
+        "## 市场概述",
+        "- 今天是替身服务器生成的示例日报，最新收盘日沿用输入数据。",
+        "- 布林带下轨仍向下，价格贴近下轨，量能放大但尚未确认企稳。",
+        "",
+        "## 信号解读",
+        "- 买入星级 0，卖出星级 0：RSI 未进入超卖区，DMI 显示空头占优。",
+        "",
+        "## 关键价位",
+        "- 支撑：布林带下轨附近；压力：MA20 与 MA60。",
+        "",
+        "## 操作建议",
+        "- 短期观望，等待连续 3 日站上 MA20 且放量；中期分批布局。",
+        "",
+        "## 风险与关注",
+        "- 关注恐慌指数与爆仓数据的变化。",
+        "",
+        "## 波动率观察",
+        "- ATR% 处于高位，仓位需相应降低。",
+        "",
+        "## 链上与情绪",
+        "- 稳定币、桥接与 Gas 数据均来自本地快照。",
+    ]
+)
+
+
+class StandinConfig:
+    """
+    替身行为配置；fail_first 个请求返回 fail_status，cut_after 个分片后断开流（不发送结束标记）。
+    """
+
+    def __init__(
+        self,
+        report: str = DEFAULT_REPORT,
+        first_token_delay: float = 0.0,
+        chunk_delay: float = 0.0,
+        chunk_chars: int = 12,
+        fail_first: int = 0,
+        fail_status: int = 429,
+        retry_after: Optional[float] = None,
+        cut_after: Optional[int] = None,
+    ) -> None:
+        self.report = report
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.cut_after = cut_after
+        self.requests: List[Dict[str, Any]] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def connected(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def record(self, path: str, body: Dict[str, Any]) -> int:
+        with self._lock:
+            self.requests.append({"path": path, "body": body, "at": time.time()})
+            return len(self.requests)
+
+    def chunks(self) -> List[str]:
+        size = max(1, self.chunk_chars)
+        return [self.report[i : i + size] for i in range(0, len(self.report), size)]
+
+
+def _deepseek_events(config: StandinConfig, model: str) -> Iterator[Tuple[Dict[str, Any], bool]]:
+    chunks = config.chunks()
+    for index, chunk in enumerate(chunks):
+        last = index == len(chunks) - 1
+        yield {
+            "id": "standin",
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": "stop" if last else None}],
+        }, last
+
+
+def _gemini_events(config: StandinConfig) -> Iterator[Tuple[Dict[str, Any], bool]]:
+    chunks = config.chunks()
+    for index, chunk in enumerate(chunks):
+        last = index == len(chunks) - 1
+        candidate: Dict[str, Any] = {"content": {"role": "model", "parts": [{"text": chunk}]}, "index": 0}
+        event: Dict[str, Any] = {"candidates": [candidate]}
+        if last:
+            candidate["finishReason"] = "STOP"
+            event["usageMetadata"] = {"promptTokenCount": 0, "candidatesTokenCount": len(config.report)}
+        yield event, last
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1：JSON 响应保持连接（keep-alive），SSE 响应以关闭连接结束
+    protocol_version = "HTTP/1.1"
+    # 响应头与正文分两次写出，保持连接时需关闭 Nagle，否则每次请求多出约 40ms 的延迟确认
+    disable_nagle_algorithm = True
+    server_version = "LLMStandin/1.0"
+    config: StandinConfig
+
+    def setup(self) -> None:
+        super().setup()
+        self.config.connected()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429 and self.config.retry_after is not None:
+            self.send_header("Retry-After", str(self.config.retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_sse(self, events: Iterator[Tuple[Dict[str, Any], bool]], done_marker: bool) -> None:
+        config = self.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.close_connection = True
+        self.end_headers()
+        time.sleep(config.first_token_delay)
+        try:
+            for index, (event, _) in enumerate(events):
+                if config.cut_after is not None and index >= config.cut_after:
+                    return
+                self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if config.chunk_delay:
+                    time.sleep(config.chunk_delay)
+            if done_marker:
+                self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def do_POST(self) -> None:
+        config = self.config
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+        count = config.record(self.path, body)
+        if count <= config.fail_first:
+            self._send_json(config.fail_status, {"error": {"code": config.fail_status, "message": "standin failure"}})
+            return
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/chat/completions"):
+            model = body.get("model") or "standin"
+            if body.get("stream"):
+                self._send_sse(_deepseek_events(config, model), done_marker=True)
+            else:
+                time.sleep(config.first_token_delay)
+                self._send_json(
+                    200,
+                    {
+                        "id": "standin",
+                        "object": "chat.completion",
+                        "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": config.report}, "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(config.report)},
+                    },
+                )
+        elif path.endswith(":streamGenerateContent"):
+            self._send_sse(_gemini_events(config), done_marker=False)
+        elif path.endswith(":generateContent"):
+            time.sleep(config.first_token_delay)
+            self._send_json(
+                200,
+                {
+                    "candidates": [{"content": {"role": "model", "parts": [{"text": config.report}]}, "finishReason": "STOP"}],
+                    "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": len(config.report)},
+                },
+            )
+        else:
+            self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, config: Optional[StandinConfig] = None) -> Tuple[ThreadingHTTPServer, StandinConfig]:
+    """
+    在后台线程启动替身服务器，返回 (server, config)；port=0 时自动分配端口。
+    """
+    config = config or StandinConfig()
+    handler = type("BoundStandinHandler", (StandinHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-standin", daemon=True).start()
+    return server, config
+
+
+def standin_env(server: ThreadingHTTPServer, model: str = "gemini-standin") -> Dict[str, str]:
+    """
+    指向替身服务器的环境变量（供 model_analysis.py 使用）。
+    """
+    host, port = server.server_address[:2]
+    base = f"http://{host}:{port}"
+    return {
+        "DEEPSEEK_API_URL": f"{base}/v1/chat/completions",
+        "GEMINI_API_URL": f"{base}/v1/models/{model}:generateContent",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-delay", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--fail-first", type=int, default=0)
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--cut-after", type=int, default=None)
+    args = parser.parse_args()
+    config = StandinConfig(
+        first_token_delay=args.first_token_delay,
+        chunk_delay=args.chunk_delay,
+        fail_first=args.fail_first,
+        fail_status=args.fail_status,
+        retry_after=args.retry_after,
+        cut_after=args.cut_after,
+    )
+    server, _ = start_server(args.host, args.port, config)
+    for key, value in standin_env(server).items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
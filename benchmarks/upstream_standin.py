@@ -0,0 +1,342 @@
+"""
+上游数据源替身服务器：回放 benchmarks/fixtures 下录制的 DefiLlama、Blockchair、mempool.space、Etherscan、
+RSS、CryptoCompare 与 alternative.me 响应，OKX 行情（日线、开仓量、爆仓订单）则按当前时间合成，
+使 获取数据.py 与 fetch_onchain_and_news.py 的完整请求路径可以离线运行和计时。
+
+请求经 ReplayAdapter 改写为 http://127.0.0.1:<port>/<原路径>，原域名放在 X-Replay-Host 头中；
+OKX 域名上的 ReplayAdapter 包裹共享的 OkxAdapter，限速与重试逻辑照常生效。
+fixture 按 <域名>/<路径以 "_" 连接>[.<action>].json|.xml 存放，RecordingAdapter 以同样的规则从真实上游录制。
+
+用法：python benchmarks/upstream_standin.py [--port 8766] [--latency 0.05]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+REPLAY_HOST_HEADER = "X-Replay-Host"
+OKX_HOST = "www.okx.com"
+# 同一路径按查询参数区分响应的参数名（Etherscan 的 gasoracle / gasfeeHistory 共用 /api）
+FIXTURE_QUERY_KEYS = ("action",)
+DAY_MS = 86_400_000
+
+
+def fixture_name(path: str, query: str = "") -> str:
+    name = path.strip("/").replace("/", "_") or "index"
+    params = parse_qs(query)
+    for key in FIXTURE_QUERY_KEYS:
+        if params.get(key):
+            name = f"{name}.{params[key][0]}"
+    return name
+
+
+def find_fixture(fixtures_dir: Path, host: str, path: str, query: str = "") -> Optional[Path]:
+    base = fixtures_dir / host / fixture_name(path, query)
+    for suffix in (".json", ".xml"):
+        candidate = base.with_name(base.name + suffix)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def _seed(*parts: str) -> int:
+    return zlib.crc32("/".join(parts).encode("utf-8"))
+
+
+class OkxSynth:
+    """
+    按当前时间合成的 OKX 公共行情：history_days 根日线（含未收盘的当日）、逐日开仓量与成交额、
+    最近 liquidation_days 天每天 liquidations_per_day 笔爆仓成交。同一 instId / uly 在进程内保持不变。
+    """
+
+    def __init__(self, history_days: int = 800, liquidation_days: int = 45, liquidations_per_day: int = 40) -> None:
+        self.history_days = history_days
+        self.liquidation_days = liquidation_days
+        self.liquidations_per_day = liquidations_per_day
+        now = datetime.now(timezone.utc)
+        self.today_ms = int(now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp() * 1000)
+        self.now_ms = int(now.timestamp() * 1000)
+        self._candles: Dict[str, np.ndarray] = {}
+        self._fills: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def candles(self, inst_id: str) -> np.ndarray:
+        """
+        N×6 数组（ts, open, high, low, close, volume），按时间升序。
+        """
+        with self._lock:
+            rows = self._candles.get(inst_id)
+            if rows is None:
+                rng = np.random.default_rng(_seed("candles", inst_id))
+                bars = self.history_days
+                close = 2000 * np.exp(np.cumsum(rng.normal(0, 0.03, bars)))
+                open_ = np.concatenate([[close[0]], close[:-1]])
+                spread = rng.uniform(0.0, 0.03, (2, bars))
+                ts = self.today_ms - DAY_MS * np.arange(bars - 1, -1, -1, dtype=np.float64)
+                rows = np.column_stack(
+                    [
+                        ts,
+                        open_,
+                        np.maximum(open_, close) * (1 + spread[0]),
+                        np.minimum(open_, close) * (1 - spread[1]),
+                        close,
+                        rng.uniform(1e5, 3e5, bars),
+                    ]
+                )
+                self._candles[inst_id] = rows
+            return rows
+
+    def candle_page(self, params: Dict[str, str]) -> List[List[str]]:
+        """
+        与 /api/v5/market/candles 一致：返回 before < ts < after 的最新 limit 根，按时间倒序。
+        """
+        rows = self.candles(params.get("instId", "ETH-USDT"))
+        after = float(params.get("after") or np.inf)
+        before = float(params.get("before") or -np.inf)
+        limit = int(params.get("limit") or 100)
+        page = rows[(rows[:, 0] < after) & (rows[:, 0] > before)][-limit:][::-1]
+        return [
+            [
+                str(int(row[0])),
+                *(f"{value:.2f}" for value in row[1:5]),
+                f"{row[5]:.4f}",
+                f"{row[5] * row[4]:.2f}",
+                f"{row[5] * row[4]:.2f}",
+                "0" if int(row[0]) == self.today_ms else "1",
+            ]
+            for row in page
+        ]
+
+    def open_interest(self, params: Dict[str, str]) -> List[List[str]]:
+        ccy = params.get("ccy", "ETH")
+        limit = int(params.get("limit") or 100)
+        rng = np.random.default_rng(_seed("open-interest", ccy))
+        days = min(limit, self.history_days)
+        oi = 8e9 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+        volume = rng.uniform(5e9, 2e10, days)
+        ts = self.today_ms - DAY_MS * np.arange(days - 1, -1, -1)
+        return [[str(int(t)), f"{o:.2f}", f"{v:.2f}"] for t, o, v in zip(ts[::-1], oi[::-1], volume[::-1])]
+
+    def fills(self, uly: str) -> List[Dict[str, Any]]:
+        """
+        爆仓成交明细，按时间倒序。
+        """
+        with self._lock:
+            fills = self._fills.get(uly)
+            if fills is None:
+                rng = np.random.default_rng(_seed("liquidations", uly))
+                count = self.liquidation_days * self.liquidations_per_day
+                ts = np.sort(rng.integers(self.now_ms - self.liquidation_days * DAY_MS, self.now_ms, count))[::-1]
+                sides = rng.random(count) < 0.5
+                sizes = rng.uniform(1, 500, count)
+                prices = rng.uniform(1500, 2500, count)
+                ccy = uly.split("-")[0]
+                fills = [
+                    {
+                        "bkLoss": "0",
+                        "bkPx": f"{px:.2f}",
+                        "ccy": ccy,
+                        "posSide": "long" if long else "short",
+                        "side": "sell" if long else "buy",
+                        "sz": f"{sz:.1f}",
+                        "ts": str(int(t)),
+                    }
+                    for t, long, sz, px in zip(ts, sides, sizes, prices)
+                ]
+                self._fills[uly] = fills
+            return fills
+
+    def liquidation_page(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        uly = params.get("uly", "ETH-USDT")
+        after = int(params.get("after") or self.now_ms + 1)
+        limit = int(params.get("limit") or 100)
+        details = [fill for fill in self.fills(uly) if int(fill["ts"]) < after][:limit]
+        return [{"details": details, "instFamily": uly, "instId": f"{uly}-SWAP", "instType": params.get("instType", "SWAP"), "uly": uly}]
+
+
+class UpstreamConfig:
+    """
+    替身行为配置；latency 为每个请求响应前的等待秒数，requests 按域名统计请求数。
+    """
+
+    def __init__(
+        self,
+        fixtures_dir: Path = FIXTURE_DIR,
+        latency: float = 0.0,
+        okx: Optional[OkxSynth] = None,
+    ) -> None:
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.okx = okx or OkxSynth()
+        self.requests: Counter = Counter()
+        self.missing: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, host: str, path: str, found: bool) -> None:
+        with self._lock:
+            self.requests[host] += 1
+            if not found:
+                self.missing[f"{host}{path}"] += 1
+
+    def okx_response(self, path: str, query: str) -> Optional[Dict[str, Any]]:
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        if path in ("/api/v5/market/candles", "/api/v5/market/history-candles"):
+            data: Any = self.okx.candle_page(params)
+        elif path == "/api/v5/rubik/stat/contracts/open-interest-volume":
+            data = self.okx.open_interest(params)
+        elif path == "/api/v5/public/liquidation-orders":
+            data = self.okx.liquidation_page(params)
+        elif path == "/api/v5/public/instruments":
+            fixture = find_fixture(self.fixtures_dir, OKX_HOST, path)
+            instruments = json.loads(fixture.read_text(encoding="utf-8"))["data"] if fixture else []
+            data = [item for item in instruments if item.get("instType") == params.get("instType")]
+        else:
+            return None
+        return {"code": "0", "msg": "", "data": data}
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "UpstreamStandin/1.0"
+    config: UpstreamConfig
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply(self) -> None:
+        config = self.config
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        host = self.headers.get(REPLAY_HOST_HEADER) or self.headers.get("Host", "")
+        parts = urlsplit(self.path)
+        if config.latency:
+            time.sleep(config.latency)
+        if host == OKX_HOST:
+            payload = config.okx_response(parts.path, parts.query)
+            if payload is not None:
+                config.record(host, parts.path, True)
+                self._send(200, json.dumps(payload).encode("utf-8"), "application/json")
+                return
+        fixture = find_fixture(config.fixtures_dir, host, parts.path, parts.query)
+        config.record(host, parts.path, fixture is not None)
+        if fixture is None:
+            self._send(404, json.dumps({"error": f"no fixture for {host}{parts.path}"}).encode("utf-8"), "application/json")
+            return
+        content_type = "application/rss+xml; charset=utf-8" if fixture.suffix == ".xml" else "application/json"
+        self._send(200, fixture.read_bytes(), content_type)
+
+    do_GET = _reply
+    do_POST = _reply
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, config: Optional[UpstreamConfig] = None) -> Tuple[ThreadingHTTPServer, UpstreamConfig]:
+    """
+    在后台线程启动替身服务器，返回 (server, config)；port=0 时自动分配端口。
+    """
+    config = config or UpstreamConfig()
+    handler = type("BoundUpstreamHandler", (UpstreamHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="upstream-standin", daemon=True).start()
+    return server, config
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    将请求改写到替身服务器；inner 为实际发送请求的 adapter（缺省为自身），用于保留 OkxAdapter 的限速与重试。
+    """
+
+    def __init__(self, server: ThreadingHTTPServer, inner: Optional[HTTPAdapter] = None) -> None:
+        super().__init__(pool_maxsize=16)
+        host, port = server.server_address[:2]
+        self.netloc = f"{host}:{port}"
+        self.inner = inner
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        parts = urlsplit(request.url or "")
+        request.headers[REPLAY_HOST_HEADER] = parts.hostname or ""
+        request.url = urlunsplit(("http", self.netloc, parts.path, parts.query, ""))
+        kwargs["proxies"] = {}
+        if self.inner is not None:
+            return self.inner.send(request, **kwargs)
+        return super().send(request, **kwargs)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    请求真实上游，并将 200 响应按 fixture 命名规则写入 fixtures_dir（OKX 行情由替身合成，不录制）。
+    """
+
+    def __init__(self, fixtures_dir: Path = FIXTURE_DIR, inner: Optional[HTTPAdapter] = None) -> None:
+        super().__init__()
+        self.fixtures_dir = fixtures_dir
+        self.inner = inner
+        self.recorded: List[Path] = []
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        response = self.inner.send(request, **kwargs) if self.inner is not None else super().send(request, **kwargs)
+        parts = urlsplit(request.url or "")
+        if response.status_code != 200 or parts.hostname in (None, OKX_HOST):
+            return response
+        content_type = response.headers.get("Content-Type", "")
+        suffix = ".xml" if "xml" in content_type or "rss" in content_type else ".json"
+        target = self.fixtures_dir / parts.hostname / (fixture_name(parts.path, parts.query) + suffix)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(response.content)
+        self.recorded.append(target)
+        return response
+
+
+def mount_replay(session: requests.Session, server: ThreadingHTTPServer, okx_adapter: Optional[HTTPAdapter] = None) -> requests.Session:
+    """
+    让 session 的全部请求改走替身服务器；传入 okx_adapter 时 OKX 请求仍经过它（限速、重试与统计）。
+    """
+    replay = ReplayAdapter(server)
+    session.mount("https://", replay)
+    session.mount("http://", replay)
+    if okx_adapter is not None:
+        session.mount(f"https://{OKX_HOST}", ReplayAdapter(server, inner=okx_adapter))
+    return session
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    server, config = start_server(args.host, args.port, UpstreamConfig(latency=args.latency))
+    print(f"替身服务器已启动：http://{args.host}:{server.server_address[1]}（请求需带 {REPLAY_HOST_HEADER} 头指明原域名）")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"请求数：{dict(config.requests)}；缺少 fixture：{dict(config.missing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,50 @@
 from __future__ import annotations
 
+import contextvars
+import gzip
+import hashlib
 import json
 import os
+import time
 from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal, InvalidOperation
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from xml.etree import ElementTree
 
 import requests
 
+from http_cache import build_cached_session, format_cache_stats
+from news_store import NEWS_STORE_PATH, NEWS_TOP_N, NewsStore
+from okx_client import format_okx_stats, mount_okx_adapter
+from okx_liquidations import LIQUIDATION_LOG_DIR, collect_liquidation_fills, fill_ts
+from source_metrics import format_source_metrics, get_source_metrics, source_scope
+
 HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "30"))
 DEFAULT_OUTPUT = Path("global_onchain_news_snapshot.json")
+# 并发拉取各数据源：线程数为 0/1 时退化为原有的串行执行
+SNAPSHOT_MAX_WORKERS = int(os.getenv("SNAPSHOT_MAX_WORKERS", "8"))
+# 单个数据源的最长等待时间（秒），超时后以错误占位写入快照
+SNAPSHOT_SOURCE_DEADLINE = float(os.getenv("SNAPSHOT_SOURCE_DEADLINE", str(HTTP_TIMEOUT * 4)))
+# 镜像对冲：优先级最高的镜像发出后，超过该秒数仍无可用结果就并行请求下一个镜像；设为负数时逐个串行尝试
+MIRROR_HEDGE_DELAY = float(os.getenv("MIRROR_HEDGE_DELAY", "2"))
+# 精简快照：上游原始响应移出主文件，按内容哈希 gzip 存入 SNAPSHOT_RAW_DIR，主文件只保留引用
+SNAPSHOT_LEAN = os.getenv("SNAPSHOT_LEAN", "1").lower() not in ("0", "false", "no")
+SNAPSHOT_RAW_DIR = Path(os.getenv("SNAPSHOT_RAW_DIR", "snapshot_raw"))
+# 归档的原始响应位置（"*" 匹配任意键）；只处理这些大块负载，各跨链桥条目内的小 raw 字典保留在主文件中
+RAW_PAYLOAD_PATHS: Tuple[Tuple[str, ...], ...] = (
+    ("defillama", "*", "bridge_overview_raw"),
+    ("defillama", "*", "stablecoin", "raw"),
+    ("defillama", "*", "stablecoin", "chains_snapshot"),
+    ("eth_gas", "gas_oracle_raw"),
+    ("eth_gas", "fee_history_raw"),
+    ("fear_greed", "raw"),
+)
+# RSS 流式解析：每个源最多读取的字节数（解压后），取够条数或超出上限即断开连接
+RSS_MAX_BYTES = int(os.getenv("RSS_MAX_BYTES", str(1024 * 1024)))
+RSS_CHUNK_BYTES = 16 * 1024
 
 # Cache for previous snapshot
 _prev_snapshot_cache: Optional[Dict[str, Any]] = None
@@ -53,7 +85,9 @@ def _resolve_proxy() -> Optional[str]:
 
 
 def _build_session() -> requests.Session:
-    session = requests.Session()
+    session = build_cached_session()
+    # OKX 请求与 获取数据.py 共用连接池、按接口限速和 429/5xx 重试（见 okx_client.py）
+    mount_okx_adapter(session)
     proxy = _resolve_proxy()
     if proxy:
         session.proxies.update({"http": proxy, "https": proxy})
@@ -72,7 +106,7 @@ def _fetch_json(
     session: requests.Session, url: str, params: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     try:
-        resp = session.get(url, params=params, timeout=HTTP_TIMEOUT)
+        resp = get_source_metrics().get(session, url, params=params, timeout=HTTP_TIMEOUT)
         resp.raise_for_status()
     except requests.RequestException as exc:
         return {"error": str(exc), "url": url, "params": params}
@@ -83,32 +117,116 @@ def _fetch_json(
         return {"error": "invalid_json", "url": url, "params": params, "preview": preview}
 
 
-def _fetch_rss_items(session: requests.Session, url: str, limit: int = 5) -> Dict[str, Any]:
+MirrorCandidate = Callable[[], Tuple[Optional[Any], Optional[Dict[str, Any]]]]
+
+
+def _hedged_first(
+    candidates: List[MirrorCandidate], hedge_delay: float = MIRROR_HEDGE_DELAY
+) -> Tuple[Optional[Any], List[Dict[str, Any]]]:
+    """
+    按优先级对冲请求镜像：先发第一个候选，hedge_delay 秒内没有可用结果就追加下一个，
+    某个候选失败时立即补发下一个。返回最先得到的可用结果（同时完成时取优先级高者）
+    以及已判定不可用的候选记录（按优先级排序）；尚未开始的候选被取消，仍在途的请求结果被丢弃。
+    每个候选返回 (result, None) 表示可用，(None, attempt) 表示不可用。hedge_delay < 0 时逐个串行尝试。
+    """
+    rejected: Dict[int, Dict[str, Any]] = {}
+    if hedge_delay < 0 or len(candidates) <= 1:
+        for index, candidate in enumerate(candidates):
+            result, attempt = candidate()
+            if result is not None:
+                return result, [rejected[i] for i in sorted(rejected)]
+            rejected[index] = attempt or {"detail": "rejected"}
+        return None, [rejected[i] for i in sorted(rejected)]
+
+    executor = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="mirror")
+    pending: Dict[Future, int] = {}
+    next_index = 0
+    winner: Optional[Any] = None
+
+    def launch() -> None:
+        nonlocal next_index
+        # 复制上下文，候选请求仍计入发起它的数据源（见 source_metrics.py）
+        pending[executor.submit(contextvars.copy_context().run, candidates[next_index])] = next_index
+        next_index += 1
+
     try:
-        resp = session.get(url, timeout=HTTP_TIMEOUT)
-        resp.raise_for_status()
+        launch()
+        while pending:
+            timeout = hedge_delay if next_index < len(candidates) else None
+            done, _ = wait(set(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                launch()
+                continue
+            failed = False
+            for future in sorted(done, key=pending.__getitem__):
+                index = pending.pop(future)
+                try:
+                    result, attempt = future.result()
+                except Exception as exc:
+                    result, attempt = None, {"detail": f"{type(exc).__name__}: {exc}"}
+                if result is not None and winner is None:
+                    winner = result
+                elif result is None:
+                    rejected[index] = attempt or {"detail": "rejected"}
+                    failed = True
+            if winner is not None:
+                break
+            if (failed or not pending) and next_index < len(candidates):
+                launch()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return winner, [rejected[i] for i in sorted(rejected)]
+
+
+def _rss_item(item: ElementTree.Element) -> Dict[str, Any]:
+    pub_date = item.findtext("pubDate") or item.findtext("{http://purl.org/dc/elements/1.1/}date") or ""
+    return {
+        "title": (item.findtext("title") or "").strip(),
+        "link": (item.findtext("link") or "").strip(),
+        "published": pub_date.strip(),
+        "summary": (item.findtext("description") or "").strip(),
+    }
+
+
+def _fetch_rss_items(
+    session: requests.Session, url: str, limit: int = 5, max_bytes: int = RSS_MAX_BYTES
+) -> Dict[str, Any]:
+    """
+    流式下载并增量解析 RSS：每解析完一个 <item> 就取出字段并释放节点，
+    取满 limit 条或累计读取超过 max_bytes 即关闭连接，不再读取剩余内容。
+    流式请求不经过本地 HTTP 缓存。
+    """
+    items: List[Dict[str, Any]] = []
+    head = b""
+    received = 0
+    parser = ElementTree.XMLPullParser(events=("end",))
+    metrics = get_source_metrics()
+    try:
+        with metrics.call(url) as record, session.get(url, timeout=HTTP_TIMEOUT, stream=True) as resp:
+            metrics.observe(record, resp, count_body=False)
+            resp.raise_for_status()
+            for chunk in resp.iter_content(chunk_size=RSS_CHUNK_BYTES):
+                if len(head) < 400:
+                    head += chunk[: 400 - len(head)]
+                received += len(chunk)
+                record["bytes"] = received
+                parser.feed(chunk)
+                for _, elem in parser.read_events():
+                    if elem.tag == "item":
+                        items.append(_rss_item(elem))
+                        elem.clear()
+                        if len(items) >= limit:
+                            break
+                if len(items) >= limit or received >= max_bytes:
+                    break
+            else:
+                parser.close()
     except requests.RequestException as exc:
         return {"error": str(exc), "url": url}
-    try:
-        root = ElementTree.fromstring(resp.content)
     except ElementTree.ParseError as exc:
-        preview = resp.text[:400]
-        return {"error": f"rss_parse_error: {exc}", "url": url, "preview": preview}
-
-    items: List[Dict[str, Any]] = []
-    for item in root.findall(".//item")[:limit]:
-        title = (item.findtext("title") or "").strip()
-        link = (item.findtext("link") or "").strip()
-        pub_date = (item.findtext("pubDate") or item.findtext("{http://purl.org/dc/elements/1.1/}date") or "").strip()
-        summary = (item.findtext("description") or "").strip()
-        items.append(
-            {
-                "title": title,
-                "link": link,
-                "published": pub_date,
-                "summary": summary,
-            }
-        )
+        if not items:
+            preview = head.decode("utf-8", errors="replace")
+            return {"error": f"rss_parse_error: {exc}", "url": url, "preview": preview}
     return {"items": items, "source": url}
 
 
@@ -266,7 +384,7 @@ def fetch_okx_open_interest_volume(
         "limit": str(limit),
     }
     try:
-        resp = session.get(url, params=params, timeout=HTTP_TIMEOUT)
+        resp = get_source_metrics().get(session, url, params=params, timeout=HTTP_TIMEOUT)
         resp.raise_for_status()
     except requests.RequestException as exc:
         return {"error": str(exc), "url": url, "params": params}
@@ -330,86 +448,62 @@ def fetch_okx_liquidation_summary(
     inst_type: str = "SWAP",
     hours: int = 48,
     batch_limit: int = 100,
+    log_dir: str = LIQUIDATION_LOG_DIR,
 ) -> Dict[str, Any]:
     """
     拉取 OKX 永续合约爆仓订单并按日聚合多空名义金额。
+    与 获取数据.py 共用本地爆仓日志，通常只需请求水位线之后的一两页。
     """
     url = "https://www.okx.com/api/v5/public/liquidation-orders"
     cutoff_ts = datetime.now(timezone.utc) - timedelta(hours=hours)
     cutoff_ms = int(cutoff_ts.timestamp() * 1000)
-    after: Optional[str] = None
-    collected: List[Dict[str, Any]] = []
-    seen: set[int] = set()
+    last_page: Dict[str, Any] = {}
 
-    for _ in range(300):
-        params: Dict[str, Any] = {
-            "instType": inst_type,
-            "uly": uly,
-            "state": "filled",
-            "limit": str(batch_limit),
-        }
-        if after:
-            params["after"] = after
+    def fetch_page(params: Dict[str, Any]) -> Any:
+        last_page["params"] = params
+        resp = get_source_metrics().get(session, url, params=params, timeout=HTTP_TIMEOUT)
+        resp.raise_for_status()
+        payload = resp.json()
+        if isinstance(payload, dict) and payload.get("code") not in (None, "0"):
+            last_page["payload"] = payload
+            raise RuntimeError(payload.get("msg") or payload.get("error_message"))
+        return payload
+
+    try:
+        fills = collect_liquidation_fills(
+            fetch_page, uly, inst_type, cutoff_ms, batch_limit=batch_limit, max_batches=300, log_dir=log_dir
+        )
+    except ValueError:
+        return {"error": "invalid_json", "url": url, "params": last_page.get("params")}
+    except requests.RequestException as exc:
+        return {"error": str(exc), "url": url, "params": last_page.get("params")}
+    except RuntimeError as exc:
+        return {"error": str(exc) or None, "url": url, "params": last_page.get("params"), "raw": last_page.get("payload")}
+
+    collected: List[Dict[str, Any]] = []
+    for detail in fills:
+        ts = fill_ts(detail)
+        side = (detail.get("posSide") or detail.get("side") or "").strip().lower()
+        if ts is None or side not in {"long", "short"}:
+            continue
         try:
-            resp = session.get(url, params=params, timeout=HTTP_TIMEOUT)
-            resp.raise_for_status()
-        except requests.RequestException as exc:
-            return {"error": str(exc), "url": url, "params": params}
+            size = float(detail.get("sz", 0))
+        except (TypeError, ValueError):
+            size = 0.0
+        bk_px = detail.get("bkPx")
         try:
-            payload = resp.json()
-        except ValueError:
-            return {"error": "invalid_json", "url": url, "params": params}
-        if isinstance(payload, dict) and payload.get("code") not in (None, "0"):
-            return {"error": payload.get("msg") or payload.get("error_message"), "url": url, "params": params, "raw": payload}
-
-        data_entries = payload.get("data") if isinstance(payload, dict) else None
-        if not isinstance(data_entries, list):
-            break
-        details: List[Dict[str, Any]] = []
-        for entry in data_entries:
-            entry_details = entry.get("details") if isinstance(entry, dict) else None
-            if isinstance(entry_details, list):
-                details.extend(entry_details)
-        if not details:
-            break
-        oldest_ts: Optional[int] = None
-        for detail in details:
-            ts_raw = detail.get("ts") or detail.get("time")
-            try:
-                ts = int(ts_raw)
-            except (TypeError, ValueError):
-                continue
-            if ts in seen:
-                continue
-            seen.add(ts)
-            if oldest_ts is None or ts < oldest_ts:
-                oldest_ts = ts
-            if ts < cutoff_ms:
-                continue
-            side = (detail.get("posSide") or detail.get("side") or "").strip().lower()
-            if side not in {"long", "short"}:
-                continue
-            try:
-                size = float(detail.get("sz", 0))
-            except (TypeError, ValueError):
-                size = 0.0
-            bk_px = detail.get("bkPx")
-            try:
-                price = float(bk_px)
-            except (TypeError, ValueError):
-                price = None
-            notional = size * price if price is not None else None
-            collected.append(
-                {
-                    "ts": ts,
-                    "side": side,
-                    "size": size,
-                    "notional_usd": notional,
-                }
-            )
-        if oldest_ts is None or len(details) < batch_limit:
-            break
-        after = str(oldest_ts - 1)
+            price = float(bk_px)
+        except (TypeError, ValueError):
+            price = None
+        notional = size * price if price is not None else None
+        collected.append(
+            {
+                "ts": ts,
+                "side": side,
+                "size": size,
+                "notional_usd": notional,
+            }
+        )
 
     aggregated: Dict[str, Dict[str, float]] = defaultdict(lambda: {"long": 0.0, "short": 0.0})
     for item in collected:
@@ -458,7 +552,7 @@ def fetch_blockchair_eth_overview(session: requests.Session) -> Dict[str, Any]:
         "Accept": "application/json",
     }
     try:
-        resp = session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        resp = get_source_metrics().get(session, url, headers=headers, timeout=HTTP_TIMEOUT)
         resp.raise_for_status()
         payload = resp.json()
     except requests.RequestException as exc:
@@ -515,7 +609,7 @@ def fetch_defillama_bridge_flows_simple(session: requests.Session) -> Dict[str,
     """
     url = os.getenv("DEFILLAMA_BRIDGES_URL", "https://bridges.llama.fi/bridges")
     try:
-        resp = session.get(url, timeout=HTTP_TIMEOUT)
+        resp = get_source_metrics().get(session, url, timeout=HTTP_TIMEOUT)
         resp.raise_for_status()
         payload = resp.json()
     except requests.RequestException as exc:
@@ -606,70 +700,76 @@ def _normalize_bridge_protocol(entry: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def _bridge_protocols_from_dataset(
+    data: Any, url: str, chain_param: str
+) -> Tuple[Optional[List[Dict[str, Any]]], Optional[Dict[str, Any]]]:
+    if isinstance(data, dict) and data.get("error"):
+        return None, {"url": url, "detail": data["error"]}
+    candidates: List[Dict[str, Any]] = []
+    if isinstance(data, list):
+        candidates = [d for d in data if isinstance(d, dict)]
+    elif isinstance(data, dict):
+        for key in ("bridges", "data", "protocols"):
+            val = data.get(key)
+            if isinstance(val, list):
+                candidates = [d for d in val if isinstance(d, dict)]
+                break
+    if not candidates:
+        return None, {"url": url, "detail": "no_candidates"}
+    filtered = []
+    for c in candidates:
+        chains_field = c.get("chains")
+        matches_chain = False
+        if isinstance(chains_field, list):
+            matches_chain = chain_param in chains_field or chain_param.lower() in [str(x).lower() for x in chains_field]
+        elif isinstance(chains_field, dict):
+            key_list = list(chains_field.keys())
+            matches_chain = chain_param in key_list or chain_param.lower() in [str(k).lower() for k in key_list]
+        dest_chain = c.get("destinationChain") or c.get("chain")
+        if not matches_chain and isinstance(dest_chain, str):
+            matches_chain = dest_chain.lower() == chain_param.lower()
+        if not matches_chain and isinstance(c.get("name"), str):
+            matches_chain = chain_param.lower() in c["name"].lower()
+        if matches_chain:
+            metrics_source = c.get("stats") or c
+            filtered.append(
+                {
+                    "name": c.get("displayName") or c.get("name"),
+                    "category": c.get("category"),
+                    "tvl": c.get("tvl") or c.get("totalLiquidity"),
+                    "chains": c.get("chains"),
+                    "destination": dest_chain,
+                    "volume_1d": _safe_float(
+                        metrics_source.get("volumePrevDay")
+                        or metrics_source.get("volume_1d")
+                        or metrics_source.get("last24hVolume")
+                        or metrics_source.get("dailyVolume")
+                    ),
+                    "volume_7d": _safe_float(
+                        metrics_source.get("volume_7d") or metrics_source.get("weeklyVolume")
+                    ),
+                    "volume_30d": _safe_float(
+                        metrics_source.get("volume_30d") or metrics_source.get("monthlyVolume")
+                    ),
+                    "net_flow": metrics_source.get("netFlow") or metrics_source.get("netflow"),
+                    "raw": c,
+                }
+            )
+    if filtered:
+        return filtered, None
+    return None, {"url": url, "detail": "no_matching_chain"}
+
+
 def _fallback_bridge_protocols(session: requests.Session, chain_param: str) -> Dict[str, Any]:
-    errors: List[Dict[str, Any]] = []
-    collected: List[Dict[str, Any]] = []
+    def from_mirror(url: str) -> MirrorCandidate:
+        def candidate() -> Tuple[Optional[List[Dict[str, Any]]], Optional[Dict[str, Any]]]:
+            return _bridge_protocols_from_dataset(_fetch_json(session, url), url, chain_param)
 
-    for url in BRIDGES_DATASET_URLS:
-        data = _fetch_json(session, url)
-        if isinstance(data, dict) and data.get("error"):
-            errors.append({"url": url, "detail": data["error"]})
-            continue
-        candidates: List[Dict[str, Any]] = []
-        if isinstance(data, list):
-            candidates = [d for d in data if isinstance(d, dict)]
-        elif isinstance(data, dict):
-            for key in ("bridges", "data", "protocols"):
-                val = data.get(key)
-                if isinstance(val, list):
-                    candidates = [d for d in val if isinstance(d, dict)]
-                    break
-        if not candidates:
-            errors.append({"url": url, "detail": "no_candidates"})
-            continue
-        filtered = []
-        for c in candidates:
-            chains_field = c.get("chains")
-            matches_chain = False
-            if isinstance(chains_field, list):
-                matches_chain = chain_param in chains_field or chain_param.lower() in [str(x).lower() for x in chains_field]
-            elif isinstance(chains_field, dict):
-                key_list = list(chains_field.keys())
-                matches_chain = chain_param in key_list or chain_param.lower() in [str(k).lower() for k in key_list]
-            dest_chain = c.get("destinationChain") or c.get("chain")
-            if not matches_chain and isinstance(dest_chain, str):
-                matches_chain = dest_chain.lower() == chain_param.lower()
-            if not matches_chain and isinstance(c.get("name"), str):
-                matches_chain = chain_param.lower() in c["name"].lower()
-            if matches_chain:
-                metrics_source = c.get("stats") or c
-                filtered.append(
-                    {
-                        "name": c.get("displayName") or c.get("name"),
-                        "category": c.get("category"),
-                        "tvl": c.get("tvl") or c.get("totalLiquidity"),
-                        "chains": c.get("chains"),
-                        "destination": dest_chain,
-                        "volume_1d": _safe_float(
-                            metrics_source.get("volumePrevDay")
-                            or metrics_source.get("volume_1d")
-                            or metrics_source.get("last24hVolume")
-                            or metrics_source.get("dailyVolume")
-                        ),
-                        "volume_7d": _safe_float(
-                            metrics_source.get("volume_7d") or metrics_source.get("weeklyVolume")
-                        ),
-                        "volume_30d": _safe_float(
-                            metrics_source.get("volume_30d") or metrics_source.get("monthlyVolume")
-                        ),
-                        "net_flow": metrics_source.get("netFlow") or metrics_source.get("netflow"),
-                        "raw": c,
-                    }
-                )
-        if filtered:
-            collected.extend(filtered)
-        else:
-            errors.append({"url": url, "detail": "no_matching_chain"})
+        return candidate
+
+    # 各镜像为同一份数据，取优先级最高的可用镜像，避免重复累计
+    collected, errors = _hedged_first([from_mirror(url) for url in BRIDGES_DATASET_URLS])
+    collected = collected or []
     collected.sort(key=lambda x: (x.get("volume_1d") or 0), reverse=True)
     top = collected[:10]
     summary: Dict[str, Any] = {}
@@ -791,15 +891,17 @@ def _fetch_stablecoin_history(session: requests.Session, chain: str, prev_snapsh
         (f"https://stablecoins.llama.fi/api/chain/{chain_slug}", None),
         ("https://stablecoins.llama.fi/api/stablecoins", {"includeChains": "true"}),
     ]
-    attempts: List[Dict[str, Any]] = []
-    for url, params in endpoints:
-        data = _fetch_json(session, url, params)
-        if isinstance(data, dict) and data.get("error"):
-            attempts.append({"url": url, "params": params, "detail": data.get("error")})
-            continue
-        if url.endswith("/stablecoins") and params and params.get("includeChains") == "true":
-            stablecoins = data.get("stablecoins") or data.get("data")
-            if isinstance(stablecoins, list):
+    fetched: Dict[str, Any] = {}
+
+    def from_endpoint(url: str, params: Optional[Dict[str, Any]]) -> MirrorCandidate:
+        def candidate() -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+            data = _fetch_json(session, url, params)
+            if isinstance(data, dict) and data.get("error"):
+                return None, {"url": url, "params": params, "detail": data.get("error")}
+            if url.endswith("/stablecoins") and params and params.get("includeChains") == "true":
+                stablecoins = data.get("stablecoins") or data.get("data")
+                if not isinstance(stablecoins, list):
+                    return None, {"url": url, "params": params, "detail": "no_stablecoins_list"}
                 total = 0.0
                 for coin in stablecoins:
                     chains = coin.get("chains")
@@ -820,33 +922,26 @@ def _fetch_stablecoin_history(session: requests.Session, chain: str, prev_snapsh
                 }
                 # fill change from previous snapshot if available
                 summary = _fill_stablecoin_change_from_previous(chain_slug, summary, prev_snapshot)
-                return {
-                    "source": url,
-                    "params": params,
-                    "raw": data,
-                    "summary": summary,
-                }
-            attempts.append({"url": url, "params": params, "detail": "no_stablecoins_list"})
-            continue
-        series = _extract_series_from_payload(data)
-        if not series and isinstance(data, list):
-            series = [d for d in data if isinstance(d, dict)]
-        if series:
+                return {"source": url, "params": params, "raw": data, "summary": summary}, None
+            series = _extract_series_from_payload(data)
+            if not series and isinstance(data, list):
+                series = [d for d in data if isinstance(d, dict)]
+            if not series:
+                return None, {"url": url, "params": params, "detail": "no_series"}
             summary = _summarize_stablecoin_series(series)
-            if summary:
-                summary = _fill_stablecoin_change_from_previous(chain_slug, summary, prev_snapshot)
-                return {
-                    "source": url,
-                    "params": params,
-                    "raw": data,
-                    "summary": summary,
-                }
-            else:
-                attempts.append({"url": url, "params": params, "detail": "no_summary"})
-                continue
-        attempts.append({"url": url, "params": params, "detail": "no_series"})
-    chains_snapshot = _fetch_json(session, "https://stablecoins.llama.fi/api/stablecoinchains")
-    if isinstance(chains_snapshot.get("data"), list):
+            if not summary:
+                return None, {"url": url, "params": params, "detail": "no_summary"}
+            summary = _fill_stablecoin_change_from_previous(chain_slug, summary, prev_snapshot)
+            return {"source": url, "params": params, "raw": data, "summary": summary}, None
+
+        return candidate
+
+    def from_chains_snapshot() -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        url = "https://stablecoins.llama.fi/api/stablecoinchains"
+        chains_snapshot = _fetch_json(session, url)
+        fetched["chains_snapshot"] = chains_snapshot
+        if not isinstance(chains_snapshot.get("data"), list):
+            return None, {"url": url, "detail": chains_snapshot.get("error") or "no_data"}
         match = next(
             (
                 item
@@ -860,32 +955,30 @@ def _fetch_stablecoin_history(session: requests.Session, chain: str, prev_snapsh
             ),
             None,
         )
-        if match:
-            value = match.get("value") or match.get("totalCirculating") or match.get("total")
-            try:
-                latest_value = round(float(value), 2)
-            except (TypeError, ValueError):
-                latest_value = value
-            summary = {
-                "latest": {"value": latest_value, "timestamp": datetime.now(timezone.utc).isoformat()},
-                "previous": None,
-                "change": None,
-                "note": "Fell back to stablecoincharts; change metrics unavailable.",
-            }
-            summary = _fill_stablecoin_change_from_previous(chain_slug, summary, prev_snapshot)
-            return {
-                "source": "https://stablecoins.llama.fi/api/stablecoinchains",
-                "raw": chains_snapshot,
-                "summary": summary,
-                "attempts": attempts,
-            }
-    for url in STABLECOIN_CHAIN_DATASET_URLS:
-        dataset = _fetch_json(session, url)
-        if not isinstance(dataset, dict) or dataset.get("error"):
-            attempts.append({"url": url, "detail": dataset.get("error") if isinstance(dataset, dict) else "invalid"})
-            continue
-        match = _match_stablecoin_chain_entry(dataset, chain_cap)
-        if match:
+        if not match:
+            return None, {"url": url, "detail": "chain_not_found"}
+        value = match.get("value") or match.get("totalCirculating") or match.get("total")
+        try:
+            latest_value = round(float(value), 2)
+        except (TypeError, ValueError):
+            latest_value = value
+        summary = {
+            "latest": {"value": latest_value, "timestamp": datetime.now(timezone.utc).isoformat()},
+            "previous": None,
+            "change": None,
+            "note": "Fell back to stablecoincharts; change metrics unavailable.",
+        }
+        summary = _fill_stablecoin_change_from_previous(chain_slug, summary, prev_snapshot)
+        return {"source": url, "raw": chains_snapshot, "summary": summary, "attempts": []}, None
+
+    def from_dataset(url: str) -> MirrorCandidate:
+        def candidate() -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+            dataset = _fetch_json(session, url)
+            if not isinstance(dataset, dict) or dataset.get("error"):
+                return None, {"url": url, "detail": dataset.get("error") if isinstance(dataset, dict) else "invalid"}
+            match = _match_stablecoin_chain_entry(dataset, chain_cap)
+            if not match:
+                return None, {"url": url, "detail": "chain_not_found"}
             latest_value = _safe_float(match.get("latestValue") or match.get("value") or match.get("total"))
             change_24h = _safe_float(match.get("change_24h") or match.get("change24h") or match.get("change1d"))
             timestamp = match.get("timestamp") or dataset.get("timestamp")
@@ -900,17 +993,16 @@ def _fetch_stablecoin_history(session: requests.Session, chain: str, prev_snapsh
             if change_24h is None:
                 summary["note"] = "Dataset snapshot provided without change metrics."
             summary = _fill_stablecoin_change_from_previous(chain_slug, summary, prev_snapshot)
-            return {
-                "source": url,
-                "raw": dataset,
-                "summary": summary,
-                "attempts": attempts,
-            }
-        attempts.append({"url": url, "detail": "chain_not_found"})
+            return {"source": url, "raw": dataset, "summary": summary, "attempts": []}, None
 
-    # Additional fallback: use stablecoins aggregated endpoint to compute chain totalCirculatingUSD
-    sc_fallback = _fetch_json(session, "https://stablecoins.llama.fi/stablecoins")
-    if isinstance(sc_fallback.get("chains"), list):
+        return candidate
+
+    def from_chain_totals() -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        # Additional fallback: use stablecoins aggregated endpoint to compute chain totalCirculatingUSD
+        url = "https://stablecoins.llama.fi/stablecoins"
+        sc_fallback = _fetch_json(session, url)
+        if not isinstance(sc_fallback.get("chains"), list):
+            return None, {"url": url, "detail": sc_fallback.get("error") or "no_chains"}
         # try exact name match (case-insensitive)
         entry = None
         for e in sc_fallback["chains"]:
@@ -918,32 +1010,41 @@ def _fetch_stablecoin_history(session: requests.Session, chain: str, prev_snapsh
             if name.lower() == chain_slug:
                 entry = e
                 break
-        if entry:
-            tc = entry.get("totalCirculatingUSD")
-            total = None
-            if isinstance(tc, dict):
-                nums = [v for v in tc.values() if isinstance(v, (int, float))]
-                if nums:
-                    total = sum(nums)
-            if total is not None:
-                summary = {
-                    "latest": {"value": round(float(total), 2), "timestamp": datetime.now(timezone.utc).isoformat()},
-                    "previous": None,
-                    "change": None,
-                    "note": "Computed from stablecoins.llama.fi/stablecoins (chain-level totalCirculatingUSD).",
-                }
-                summary = _fill_stablecoin_change_from_previous(chain_slug, summary, prev_snapshot)
-                attempts.append({"url": "https://stablecoins.llama.fi/stablecoins", "detail": "used_chain_total"})
-                return {
-                    "source": "https://stablecoins.llama.fi/stablecoins",
-                    "raw": sc_fallback,
-                    "summary": summary,
-                    "attempts": attempts,
-                }
-        else:
-            attempts.append({"url": "https://stablecoins.llama.fi/stablecoins", "detail": "chain_not_found"})
-
-    return {"error": "stablecoin_series_not_found", "attempts": attempts, "chains_snapshot": chains_snapshot}
+        if not entry:
+            return None, {"url": url, "detail": "chain_not_found"}
+        tc = entry.get("totalCirculatingUSD")
+        total = None
+        if isinstance(tc, dict):
+            nums = [v for v in tc.values() if isinstance(v, (int, float))]
+            if nums:
+                total = sum(nums)
+        if total is None:
+            return None, {"url": url, "detail": "no_chain_total"}
+        summary = {
+            "latest": {"value": round(float(total), 2), "timestamp": datetime.now(timezone.utc).isoformat()},
+            "previous": None,
+            "change": None,
+            "note": "Computed from stablecoins.llama.fi/stablecoins (chain-level totalCirculatingUSD).",
+        }
+        summary = _fill_stablecoin_change_from_previous(chain_slug, summary, prev_snapshot)
+        return {
+            "source": url,
+            "raw": sc_fallback,
+            "summary": summary,
+            "attempts": [{"url": url, "detail": "used_chain_total"}],
+        }, None
+
+    # 按原有优先级排列全部镜像与兜底数据源，对冲请求以限制慢镜像造成的尾延迟
+    candidates: List[MirrorCandidate] = [from_endpoint(url, params) for url, params in endpoints]
+    candidates.append(from_chains_snapshot)
+    candidates.extend(from_dataset(url) for url in STABLECOIN_CHAIN_DATASET_URLS)
+    candidates.append(from_chain_totals)
+    result, attempts = _hedged_first(candidates)
+    if result is not None:
+        if "attempts" in result:
+            result["attempts"] = attempts + result["attempts"]
+        return result
+    return {"error": "stablecoin_series_not_found", "attempts": attempts, "chains_snapshot": fetched.get("chains_snapshot")}
 
 
 def fetch_defillama_flows(session: requests.Session, chain: str = "Ethereum") -> Dict[str, Any]:
@@ -985,7 +1086,8 @@ def fetch_defillama_flows(session: requests.Session, chain: str = "Ethereum") ->
     if not highlights:
         fallback_protocols = _fallback_bridge_protocols(session, chain_param)
 
-    stablecoin_info = _fetch_stablecoin_history(session, chain_param, prev_snapshot=prev_snapshot)
+    with source_scope("stablecoin_history"):
+        stablecoin_info = _fetch_stablecoin_history(session, chain_param, prev_snapshot=prev_snapshot)
 
     notes: List[str] = []
     if isinstance(overview, dict) and overview.get("error"):
@@ -1179,7 +1281,10 @@ def fetch_eth_gas_etherscan(session: requests.Session, api_key: Optional[str]) -
                 "method": "eth_feeHistory",
                 "params": [10, "latest", [10, 50, 90]],
             }
-            cf_resp = session.post("https://cloudflare-eth.com", json=cf_req, timeout=HTTP_TIMEOUT)
+            metrics = get_source_metrics()
+            with metrics.call("https://cloudflare-eth.com") as record:
+                cf_resp = session.post("https://cloudflare-eth.com", json=cf_req, timeout=HTTP_TIMEOUT)
+                metrics.observe(record, cf_resp)
             cf = cf_resp.json()
             if isinstance(cf.get("result"), dict):
                 cf_fallback = cf["result"]
@@ -1293,7 +1398,12 @@ def fetch_eth_gas_etherscan(session: requests.Session, api_key: Optional[str]) -
     }
 
 
-def gather_news(session: requests.Session) -> Dict[str, Any]:
+def gather_news(
+    session: requests.Session, store_path: str = NEWS_STORE_PATH, top_n: int = NEWS_TOP_N
+) -> Dict[str, Any]:
+    """
+    并发拉取 RSS 与 CryptoCompare，仅将未见过的新闻写入本地新闻库，快照取各主题最新 top_n 条。
+    """
     feeds = {
         "bitcoin": [
             "https://www.coindesk.com/tag/bitcoin/rss/",
@@ -1309,35 +1419,48 @@ def gather_news(session: requests.Session) -> Dict[str, Any]:
         ],
     }
     news: Dict[str, Any] = {}
-    crypto_compare_cache = _fetch_cryptocompare_news(session, categories="BTC,ETH", lang="EN", limit=30)
-    for topic, urls in feeds.items():
-        topic_items: List[Dict[str, Any]] = []
-        errors: List[Dict[str, Any]] = []
-        for url in urls:
-            result = _fetch_rss_items(session, url, limit=5)
-            if "items" in result:
-                topic_items.extend(result["items"])
-            else:
-                errors.append(result)
-        topic_items.sort(key=lambda x: x.get("published", ""), reverse=True)
-        if topic == "general" and "items" in crypto_compare_cache:
-            topic_items.extend(crypto_compare_cache["items"])
-        topic_items.sort(key=lambda x: x.get("published", ""), reverse=True)
-        note = None
-        if not topic_items and errors:
-            note = "所有新闻源均拉取失败，可能需要代理或额外认证。"
-        extra_errors: List[Dict[str, Any]] = []
-        if topic == "general" and crypto_compare_cache.get("error"):
-            extra_errors.append(crypto_compare_cache)
-        news[topic] = {
-            "items": topic_items[:10],
-            "errors": errors + extra_errors,
-            "note": note,
+    # 六个 RSS 源与 CryptoCompare 并发拉取，结果仍按原有顺序合并
+    urls_in_order = [url for urls in feeds.values() for url in urls]
+    with ThreadPoolExecutor(max_workers=len(urls_in_order) + 1, thread_name_prefix="news") as executor:
+        crypto_compare_future = executor.submit(
+            contextvars.copy_context().run, _fetch_cryptocompare_news, session, categories="BTC,ETH", lang="EN", limit=30
+        )
+        rss_futures = {
+            url: executor.submit(contextvars.copy_context().run, _fetch_rss_items, session, url, limit=5)
+            for url in urls_in_order
         }
-    if "items" in crypto_compare_cache and crypto_compare_cache["items"]:
-        news["cryptocompare"] = crypto_compare_cache
-    else:
-        news["cryptocompare"] = crypto_compare_cache
+        crypto_compare_cache = crypto_compare_future.result()
+        rss_results = {url: future.result() for url, future in rss_futures.items()}
+    # 新条目写入本地新闻库（跨来源去重），各主题最新条目由库中按发布时间索引查询
+    with NewsStore(store_path) as store:
+        for topic, urls in feeds.items():
+            errors: List[Dict[str, Any]] = []
+            added = 0
+            for url in urls:
+                result = rss_results[url]
+                if "items" in result:
+                    added += store.add([topic], result["items"], feed=url)
+                else:
+                    errors.append(result)
+            if topic == "general" and "items" in crypto_compare_cache:
+                added += store.add(["general", "cryptocompare"], crypto_compare_cache["items"], feed="CryptoCompare")
+            topic_items = store.top(topic, top_n)
+            note = None
+            if not topic_items and errors:
+                note = "所有新闻源均拉取失败，可能需要代理或额外认证。"
+            extra_errors: List[Dict[str, Any]] = []
+            if topic == "general" and crypto_compare_cache.get("error"):
+                extra_errors.append(crypto_compare_cache)
+            news[topic] = {
+                "items": topic_items,
+                "new_items": added,
+                "errors": errors + extra_errors,
+                "note": note,
+            }
+        cryptocompare = {key: value for key, value in crypto_compare_cache.items() if key != "items"}
+        if "items" in crypto_compare_cache:
+            cryptocompare["items"] = store.top("cryptocompare", top_n)
+        news["cryptocompare"] = cryptocompare
     return news
 
 
@@ -1572,20 +1695,127 @@ def build_daily_report(
     }
 
 
-def aggregate_snapshot(session: requests.Session) -> Dict[str, Any]:
+def _run_sources(
+    tasks: Dict[str, Callable[[], Dict[str, Any]]],
+    max_workers: int = SNAPSHOT_MAX_WORKERS,
+    deadline: float = SNAPSHOT_SOURCE_DEADLINE,
+) -> tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    在有界线程池中并发执行互不依赖的数据源，返回 (结果, 失败的数据源名称)。
+    每个数据源自开始执行起最多等待 deadline 秒；超时或抛出异常的数据源以 {"error": ...} 占位，
+    其余数据源的结果照常返回，保证快照仍可写出。max_workers <= 1 时按原顺序串行执行。
+    各数据源的墙钟耗时与其中每次请求的计量记录在 get_source_metrics() 中。
+    """
+    metrics = get_source_metrics()
+    started: Dict[str, float] = {}
+
+    def _wrap(name: str, func: Callable[[], Dict[str, Any]]) -> Callable[[], Dict[str, Any]]:
+        def runner() -> Dict[str, Any]:
+            started[name] = time.monotonic()
+            error = None
+            try:
+                with source_scope(name):
+                    return func()
+            except Exception as exc:
+                error = type(exc).__name__
+                raise
+            finally:
+                metrics.record_source(name, time.monotonic() - started[name], error)
+
+        return runner
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        return {name: _wrap(name, func)() for name, func in tasks.items()}, []
+
+    workers = min(max_workers, len(tasks))
+
+    results: Dict[str, Dict[str, Any]] = {}
+    failed: List[str] = []
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot")
+    futures: Dict[Future, str] = {executor.submit(_wrap(name, func)): name for name, func in tasks.items()}
+    pending = set(futures)
+    # 排队中的数据源无法单独计时，整体再给一个按批次估算的兜底截止时间
+    hard_stop = time.monotonic() + deadline * -(-len(tasks) // workers)
+    try:
+        while pending:
+            now = time.monotonic()
+            expired = {
+                fut
+                for fut in pending
+                if now >= hard_stop or (futures[fut] in started and now - started[futures[fut]] >= deadline)
+            }
+            for fut in expired:
+                fut.cancel()
+                name = futures[fut]
+                results[name] = {"error": "timeout", "source": name, "deadline_s": deadline}
+                metrics.record_source(name, now - started.get(name, now), "timeout")
+                failed.append(name)
+                print(f"数据源 {name} 超过 {deadline:.0f}s 未返回，已跳过。")
+            pending -= expired
+            if not pending:
+                break
+            checkpoints = [started[futures[fut]] + deadline for fut in pending if futures[fut] in started]
+            timeout = min(checkpoints + [hard_stop]) - now
+            done, pending = wait(pending, timeout=max(timeout, 0.05), return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = futures[fut]
+                try:
+                    results[name] = fut.result()
+                except Exception as exc:
+                    results[name] = {"error": f"{type(exc).__name__}: {exc}", "source": name}
+                    failed.append(name)
+                    print(f"数据源 {name} 拉取异常：{exc}")
+    finally:
+        # 不等待超时线程结束；它们各自受 HTTP_TIMEOUT 约束，结果将被丢弃
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results, failed
+
+
+def aggregate_snapshot(
+    session: requests.Session,
+    max_workers: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> Dict[str, Any]:
     timestamp = datetime.now(timezone.utc).isoformat()
-    ethereum_flows = fetch_defillama_flows(session, "Ethereum")
-    bitcoin_flows = fetch_defillama_flows(session, "Bitcoin")
-    ethereum_metrics = fetch_blockchair_metrics(session, "ethereum")
-    bitcoin_metrics = fetch_blockchair_metrics(session, "bitcoin")
-    btc_mempool = fetch_bitcoin_mempool(session)
-    eth_gas = fetch_eth_gas_etherscan(session, os.environ.get("ETHERSCAN_API_KEY"))
-    news = gather_news(session)
-    fear_greed = fetch_fear_greed_index(session, limit=15)
-    blockchair_overview = fetch_blockchair_eth_overview(session)
-    eth_open_interest = fetch_okx_open_interest_volume(session, ccy="ETH", inst_type="SWAP", period="1D", limit=120)
-    eth_liquidations = fetch_okx_liquidation_summary(session, uly="ETH-USDT", inst_type="SWAP", hours=72)
-    bridge_simple = fetch_defillama_bridge_flows_simple(session)
+    metrics = get_source_metrics()
+    metrics.reset()
+    # 先在主线程加载上一份快照，避免各线程重复读取
+    _load_previous_snapshot()
+    tasks: Dict[str, Callable[[], Dict[str, Any]]] = {
+        "ethereum_flows": lambda: fetch_defillama_flows(session, "Ethereum"),
+        "bitcoin_flows": lambda: fetch_defillama_flows(session, "Bitcoin"),
+        "ethereum_metrics": lambda: fetch_blockchair_metrics(session, "ethereum"),
+        "bitcoin_metrics": lambda: fetch_blockchair_metrics(session, "bitcoin"),
+        "btc_mempool": lambda: fetch_bitcoin_mempool(session),
+        "eth_gas": lambda: fetch_eth_gas_etherscan(session, os.environ.get("ETHERSCAN_API_KEY")),
+        "news": lambda: gather_news(session),
+        "fear_greed": lambda: fetch_fear_greed_index(session, limit=15),
+        "blockchair_overview": lambda: fetch_blockchair_eth_overview(session),
+        "eth_open_interest": lambda: fetch_okx_open_interest_volume(
+            session, ccy="ETH", inst_type="SWAP", period="1D", limit=120
+        ),
+        "eth_liquidations": lambda: fetch_okx_liquidation_summary(
+            session, uly="ETH-USDT", inst_type="SWAP", hours=72
+        ),
+        "bridge_simple": lambda: fetch_defillama_bridge_flows_simple(session),
+    }
+    results, failed_sources = _run_sources(
+        tasks,
+        max_workers=SNAPSHOT_MAX_WORKERS if max_workers is None else max_workers,
+        deadline=SNAPSHOT_SOURCE_DEADLINE if deadline is None else deadline,
+    )
+    ethereum_flows = results["ethereum_flows"]
+    bitcoin_flows = results["bitcoin_flows"]
+    ethereum_metrics = results["ethereum_metrics"]
+    bitcoin_metrics = results["bitcoin_metrics"]
+    btc_mempool = results["btc_mempool"]
+    eth_gas = results["eth_gas"]
+    news = results["news"]
+    fear_greed = results["fear_greed"]
+    blockchair_overview = results["blockchair_overview"]
+    eth_open_interest = results["eth_open_interest"]
+    eth_liquidations = results["eth_liquidations"]
+    bridge_simple = results["bridge_simple"]
     bridge_top_n = int(os.getenv("BRIDGE_TOP_N", "5"))
     daily_report = build_daily_report(
         ethereum_flows,
@@ -1622,101 +1852,145 @@ def aggregate_snapshot(session: requests.Session) -> Dict[str, Any]:
             }
         },
         "daily_report": daily_report,
+        "incomplete_sources": sorted(failed_sources),
+        "timings": metrics.summary(),
     }
 
 
-def save_snapshot(data: Dict[str, Any], output_path: Path = DEFAULT_OUTPUT) -> Path:
-    output_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    return output_path
+def _raw_blob_path(raw_dir: Path, digest: str) -> Path:
+    return raw_dir / f"{digest}.json.gz"
 
 
-def main() -> None:
-    session = _build_session()
-    snapshot = aggregate_snapshot(session)
-    path = save_snapshot(snapshot, DEFAULT_OUTPUT)
-    print(f"快照已生成：{path}（UTC {snapshot['generated_at']}）")
+def _archive_raw_payload(value: Any, raw_dir: Path) -> Dict[str, Any]:
+    """
+    将单个原始响应写入内容寻址归档（已存在则跳过），返回替代原值的引用。
+    gzip 头部 mtime 固定为 0，相同内容得到相同文件，自动提交时不会产生无意义的变更。
+    """
+    blob = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(blob).hexdigest()
+    path = _raw_blob_path(raw_dir, digest)
+    if not path.exists():
+        raw_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            f.write(gzip.compress(blob, compresslevel=9, mtime=0))
+        os.replace(tmp_path, path)
+    return {"archived": digest, "bytes": len(blob)}
 
 
-if __name__ == "__main__":
-    main()
+def _is_raw_ref(value: Any) -> bool:
+    return isinstance(value, dict) and set(value) == {"archived", "bytes"}
 
 
-def fetch_fear_greed_index(session: requests.Session, limit: int = 15) -> Dict[str, Any]:
-    resp = _fetch_json(session, "https://api.alternative.me/fng/", params={"limit": str(limit)})
-    series: List[Dict[str, Any]] = []
-    data = resp.get("data") if isinstance(resp, dict) else None
+def _replace_at(data: Any, path: Tuple[str, ...], replace: Callable[[Any], Any]) -> Any:
+    """
+    沿 path 逐层复制字典，并以 replace 的返回值替换末端的值；路径不存在时原样返回。
+    """
+    if not isinstance(data, dict):
+        return data
+    head, rest = path[0], path[1:]
+    keys = list(data) if head == "*" else [head] if head in data else []
+    if not keys:
+        return data
+    copied = dict(data)
+    for key in keys:
+        copied[key] = _replace_at(data[key], rest, replace) if rest else replace(data[key])
+    return copied
+
+
+def strip_raw_payloads(data: Any, raw_dir: Path = SNAPSHOT_RAW_DIR, refs: Optional[set] = None) -> Any:
+    """
+    复制快照，将 RAW_PAYLOAD_PATHS 处的原始响应替换为归档引用；refs 收集本次引用到的哈希。
+    """
+
+    def archive(value: Any) -> Any:
+        if value is None or _is_raw_ref(value):
+            return value
+        ref = _archive_raw_payload(value, raw_dir)
+        if refs is not None:
+            refs.add(ref["archived"])
+        return ref
+
+    for path in RAW_PAYLOAD_PATHS:
+        data = _replace_at(data, path, archive)
+    return data
+
+
+def load_raw_payload(ref: Dict[str, Any], raw_dir: Path = SNAPSHOT_RAW_DIR) -> Any:
+    """按需读取精简快照中某个引用对应的原始响应。"""
+    with gzip.open(_raw_blob_path(raw_dir, ref["archived"]), "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def restore_raw_payloads(data: Any, raw_dir: Path = SNAPSHOT_RAW_DIR) -> Any:
+    """
+    将精简快照还原为包含全部原始响应的完整结构（缺失的归档保留引用）。
+    按引用本身识别而不限定位置，旧版本在其它位置写出的引用同样可以还原。
+    """
+    if _is_raw_ref(data):
+        try:
+            return load_raw_payload(data, raw_dir)
+        except (OSError, ValueError):
+            return data
+    if isinstance(data, dict):
+        return {key: restore_raw_payloads(value, raw_dir) for key, value in data.items()}
     if isinstance(data, list):
-        for item in data:
-            val = item.get("value")
-            try:
-                val_f = float(val) if val is not None else None
-            except (TypeError, ValueError):
-                val_f = None
-            series.append({
-                "timestamp": item.get("timestamp"),
-                "value": val_f,
-                "classification": item.get("value_classification"),
-            })
-    latest = series[0] if series else None
-    return {"source": "https://api.alternative.me/fng/", "raw": resp, "latest": latest, "series": series}
+        return [restore_raw_payloads(item, raw_dir) for item in data]
+    return data
+
+
+def _prune_raw_archive(raw_dir: Path, keep: set) -> int:
+    """删除不再被当前快照引用的归档文件，返回删除数量。"""
+    removed = 0
+    if not raw_dir.is_dir():
+        return removed
+    for path in raw_dir.glob("*.json.gz"):
+        if path.name[: -len(".json.gz")] not in keep:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def save_snapshot(
+    data: Dict[str, Any],
+    output_path: Path = DEFAULT_OUTPUT,
+    lean: bool = SNAPSHOT_LEAN,
+    raw_dir: Path = SNAPSHOT_RAW_DIR,
+) -> Path:
+    if lean:
+        refs: set = set()
+        data = strip_raw_payloads(data, raw_dir, refs)
+        _prune_raw_archive(raw_dir, refs)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, output_path)
+    return output_path
 
 
-def _bridge_topN(flows: Dict[str, Any], top_n: int = 5) -> List[Dict[str, Any]]:
-    protos: List[Dict[str, Any]] = []
-    if isinstance(flows.get("bridge_top_protocols"), list) and flows["bridge_top_protocols"]:
-        protos = flows["bridge_top_protocols"]
-    elif isinstance(flows.get("bridge_fallback"), dict) and isinstance(flows["bridge_fallback"].get("protocols"), list):
-        protos = flows["bridge_fallback"]["protocols"]
-    def vol1d(p: Dict[str, Any]) -> float:
-        v = p.get("volume_1d")
-        return float(v) if isinstance(v, (int, float)) else 0.0
-    protos_sorted = sorted(protos, key=vol1d, reverse=True)
-    return [{
-        "name": p.get("name"),
-        "volume_1d": p.get("volume_1d"),
-        "volume_7d": p.get("volume_7d"),
-        "volume_30d": p.get("volume_30d"),
-    } for p in protos_sorted[:top_n]]
+def run_snapshot(output_path: Path = DEFAULT_OUTPUT) -> Dict[str, Any]:
+    """
+    聚合快照并写盘，追加计量日志并打印数据源耗时、缓存与 OKX 统计；返回快照本身。
+    """
+    session = _build_session()
+    snapshot = aggregate_snapshot(session)
+    path = save_snapshot(snapshot, output_path)
+    print(f"快照已生成：{path}（UTC {snapshot['generated_at']}）")
+    get_source_metrics().write_jsonl(snapshot["generated_at"], snapshot["timings"])
+    timing_stats = format_source_metrics(snapshot["timings"])
+    if timing_stats:
+        print(timing_stats)
+    cache_stats = format_cache_stats(session.cache)
+    if cache_stats:
+        print(cache_stats)
+    okx_stats = format_okx_stats()
+    if okx_stats:
+        print(okx_stats)
+    return snapshot
 
 
-def build_daily_report(defi_eth: Dict[str, Any], defi_btc: Dict[str, Any], fear: Dict[str, Any], top_n: int = 5) -> Dict[str, Any]:
-    def fmt_sc(sc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-        summ = sc.get("summary") if isinstance(sc, dict) else None
-        latest = summ.get("latest") if isinstance(summ, dict) else None
-        change = summ.get("change") if isinstance(summ, dict) else None
-        previous = summ.get("previous") if isinstance(summ, dict) else None
-        note = summ.get("note") if isinstance(summ, dict) else None
-        return {"latest": latest, "previous": previous, "change": change, "note": note}
-    eth_sc = fmt_sc(defi_eth.get("stablecoin"))
-    btc_sc = fmt_sc(defi_btc.get("stablecoin"))
-    eth_top = _bridge_topN(defi_eth, top_n)
-    btc_top = _bridge_topN(defi_btc, top_n)
-    eth_sum = defi_eth.get("bridge_summary")
-    btc_sum = defi_btc.get("bridge_summary")
-    fear_latest = fear.get("latest")
-    eth_latest_val = eth_sc.get('latest')
-    eth_latest_val = eth_latest_val.get('value') if isinstance(eth_latest_val, dict) else None
-    btc_latest_val = btc_sc.get('latest') if isinstance(btc_sc, dict) else None
-    btc_latest_val = btc_latest_val.get('value') if isinstance(btc_latest_val, dict) else None
-    sc_para = f"稳定币 — ETH 最新: {eth_latest_val}, 环比: {eth_sc.get('change')}。"
-    eth_top_str = ", ".join([f"{p.get('name')}: {p.get('volume_1d')}" for p in eth_top])
-    btc_top_str = ", ".join([f"{p.get('name')}: {p.get('volume_1d')}" for p in btc_top])
-    bridges_para = (
-        f"桥接 — ETH 量 (1d/7d/30d): {tuple((eth_sum or {}).get(k) for k in ('volume_1d','volume_7d','volume_30d'))}; "
-        f"Top {top_n}: {eth_top_str}。 "
-        f"BTC 量 (1d/7d/30d): {tuple((btc_sum or {}).get(k) for k in ('volume_1d','volume_7d','volume_30d'))}; "
-        f"Top {top_n}: {btc_top_str}."
-    )
-    fear_para = (
-        f"BTC 恐慌指数 — 最新值: {fear_latest.get('value') if isinstance(fear_latest, dict) else None}, "
-        f"分类: {fear_latest.get('classification') if isinstance(fear_latest, dict) else None} (近 {len(fear.get('series') or [])} 天)。"
-    )
-    return {
-        "stablecoins": {"ethereum": eth_sc, "bitcoin": btc_sc, "paragraph": sc_para},
-        "bridges": {
-            "ethereum": {"summary": eth_sum, "top": eth_top},
-            "bitcoin": {"summary": btc_sum, "top": btc_top},
-            "paragraph": bridges_para,
-        },
-        "fear_greed": {"series": fear.get("series"), "latest": fear_latest, "paragraph": fear_para},
-    }
+def main() -> None:
+    run_snapshot(DEFAULT_OUTPUT)
+
+
+if __name__ == "__main__":
+    main()
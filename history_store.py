@@ -0,0 +1,162 @@
+"""
+按日的衍生品历史库：SQLite 存储开仓量与爆仓日聚合，保留全部历史，JSON 导出文件由窗口查询生成。
+
+- 每个序列以 "品种:数据集" 命名（如 ETH-USDT:open_interest，见 series_name），与导出文件的路径无关，
+  按 (series, date) 主键存储一行 JSON；
+- 写入为 upsert，内容未变的日期不改写，写入量只与新增 / 变化的天数有关，与历史长度无关；
+- 序列为空时先从既有的 JSON 导出文件导入，升级后不丢失已有历史；
+- 导出文件先写临时文件再 os.replace，读取方不会看到写了一半的 JSON。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# 历史库路径，设为空字符串时仅在内存中合并（每次从既有导出文件导入），不保留超出导出窗口的历史
+HISTORY_STORE_PATH = os.getenv("HISTORY_STORE_PATH", "data/history.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_history (
+    series TEXT NOT NULL,
+    date TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (series, date)
+) WITHOUT ROWID;
+"""
+
+
+def series_name(symbol: str, dataset: str) -> str:
+    return f"{symbol.upper()}:{dataset}"
+
+
+def _finite(value: Any) -> Any:
+    # NaN / inf 存为 null，单个异常的上游数值不影响整批写入
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _encode(row: Dict[str, Any], fields: Optional[Sequence[str]]) -> str:
+    keys = fields if fields else [key for key in row if key != "date"]
+    values = {key: _finite(row.get(key)) for key in keys}
+    return json.dumps(values, sort_keys=True, separators=(",", ":"), allow_nan=False)
+
+
+def write_json_atomic(rows: Any, path: str) -> None:
+    """
+    先写同目录下的临时文件，再原子替换目标文件。
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, target)
+
+
+class HistoryStore:
+    """
+    历史库；单连接加锁，可在多个线程间共享。
+    """
+
+    def __init__(self, path: str = HISTORY_STORE_PATH) -> None:
+        self.path = path or ":memory:"
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def upsert(self, series: str, rows: Iterable[Dict[str, Any]], fields: Optional[Sequence[str]] = None) -> int:
+        """
+        写入带 "date"（YYYY-MM-DD）的行；fields 为需要保存的字段（缺省为 date 之外的全部字段）。
+        只改写内容有变化的日期，返回新增或更新的行数。
+        """
+        now = time.time()
+        params = [(series, row["date"], _encode(row, fields), now) for row in rows if row.get("date")]
+        if not params:
+            return 0
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO daily_history (series, date, payload, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (series, date) DO UPDATE SET payload = excluded.payload, updated_at = excluded.updated_at "
+                "WHERE daily_history.payload != excluded.payload",
+                params,
+            )
+            return self._conn.total_changes - before
+
+    def query(
+        self,
+        series: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        按日期升序返回序列中 [since, until) 范围内的行；limit 取其中最新的 limit 天。
+        fields 指定输出字段及其顺序（缺省按字段名排序输出全部字段）。
+        """
+        clauses = ["series = ?"]
+        params: List[Any] = [series]
+        if since is not None:
+            clauses.append("date >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("date < ?")
+            params.append(until)
+        sql = "SELECT date, payload FROM daily_history WHERE " + " AND ".join(clauses) + " ORDER BY date DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        result: List[Dict[str, Any]] = []
+        for date, payload in reversed(rows):
+            values = json.loads(payload)
+            if fields:
+                values = {key: values.get(key) for key in fields}
+            result.append({"date": date, **values})
+        return result
+
+    def count(self, series: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM daily_history WHERE series = ?", (series,)).fetchone()[0]
+
+    def import_json(self, series: str, path: str, fields: Optional[Sequence[str]] = None) -> int:
+        """
+        序列为空时导入既有导出文件（[{"date": ..., ...}, ...]），返回导入行数；文件缺失或损坏时忽略。
+        """
+        if self.count(series) or not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+        except (OSError, json.JSONDecodeError) as exc:
+            print(f"读取既有导出文件 {path} 失败：{exc}，历史库从空序列开始。")
+            return 0
+        if not isinstance(existing, list):
+            return 0
+        rows = [row for row in existing if isinstance(row, dict) and isinstance(row.get("date"), str)]
+        return self.upsert(series, rows, fields)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,365 @@
+"""
+本地 HTTP 响应缓存：SQLite 存储，按 URL + 查询参数（+ 显式请求头）作为键。
+
+- 新鲜期内（按域名配置的 TTL）直接返回缓存，不发请求；
+- 过期后若有 ETag / Last-Modified，带 If-None-Match / If-Modified-Since 条件请求，304 时续期复用；
+- 上游网络错误、429 或 5xx 时，在 stale_if_error 时限内回退到过期缓存；
+- 总大小超过 max_bytes 时按最近访问时间（LRU）淘汰。
+
+CachedSession 是 requests.Session 的子类，只缓存 GET，其余方法原样透传。
+返回的 Response 带 from_cache 属性与 X-Cache 头（HIT / REVALIDATED / STALE / MISS）。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "data/http_cache.sqlite")
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "300"))
+HTTP_CACHE_STALE_IF_ERROR = float(os.getenv("HTTP_CACHE_STALE_IF_ERROR", "86400"))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# 各数据源的新鲜期（秒）；可用 HTTP_CACHE_TTLS="www.okx.com=30,mempool.space=10" 覆盖或补充
+DEFAULT_SOURCE_TTLS: Dict[str, float] = {
+    "www.okx.com": 60,
+    "mempool.space": 60,
+    "api.etherscan.io": 30,
+    "api.blockchair.com": 300,
+    "api.llama.fi": 900,
+    "bridges.llama.fi": 900,
+    "stablecoins.llama.fi": 900,
+    "datasets.llama.fi": 3600,
+    "defillama-datasets.llama.fi": 3600,
+    "api.alternative.me": 1800,
+    "min-api.cryptocompare.com": 600,
+    "www.coindesk.com": 600,
+    "cointelegraph.com": 600,
+    "decrypt.co": 600,
+    "news.bitcoin.com": 600,
+}
+
+# 凭据类查询参数：缓存键与存储的 URL 中只保留占位符，缓存文件不含 API Key
+CREDENTIAL_PARAMS = frozenset({"apikey", "api_key", "key", "token", "access_token"})
+REDACTED = "REDACTED"
+
+# 存入缓存时去掉的响应头：缓存的是解压后的正文，长度与编码信息不再适用
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+
+def parse_source_ttls(spec: str) -> Dict[str, float]:
+    """
+    解析 "host=秒,host=秒" 形式的 TTL 配置，忽略格式不正确的项。
+    """
+    ttls: Dict[str, float] = {}
+    for item in spec.split(","):
+        host, sep, value = item.partition("=")
+        if not sep:
+            continue
+        try:
+            ttls[host.strip().lower()] = float(value)
+        except ValueError:
+            continue
+    return ttls
+
+
+def _redact_query(query: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return [(k, REDACTED if k.lower() in CREDENTIAL_PARAMS else v) for k, v in query]
+
+
+def redact_url(url: str) -> str:
+    """
+    把 URL 查询串中的凭据参数值替换为占位符。
+    """
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = _redact_query(parse_qsl(parts.query, keep_blank_values=True))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+def cache_key(url: str, params: Optional[Any] = None, headers: Optional[Mapping[str, str]] = None) -> str:
+    """
+    规范化缓存键：合并 URL 自带与 params 中的查询参数并排序（凭据参数的值替换为占位符），
+    附加调用方显式传入的请求头。
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if isinstance(params, Mapping):
+        query.extend((str(k), str(v)) for k, v in params.items() if v is not None)
+    elif params:
+        query.extend((str(k), str(v)) for k, v in params)
+    query = _redact_query(query)
+    normalized = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(sorted(query)), ""))
+    if headers:
+        extra = json.dumps(sorted((k.lower(), str(v)) for k, v in headers.items()), ensure_ascii=False)
+        return f"{normalized}\n{extra}"
+    return normalized
+
+
+class HttpCache:
+    """
+    SQLite 响应存储；单连接加锁，可被线程池中的多个抓取任务共享。
+    """
+
+    def __init__(
+        self,
+        path: str = HTTP_CACHE_PATH,
+        default_ttl: float = HTTP_CACHE_TTL,
+        source_ttls: Optional[Mapping[str, float]] = None,
+        stale_if_error: float = HTTP_CACHE_STALE_IF_ERROR,
+        max_bytes: int = HTTP_CACHE_MAX_BYTES,
+    ) -> None:
+        self.path = path
+        self.default_ttl = default_ttl
+        self.source_ttls = dict(DEFAULT_SOURCE_TTLS if source_ttls is None else source_ttls)
+        self.stale_if_error = stale_if_error
+        self.max_bytes = max_bytes
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._purge_credentials()
+
+    @classmethod
+    def from_env(cls) -> Optional["HttpCache"]:
+        """
+        按环境变量创建缓存；HTTP_CACHE_PATH 为空时禁用，打开失败时同样退回无缓存。
+        """
+        if not HTTP_CACHE_PATH:
+            return None
+        ttls = dict(DEFAULT_SOURCE_TTLS)
+        ttls.update(parse_source_ttls(os.getenv("HTTP_CACHE_TTLS", "")))
+        try:
+            return cls(HTTP_CACHE_PATH, source_ttls=ttls)
+        except sqlite3.Error as exc:
+            print(f"HTTP 缓存不可用，已禁用：{exc}")
+            return None
+
+    def _purge_credentials(self) -> None:
+        """
+        删除旧版本写入的、URL 中仍带凭据参数值的条目（键与 URL 都未脱敏）。
+        """
+        with self._lock:
+            urls = [row[0] for row in self._conn.execute("SELECT url FROM responses").fetchall()]
+            leaked = [url for url in urls if redact_url(url) != url]
+            if leaked:
+                self._conn.executemany("DELETE FROM responses WHERE url = ?", [(url,) for url in leaked])
+
+    def ttl_for(self, url: str) -> float:
+        host = (urlsplit(url).hostname or "").lower()
+        return self.source_ttls.get(host, self.default_ttl)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status, headers, body, etag, last_modified, stored_at, expires_at "
+                "FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        url, status, headers, body, etag, last_modified, stored_at, expires_at = row
+        return {
+            "url": url,
+            "status": status,
+            "headers": json.loads(headers),
+            "body": bytes(body),
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": stored_at,
+            "expires_at": expires_at,
+        }
+
+    def put(self, key: str, response: requests.Response) -> None:
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        now = time.time()
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, status, headers, body, etag, last_modified, stored_at, expires_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    redact_url(response.url),
+                    response.status_code,
+                    json.dumps(headers, ensure_ascii=False),
+                    sqlite3.Binary(body),
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    now,
+                    now + self.ttl_for(response.url),
+                    now,
+                    len(body),
+                ),
+            )
+            self._evict()
+
+    def refresh(self, key: str, url: str) -> None:
+        """304 后续期：保留正文，重置新鲜期。"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET stored_at = ?, expires_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now + self.ttl_for(url), now, key),
+            )
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.stats["evicted"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _cached_response(entry: Dict[str, Any], state: str, request: Optional[requests.PreparedRequest] = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response._content = entry["body"]
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response.headers["X-Cache"] = state
+    response.url = entry["url"]
+    response.reason = "OK"
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.request = request
+    response.from_cache = True  # type: ignore[attr-defined]
+    return response
+
+
+def _is_upstream_error(response: requests.Response) -> bool:
+    return response.status_code == 429 or response.status_code >= 500
+
+
+class CachedSession(requests.Session):
+    """
+    带本地缓存的 Session；cache 为 None 时与普通 Session 完全相同。
+    """
+
+    def __init__(self, cache: Optional[HttpCache] = None) -> None:
+        super().__init__()
+        self.cache = cache
+
+    def request(self, method: str, url: str, params: Any = None, headers: Any = None, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        cache = self.cache
+        if cache is None or method.upper() != "GET" or kwargs.get("stream"):
+            return super().request(method, url, params=params, headers=headers, **kwargs)
+
+        key = cache_key(url, params, headers)
+        entry = cache.get(key)
+        now = time.time()
+        if entry is not None and now < entry["expires_at"]:
+            cache.stats["hit"] += 1
+            return _cached_response(entry, "HIT")
+
+        conditional = dict(headers or {})
+        if entry is not None:
+            if entry["etag"]:
+                conditional["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                conditional["If-Modified-Since"] = entry["last_modified"]
+
+        stale_ok = entry is not None and now - entry["expires_at"] <= cache.stale_if_error
+        try:
+            response = super().request(method, url, params=params, headers=conditional or None, **kwargs)
+        except requests.RequestException:
+            if stale_ok:
+                cache.stats["stale"] += 1
+                return _cached_response(entry, "STALE")
+            raise
+
+        if response.status_code == 304 and entry is not None:
+            cache.refresh(key, entry["url"])
+            cache.stats["revalidated"] += 1
+            return _cached_response(entry, "REVALIDATED", response.request)
+        if _is_upstream_error(response) and stale_ok:
+            cache.stats["stale"] += 1
+            return _cached_response(entry, "STALE", response.request)
+
+        cache.stats["miss"] += 1
+        response.headers["X-Cache"] = "MISS"
+        response.from_cache = False  # type: ignore[attr-defined]
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        if response.status_code == 200 and "no-store" not in cache_control:
+            cache.put(key, response)
+        return response
+
+
+_shared_cache: Optional[HttpCache] = None
+_shared_cache_loaded = False
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> Optional[HttpCache]:
+    """
+    进程内共享的缓存实例（按环境变量创建一次），供两个抓取脚本的各个 Session 复用。
+    """
+    global _shared_cache, _shared_cache_loaded
+    with _shared_cache_lock:
+        if not _shared_cache_loaded:
+            _shared_cache = HttpCache.from_env()
+            _shared_cache_loaded = True
+        return _shared_cache
+
+
+def build_cached_session(cache: Optional[HttpCache] = None) -> CachedSession:
+    """
+    创建带缓存的 Session；未传入 cache 时使用 get_shared_cache()。
+    """
+    return CachedSession(cache if cache is not None else get_shared_cache())
+
+
+def format_cache_stats(cache: Optional[HttpCache]) -> Optional[str]:
+    if cache is None:
+        return None
+    stats = cache.stats
+    return (
+        f"HTTP 缓存：命中 {stats['hit']}，304 复用 {stats['revalidated']}，"
+        f"错误回退 {stats['stale']}，未命中 {stats['miss']}"
+    )
@@ -0,0 +1,655 @@
+"""
+增量指标引擎：持久化各指标所需的状态（Wilder/EWM 累积量、滚动窗口、分位数窗口），
+新收盘 K 线到来时只计算新增的几行（每根 O(window) 或 O(1)），无需对全部历史重算。
+
+与 获取数据.py 全量计算（add_bollinger_bands / add_rsi_indicators / add_macd_indicators /
+add_dmi_indicators / add_atr_indicator / add_price_moving_averages / add_volume_indicators /
+add_price_percentile）的一致性约定：
+- EWM 类（RSI、MACD、DMI、ATR）逐步复现 pandas ewm(adjust=False) 的递推；
+- 简单移动平均复现 pandas rolling mean 的 Kahan 补偿求和；
+- 滚动分位数与价格百分位基于有序窗口精确计算（线性插值 / 平均名次）；
+- 布林带标准差在窗口内两遍法计算，与 pandas 在线算法仅有舍入差异。
+容差（见 indicator_mismatches）：在同一窗口的全部行上，浮点列满足
+|增量 - 全量| <= INDICATOR_TOLERANCE * max(1, |全量|) 且 NaN 位置相同，布尔列完全一致。
+EWM 初值、预热期 NaN 与分位窗口都取决于窗口起点，状态只在起点不变时续用；
+全量计算的窗口起点每天后移，起点变化后引擎从新起点重新播种（代价与全量计算相同）。
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import math
+import os
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+INDICATOR_TOLERANCE = 1e-9
+STATE_VERSION = 2
+NAN = float("nan")
+
+
+def _isnan(value: float) -> bool:
+    return value != value
+
+
+def _div(numerator: float, denominator: float) -> float:
+    """
+    按 IEEE 754 语义相除（与 pandas/numpy 一致），除零返回 ±inf 或 NaN 而非抛出异常。
+    """
+    if denominator == 0:
+        if _isnan(numerator) or numerator == 0:
+            return NAN
+        return math.copysign(math.inf, numerator) * math.copysign(1.0, denominator)
+    return numerator / denominator
+
+
+def _nan_if_zero(value: float) -> float:
+    return NAN if value == 0 else value
+
+
+def _ewm_alpha(alpha: Optional[float] = None, span: Optional[float] = None) -> float:
+    """
+    与 pandas 相同，先换算为 center of mass 再求 alpha，保证逐位一致。
+    """
+    if span is not None:
+        com = (span - 1) / 2.0
+    elif alpha is not None:
+        com = 1.0 / alpha - 1.0
+    else:
+        raise ValueError("必须提供 alpha 或 span。")
+    return 1.0 / (1.0 + com)
+
+
+class _Ewm:
+    """pandas ewm(adjust=False, ignore_na=False).mean() 的单步递推。"""
+
+    def __init__(self, alpha: float, min_periods: int = 0) -> None:
+        self.alpha = alpha
+        self.min_periods = max(int(min_periods), 1)
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+        self.started = False
+
+    def update(self, value: float) -> float:
+        is_observation = not _isnan(value)
+        if not self.started:
+            self.started = True
+            self.weighted = value
+            self.nobs = int(is_observation)
+            self.old_wt = 1.0
+        else:
+            self.nobs += int(is_observation)
+            if not _isnan(self.weighted):
+                self.old_wt *= 1.0 - self.alpha
+                if is_observation:
+                    if self.weighted != value:
+                        self.weighted = self.old_wt * self.weighted + self.alpha * value
+                        self.weighted /= self.old_wt + self.alpha
+                    self.old_wt = 1.0
+            elif is_observation:
+                self.weighted = value
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+    def state(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "_Ewm":
+        obj = cls.__new__(cls)
+        obj.__dict__.update(state)
+        return obj
+
+
+class _RollingMean:
+    """pandas rolling(window).mean() 的单步版本，沿用其 Kahan 补偿求和。"""
+
+    def __init__(self, window: int, min_periods: Optional[int] = None) -> None:
+        self.window = int(window)
+        self.min_periods = self.window if min_periods is None else int(min_periods)
+        self.values: deque = deque()
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.neg_ct = 0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.consecutive = 0
+        self.prev_value = NAN
+
+    def _add(self, value: float) -> None:
+        if _isnan(value):
+            return
+        self.nobs += 1
+        y = value - self.comp_add
+        t = self.sum_x + y
+        self.comp_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct += 1
+        if value == self.prev_value:
+            self.consecutive += 1
+        else:
+            self.consecutive = 1
+        self.prev_value = value
+
+    def _remove(self, value: float) -> None:
+        if _isnan(value):
+            return
+        self.nobs -= 1
+        y = -value - self.comp_remove
+        t = self.sum_x + y
+        self.comp_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct -= 1
+
+    def update(self, value: float) -> float:
+        if self.window == 1:
+            # pandas 在窗口互不重叠时会重置累加器
+            self.values.clear()
+            self.nobs = self.neg_ct = self.consecutive = 0
+            self.sum_x = self.comp_add = self.comp_remove = 0.0
+            self.prev_value = NAN
+        self.values.append(value)
+        if len(self.values) > self.window:
+            self._remove(self.values.popleft())
+        self._add(value)
+        if self.nobs >= self.min_periods and self.nobs > 0:
+            result = self.sum_x / self.nobs
+            if self.consecutive >= self.nobs:
+                result = self.prev_value
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.0
+            return result
+        return NAN
+
+    def state(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state["values"] = list(self.values)
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "_RollingMean":
+        obj = cls.__new__(cls)
+        obj.__dict__.update(state)
+        obj.values = deque(state["values"])
+        return obj
+
+
+class _RollingWindow:
+    """
+    保存最近 window 个值及其有序副本，供滚动标准差、分位数与百分位使用（每步 O(window)）。
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = int(window)
+        self.values: deque = deque()
+        self.ordered: List[float] = []
+
+    def update(self, value: float) -> None:
+        self.values.append(value)
+        if not _isnan(value):
+            bisect.insort(self.ordered, value)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if not _isnan(old):
+                del self.ordered[bisect.bisect_left(self.ordered, old)]
+
+    def std(self, min_periods: int) -> float:
+        nobs = len(self.ordered)
+        if nobs < min_periods or nobs == 0:
+            return NAN
+        if self.ordered[0] == self.ordered[-1]:
+            return 0.0
+        mean = math.fsum(self.ordered) / nobs
+        return math.sqrt(math.fsum((v - mean) ** 2 for v in self.ordered) / nobs)
+
+    def quantile(self, q: float, min_periods: int) -> float:
+        nobs = len(self.ordered)
+        if nobs < min_periods or nobs == 0:
+            return NAN
+        if nobs == 1:
+            return self.ordered[0]
+        idx_with_fraction = q * (nobs - 1)
+        idx = int(idx_with_fraction)
+        if idx == idx_with_fraction:
+            return self.ordered[idx]
+        vlow = self.ordered[idx]
+        vhigh = self.ordered[idx + 1]
+        return vlow + (vhigh - vlow) * (idx_with_fraction - idx)
+
+    def rank_pct_last(self, min_periods: int) -> float:
+        """最新值在窗口内的百分位名次（并列取平均名次），与 Series.rank(pct=True) 一致。"""
+        nobs = len(self.ordered)
+        last = self.values[-1] if self.values else NAN
+        if nobs < min_periods or nobs == 0 or _isnan(last):
+            return NAN
+        less = bisect.bisect_left(self.ordered, last)
+        equal = bisect.bisect_right(self.ordered, last) - less
+        return (less + (equal + 1) / 2) / nobs
+
+    def state(self) -> Dict[str, Any]:
+        return {"window": self.window, "values": list(self.values)}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "_RollingWindow":
+        obj = cls(state["window"])
+        obj.values = deque(state["values"])
+        obj.ordered = sorted(v for v in obj.values if not _isnan(v))
+        return obj
+
+
+class IncrementalIndicatorEngine:
+    """
+    逐根 K 线更新全部日线指标，输出列与 获取数据.main() 的全量计算相同。
+    状态可通过 to_state()/from_state() 以 JSON 形式持久化。
+    """
+
+    def __init__(
+        self,
+        rsi_periods: Iterable[int] = (6, 14, 24),
+        ma_windows: Iterable[int] = (5, 10, 20, 60, 120, 180, 200, 250, 360),
+        bb_window: int = 20,
+        bb_num_std: float = 2.0,
+        macd_periods: Tuple[int, int, int] = (12, 26, 9),
+        macd_quantile_window: int = 180,
+        dmi_period: int = 14,
+        atr_period: int = 14,
+        volume_window: int = 20,
+        percentile_window: int = 20,
+    ) -> None:
+        self.config: Dict[str, Any] = {
+            "rsi_periods": [int(p) for p in rsi_periods],
+            "ma_windows": [int(w) for w in ma_windows],
+            "bb_window": int(bb_window),
+            "bb_num_std": float(bb_num_std),
+            "macd_periods": [int(p) for p in macd_periods],
+            "macd_quantile_window": int(macd_quantile_window),
+            "dmi_period": int(dmi_period),
+            "atr_period": int(atr_period),
+            "volume_window": int(volume_window),
+            "percentile_window": int(percentile_window),
+        }
+        cfg = self.config
+        fast, slow, signal = cfg["macd_periods"]
+        dmi_alpha = _ewm_alpha(alpha=1 / cfg["dmi_period"])
+        atr_alpha = _ewm_alpha(alpha=1 / cfg["atr_period"])
+        self.bars = 0
+        self.first_timestamp: Optional[int] = None
+        self.last_bar: Optional[Dict[str, Any]] = None
+        self.bb_mean = _RollingMean(cfg["bb_window"])
+        self.bb_window = _RollingWindow(cfg["bb_window"])
+        self.bb_slope_ma = _RollingMean(5)
+        self.rsi_gain = {p: _Ewm(_ewm_alpha(alpha=1 / p), min_periods=p) for p in cfg["rsi_periods"]}
+        self.rsi_loss = {p: _Ewm(_ewm_alpha(alpha=1 / p), min_periods=p) for p in cfg["rsi_periods"]}
+        self.ema_fast = _Ewm(_ewm_alpha(span=fast))
+        self.ema_slow = _Ewm(_ewm_alpha(span=slow))
+        self.macd_signal = _Ewm(_ewm_alpha(span=signal))
+        self.macd_window = _RollingWindow(cfg["macd_quantile_window"])
+        self.dmi_tr = _Ewm(dmi_alpha)
+        self.dmi_plus = _Ewm(dmi_alpha)
+        self.dmi_minus = _Ewm(dmi_alpha)
+        self.dmi_adx = _Ewm(dmi_alpha)
+        self.atr = _Ewm(atr_alpha)
+        self.ma = {w: _RollingMean(w) for w in cfg["ma_windows"]}
+        self.volume_ma = _RollingMean(cfg["volume_window"])
+        self.percentile_window = _RollingWindow(cfg["percentile_window"])
+
+    @property
+    def columns(self) -> List[str]:
+        cfg = self.config
+        cols = ["bb_mid", "bb_upper", "bb_lower", "bb_lower_slope", "bb_lower_slope_ma_5"]
+        cols += [f"rsi_{p}" for p in cfg["rsi_periods"]]
+        q_window = cfg["macd_quantile_window"]
+        cols += [
+            "macd_line",
+            "macd_signal",
+            "macd_hist",
+            f"macd_signal_q90_{q_window}",
+            f"macd_signal_q10_{q_window}",
+            f"macd_signal_top_{q_window}",
+            f"macd_signal_bottom_{q_window}",
+        ]
+        cols += ["+di", "-di", "adx", f"atr_{cfg['atr_period']}", f"atr_pct_{cfg['atr_period']}"]
+        cols += [f"ma_{w}" for w in cfg["ma_windows"]]
+        vw = cfg["volume_window"]
+        cols += [f"volume_ma_{vw}", f"prev_volume_ratio_ma_{vw}", f"volume_ratio_ma_{vw}"]
+        cols += [f"price_percentile_{cfg['percentile_window']}"]
+        return cols
+
+    def _step(self, high: float, low: float, close: float, volume: float) -> List[Any]:
+        cfg = self.config
+        prev = self.last_bar
+        prev_close = prev["close"] if prev else NAN
+        prev_high = prev["high"] if prev else NAN
+        prev_low = prev["low"] if prev else NAN
+        prev_volume = prev["volume"] if prev else NAN
+        prev_bb_lower = prev["bb_lower"] if prev else NAN
+        row: List[Any] = []
+
+        # 布林带
+        bb_mid = self.bb_mean.update(close)
+        self.bb_window.update(close)
+        bb_std = self.bb_window.std(cfg["bb_window"])
+        bb_upper = bb_mid + cfg["bb_num_std"] * bb_std
+        bb_lower = bb_mid - cfg["bb_num_std"] * bb_std
+        bb_slope = (_div(bb_lower, prev_bb_lower) - 1) * 100
+        row += [bb_mid, bb_upper, bb_lower, bb_slope, self.bb_slope_ma.update(bb_slope)]
+
+        # RSI（Wilder）
+        delta = close - prev_close
+        gain = NAN if _isnan(delta) else max(delta, 0.0)
+        loss = NAN if _isnan(delta) else -min(delta, 0.0)
+        for period in cfg["rsi_periods"]:
+            avg_gain = self.rsi_gain[period].update(gain)
+            avg_loss = self.rsi_loss[period].update(loss)
+            rs = _div(avg_gain, avg_loss)
+            row.append(100 - _div(100, 1 + rs))
+
+        # MACD 与信号线 180 日分位
+        macd_line = self.ema_fast.update(close) - self.ema_slow.update(close)
+        signal_line = self.macd_signal.update(macd_line)
+        self.macd_window.update(signal_line)
+        q_window = cfg["macd_quantile_window"]
+        q90 = self.macd_window.quantile(0.95, q_window)
+        q10 = self.macd_window.quantile(0.05, q_window)
+        row += [
+            macd_line,
+            signal_line,
+            macd_line - signal_line,
+            q90,
+            q10,
+            bool(signal_line > q90 and not _isnan(q90)),
+            bool(signal_line < q10 and not _isnan(q10)),
+        ]
+
+        # DMI / ADX
+        period = cfg["dmi_period"]
+        up_move = high - prev_high
+        down_move = -(low - prev_low)
+        plus_dm = up_move if (up_move > down_move and up_move > 0) else 0.0
+        minus_dm = down_move if (down_move > up_move and down_move > 0) else 0.0
+        tr_parts = [high - low, abs(high - prev_close), abs(low - prev_close)]
+        tr_valid = [v for v in tr_parts if not _isnan(v)]
+        tr = max(tr_valid) if tr_valid else NAN
+        atr_safe = _nan_if_zero(self.dmi_tr.update(tr))
+        plus_di = _div(100 * self.dmi_plus.update(plus_dm), atr_safe)
+        minus_di = _div(100 * self.dmi_minus.update(minus_dm), atr_safe)
+        dx = _div(100 * abs(plus_di - minus_di), _nan_if_zero(plus_di + minus_di))
+        adx = self.dmi_adx.update(dx)
+        if self.bars < period:
+            plus_di = minus_di = NAN
+        if self.bars < period * 2:
+            adx = NAN
+        row += [plus_di, minus_di, adx]
+
+        # ATR / ATR%
+        atr_parts = [abs(high - low), abs(high - prev_close), abs(low - prev_close)]
+        atr_valid = [v for v in atr_parts if not _isnan(v)]
+        atr = self.atr.update(max(atr_valid) if atr_valid else NAN)
+        row += [atr, _div(atr, _nan_if_zero(close)) * 100]
+
+        # 均线
+        for window in cfg["ma_windows"]:
+            row.append(self.ma[window].update(close))
+
+        # 成交量
+        volume_ma = self.volume_ma.update(volume)
+        row += [volume_ma, _div(prev_volume, volume_ma), _div(volume, volume_ma)]
+
+        # 价格百分位
+        self.percentile_window.update(close)
+        row.append(self.percentile_window.rank_pct_last(cfg["percentile_window"]))
+
+        self.bars += 1
+        self.last_bar = {
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+            "bb_lower": bb_lower,
+        }
+        return row
+
+    def update(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        输入按时间升序、且晚于已处理最后一根的 K 线（需含 high/low/close/volume），
+        返回这些 K 线对应的指标行。
+        """
+        if bars.empty:
+            return pd.DataFrame(columns=self.columns, index=bars.index)
+        bars = bars.sort_index()
+        last_ts = self.last_timestamp
+        if last_ts is not None and bars.index[0].value <= last_ts:
+            raise ValueError("增量更新只接受晚于已处理最后一根的 K 线。")
+        rows = [
+            self._step(float(h), float(lo), float(c), float(v))
+            for h, lo, c, v in zip(
+                bars["high"].to_numpy(),
+                bars["low"].to_numpy(),
+                bars["close"].to_numpy(),
+                bars["volume"].to_numpy(),
+            )
+        ]
+        if self.first_timestamp is None:
+            self.first_timestamp = int(bars.index[0].value)
+        last = bars.iloc[-1]
+        self.last_bar.update(
+            {
+                "timestamp": int(bars.index[-1].value),
+                "open": float(last.get("open", NAN)),
+            }
+        )
+        out = pd.DataFrame(rows, index=bars.index, columns=self.columns)
+        q_window = self.config["macd_quantile_window"]
+        for col in (f"macd_signal_top_{q_window}", f"macd_signal_bottom_{q_window}"):
+            out[col] = out[col].astype(bool)
+        return out
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """最后一根已处理 K 线的时间戳（UTC 纳秒）。"""
+        if not self.last_bar:
+            return None
+        return self.last_bar.get("timestamp")
+
+    def matches_bar(self, bars: pd.DataFrame) -> bool:
+        """检查 bars 中与引擎最后一根同时间戳的 K 线是否未被交易所修订。"""
+        ts = self.last_timestamp
+        if ts is None:
+            return False
+        hits = bars[bars.index.asi8 == ts] if len(bars) else bars
+        if hits.empty:
+            return False
+        row = hits.iloc[-1]
+        return all(
+            float(row[col]) == self.last_bar[col]
+            for col in ("high", "low", "close", "volume")
+        )
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "version": STATE_VERSION,
+            "config": self.config,
+            "bars": self.bars,
+            "first_timestamp": self.first_timestamp,
+            "last_bar": self.last_bar,
+            "bb_mean": self.bb_mean.state(),
+            "bb_window": self.bb_window.state(),
+            "bb_slope_ma": self.bb_slope_ma.state(),
+            "rsi_gain": {str(p): e.state() for p, e in self.rsi_gain.items()},
+            "rsi_loss": {str(p): e.state() for p, e in self.rsi_loss.items()},
+            "ema_fast": self.ema_fast.state(),
+            "ema_slow": self.ema_slow.state(),
+            "macd_signal": self.macd_signal.state(),
+            "macd_window": self.macd_window.state(),
+            "dmi_tr": self.dmi_tr.state(),
+            "dmi_plus": self.dmi_plus.state(),
+            "dmi_minus": self.dmi_minus.state(),
+            "dmi_adx": self.dmi_adx.state(),
+            "atr": self.atr.state(),
+            "ma": {str(w): m.state() for w, m in self.ma.items()},
+            "volume_ma": self.volume_ma.state(),
+            "percentile_window": self.percentile_window.state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "IncrementalIndicatorEngine":
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"不支持的指标状态版本：{state.get('version')}")
+        cfg = state["config"]
+        engine = cls(
+            rsi_periods=cfg["rsi_periods"],
+            ma_windows=cfg["ma_windows"],
+            bb_window=cfg["bb_window"],
+            bb_num_std=cfg["bb_num_std"],
+            macd_periods=tuple(cfg["macd_periods"]),
+            macd_quantile_window=cfg["macd_quantile_window"],
+            dmi_period=cfg["dmi_period"],
+            atr_period=cfg["atr_period"],
+            volume_window=cfg["volume_window"],
+            percentile_window=cfg["percentile_window"],
+        )
+        engine.bars = state["bars"]
+        engine.first_timestamp = state["first_timestamp"]
+        engine.last_bar = state["last_bar"]
+        engine.bb_mean = _RollingMean.from_state(state["bb_mean"])
+        engine.bb_window = _RollingWindow.from_state(state["bb_window"])
+        engine.bb_slope_ma = _RollingMean.from_state(state["bb_slope_ma"])
+        engine.rsi_gain = {int(p): _Ewm.from_state(s) for p, s in state["rsi_gain"].items()}
+        engine.rsi_loss = {int(p): _Ewm.from_state(s) for p, s in state["rsi_loss"].items()}
+        engine.ema_fast = _Ewm.from_state(state["ema_fast"])
+        engine.ema_slow = _Ewm.from_state(state["ema_slow"])
+        engine.macd_signal = _Ewm.from_state(state["macd_signal"])
+        engine.macd_window = _RollingWindow.from_state(state["macd_window"])
+        engine.dmi_tr = _Ewm.from_state(state["dmi_tr"])
+        engine.dmi_plus = _Ewm.from_state(state["dmi_plus"])
+        engine.dmi_minus = _Ewm.from_state(state["dmi_minus"])
+        engine.dmi_adx = _Ewm.from_state(state["dmi_adx"])
+        engine.atr = _Ewm.from_state(state["atr"])
+        engine.ma = {int(w): _RollingMean.from_state(s) for w, s in state["ma"].items()}
+        engine.volume_ma = _RollingMean.from_state(state["volume_ma"])
+        engine.percentile_window = _RollingWindow.from_state(state["percentile_window"])
+        return engine
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_state(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IncrementalIndicatorEngine"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls.from_state(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            print(f"读取指标引擎状态失败：{exc}，将全量重建。")
+            return None
+
+
+def _save_indicator_cache(path: str, frame: pd.DataFrame) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = {"__timestamp__": frame.index.asi8}
+    for col in frame.columns:
+        arrays[col] = frame[col].to_numpy()
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _load_indicator_cache(path: str, columns: List[str]) -> Optional[pd.DataFrame]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if any(col not in data.files for col in columns):
+                return None
+            index = pd.to_datetime(data["__timestamp__"], utc=True)
+            return pd.DataFrame({col: data[col] for col in columns}, index=index)
+    except (OSError, ValueError) as exc:
+        print(f"读取指标缓存失败：{exc}，将全量重建。")
+        return None
+
+
+def update_indicator_frame(
+    df: pd.DataFrame,
+    state_path: str,
+    cache_path: str,
+    engine_factory: Optional[Any] = None,
+) -> pd.DataFrame:
+    """
+    读取引擎状态与已算指标缓存，仅为 df 中新增的已收盘 K 线计算指标并拼回完整指标列。
+    状态缺失、配置变化、df 起点与状态的起点不同（窗口后移）或最后一根 K 线被修订时，
+    从 df 起点重新播种，结果与对 df 的全量计算一致。
+    """
+    factory = engine_factory or IncrementalIndicatorEngine
+    fresh = factory()
+    engine = IncrementalIndicatorEngine.load(state_path)
+    cache = _load_indicator_cache(cache_path, fresh.columns) if engine else None
+    reusable = (
+        engine is not None
+        and cache is not None
+        and engine.config == fresh.config
+        and engine.matches_bar(df)
+        and len(df)
+        and engine.first_timestamp == df.index.min().value
+        and cache.index.min() == df.index.min()
+        and cache.index.max().value == engine.last_timestamp
+    )
+    if reusable:
+        new_bars = df[df.index.asi8 > engine.last_timestamp]
+        tz = df.index.tz
+        cached = cache.tz_convert(tz) if tz is not None else cache.tz_localize(None)
+        indicators = pd.concat([cached, engine.update(new_bars)])
+        print(f"增量指标：沿用 {len(cached)} 行缓存，新计算 {len(new_bars)} 行。")
+    else:
+        engine = fresh
+        indicators = engine.update(df)
+        print(f"增量指标：状态不可用、窗口起点后移或 K 线被修订，从窗口起点重建 {len(df)} 行。")
+    indicators = indicators.loc[~indicators.index.duplicated(keep="last")]
+    engine.save(state_path)
+    _save_indicator_cache(cache_path, indicators)
+    return df.join(indicators.reindex(df.index))
+
+
+def indicator_mismatches(
+    incremental: pd.DataFrame,
+    full: pd.DataFrame,
+    columns: Iterable[str],
+    tolerance: float = INDICATOR_TOLERANCE,
+) -> List[str]:
+    """
+    按模块文档的约定逐列比较增量结果与全量结果（同一索引），返回不满足约定的列及其差异描述。
+    """
+    problems: List[str] = []
+    for col in columns:
+        inc = incremental[col].reindex(full.index)
+        ref = full[col]
+        if ref.dtype == bool or inc.dtype == bool:
+            diff = int((inc.astype(bool) != ref.astype(bool)).sum())
+            if diff:
+                problems.append(f"{col}：{diff} 行布尔值不一致")
+            continue
+        a = inc.to_numpy(dtype=float)
+        b = ref.to_numpy(dtype=float)
+        nan_diff = int((np.isnan(a) != np.isnan(b)).sum())
+        if nan_diff:
+            problems.append(f"{col}：{nan_diff} 行 NaN 位置不一致")
+        both = np.isfinite(a) & np.isfinite(b)
+        inf_diff = int(((~np.isnan(a) & ~np.isnan(b) & ~both) & (a != b)).sum())
+        if inf_diff:
+            problems.append(f"{col}：{inf_diff} 行无穷值不一致")
+        err = np.abs(a[both] - b[both]) / np.maximum(1.0, np.abs(b[both]))
+        if err.size and err.max() > tolerance:
+            problems.append(f"{col}：最大相对误差 {err.max():.3g}")
+    return problems
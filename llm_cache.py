@@ -0,0 +1,163 @@
+"""
+模型回复缓存：按提示词内容寻址的 SQLite 存储。
+
+键为 (provider, model, 请求参数, 系统提示, 用户消息块) 规范化 JSON 的 SHA-256，
+输入数据与参数不变时直接返回上次的回复，不再调用模型；条目超过 TTL 即失效，
+总大小超过 max_bytes 时按最近访问时间（LRU）淘汰。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+# 缓存路径，设为空字符串则禁用
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# 忽略已有缓存、强制重新调用模型（也可用命令行参数 --refresh）；新回复仍会写入缓存
+LLM_CACHE_REFRESH = os.getenv("LLM_CACHE_REFRESH", "0").lower() in {"1", "true", "yes"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+
+def llm_cache_key(
+    provider: str,
+    model: str,
+    params: Mapping[str, Any],
+    system_prompt: str,
+    blocks: Sequence[str],
+) -> str:
+    canonical = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "params": dict(params),
+            "system": system_prompt,
+            "blocks": list(blocks),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LlmCache:
+    """
+    SQLite 回复存储；单连接加锁，可在多个模型调用线程间共享。
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl: float = LLM_CACHE_TTL,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> Optional["LlmCache"]:
+        """
+        按环境变量创建缓存；LLM_CACHE_PATH 为空时禁用，打开失败时同样退回无缓存。
+        """
+        if not LLM_CACHE_PATH:
+            return None
+        try:
+            return cls(LLM_CACHE_PATH)
+        except sqlite3.Error as exc:
+            print(f"模型回复缓存不可用，已禁用：{exc}")
+            return None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT provider, model, text, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or now - row[3] > self.ttl:
+                self.stats["miss"] += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.stats["hit"] += 1
+        provider, model, text, created_at = row
+        return {"provider": provider, "model": model, "text": text, "created_at": created_at}
+
+    def put(self, key: str, provider: str, model: str, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if not text or size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, model, text, created_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, text, now, now, size),
+            )
+            self.stats["stored"] += 1
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.stats["evicted"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache: Optional[LlmCache] = None
+_shared_cache_loaded = False
+_shared_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LlmCache]:
+    """
+    进程内共享的回复缓存（按环境变量创建一次）。
+    """
+    global _shared_cache, _shared_cache_loaded
+    with _shared_cache_lock:
+        if not _shared_cache_loaded:
+            _shared_cache = LlmCache.from_env()
+            _shared_cache_loaded = True
+        return _shared_cache
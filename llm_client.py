@@ -0,0 +1,463 @@
+"""
+模型 HTTP 客户端：所有模型请求共用一个 keep-alive 连接池，429 / 5xx / 连接错误按带抖动的指数退避重试
+（响应带 Retry-After 时按其等待），每次尝试的状态与耗时都记录下来，运行结束时汇总打印。
+
+提供方（LlmProvider）只负责组装请求、解析回复与流式分片：DeepSeekProvider、GeminiProvider，
+以及不访问网络的 FakeProvider —— 其 FakeAdapter 在进程内按脚本返回 429 / 5xx 与回复，
+用于离线测试重试行为和对报告步骤做基准。
+"""
+
+from __future__ import annotations
+
+import email.utils
+import io
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from llm_cache import llm_cache_key
+
+# 连接池大小，需不小于同时进行的模型请求数（竞速时为提供方个数）
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "4"))
+LLM_REQUEST_TIMEOUT = 120
+LLM_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# 单次重试等待的上限（秒）；Retry-After 超过该值时同样截断
+LLM_MAX_RETRY_DELAY = float(os.getenv("LLM_MAX_RETRY_DELAY", "60"))
+
+
+class ProviderCancelled(RuntimeError):
+    """竞速中已有其他模型胜出，或超过整体截止时间。"""
+
+
+def request_timeout(deadline: float | None) -> float:
+    if deadline is None:
+        return LLM_REQUEST_TIMEOUT
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise ProviderCancelled("已超过模型调用截止时间")
+    return min(LLM_REQUEST_TIMEOUT, remaining)
+
+
+def wait_before_retry(seconds: float, cancel: threading.Event | None, deadline: float | None) -> None:
+    """
+    重试前等待；等待期间被取消、或等待后将超过截止时间时抛出 ProviderCancelled。
+    """
+    if deadline is not None and time.monotonic() + seconds >= deadline:
+        raise ProviderCancelled(f"等待 {seconds:.1f}s 后将超过模型调用截止时间")
+    if cancel is None:
+        time.sleep(seconds)
+    elif cancel.wait(seconds):
+        raise ProviderCancelled("已取消")
+
+
+def retry_delay(response: requests.Response | None, attempt: int, base: float, cap: float = LLM_MAX_RETRY_DELAY) -> float:
+    """
+    第 attempt 次重试前的等待秒数：优先使用 Retry-After（秒数或 HTTP 日期），
+    否则为 base * 2^attempt 乘以 0.5~1.5 的随机抖动；均不超过 cap。
+    """
+    value = response.headers.get("Retry-After") if response is not None else None
+    if value:
+        try:
+            return min(cap, max(0.0, float(value)))
+        except ValueError:
+            pass
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is not None:
+            return min(cap, max(0.0, parsed.timestamp() - time.time()))
+    return min(cap, base * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+class LlmProvider:
+    """
+    提供方接口：组装请求、解析一次性回复与流式分片。retries 为最多尝试次数，backoff 为退避基数（秒）。
+    """
+
+    name = "LLM"
+    cache_name = "llm"
+
+    def __init__(self, model: str, retries: int, backoff: float) -> None:
+        self.model = model
+        self.retries = max(1, retries)
+        self.backoff = max(0.0, backoff)
+
+    def endpoint(self, stream: bool) -> Tuple[str, Dict[str, str]]:
+        raise NotImplementedError
+
+    def headers(self) -> Dict[str, str]:
+        return {"Content-Type": "application/json"}
+
+    def body(self, system_prompt: str, blocks: Sequence[str], stream: bool) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def cache_key(self, system_prompt: str, blocks: Sequence[str]) -> str:
+        raise NotImplementedError
+
+    def parse(self, result: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """
+        解析一次性回复，返回 (文本, 用量说明)。
+        """
+        raise NotImplementedError
+
+    def delta(self, event: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        解析一个 SSE 事件，返回 (新增文本, 是否已结束)。
+        """
+        raise NotImplementedError
+
+    def error_detail(self, response: requests.Response) -> Any:
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+
+    def adapters(self) -> Dict[str, HTTPAdapter]:
+        """
+        需要挂载到共享 Session 上的额外 adapter（按 URL 前缀）。
+        """
+        return {}
+
+
+class DeepSeekProvider(LlmProvider):
+    """
+    DeepSeek（OpenAI 兼容 chat/completions），流式为 stream=true 的 SSE，以 [DONE] 结束。
+    """
+
+    name = "DeepSeek"
+    cache_name = "deepseek"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str | None = None,
+        max_retries: int | None = None,
+        backoff_seconds: float | None = None,
+        url: str | None = None,
+    ) -> None:
+        super().__init__(
+            model or os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
+            max_retries if max_retries is not None else int(os.getenv("DEEPSEEK_MAX_RETRIES", "6")),
+            backoff_seconds if backoff_seconds is not None else float(os.getenv("DEEPSEEK_RETRY_BACKOFF", "5")),
+        )
+        self.api_key = api_key
+        self.url = url or os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
+        self.temperature = float(os.getenv("DEEPSEEK_TEMPERATURE", "0.6"))
+        self.max_tokens = int(os.getenv("DEEPSEEK_MAX_TOKENS", "2048"))
+
+    def endpoint(self, stream: bool) -> Tuple[str, Dict[str, str]]:
+        return self.url, {}
+
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _params(self) -> Dict[str, Any]:
+        return {"model": self.model, "temperature": self.temperature, "max_tokens": self.max_tokens}
+
+    def body(self, system_prompt: str, blocks: Sequence[str], stream: bool) -> Dict[str, Any]:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "\n\n".join(blocks)},
+        ]
+        return {**self._params(), "messages": messages, "stream": stream}
+
+    def cache_key(self, system_prompt: str, blocks: Sequence[str]) -> str:
+        return llm_cache_key(self.cache_name, self.model, self._params(), system_prompt, ["\n\n".join(blocks)])
+
+    def parse(self, result: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        usage = result.get("usage")
+        note = None
+        if isinstance(usage, dict):
+            note = f"输入 {usage.get('prompt_tokens')} tokens，输出 {usage.get('completion_tokens')} tokens"
+        text_parts: List[str] = []
+        for choice in result.get("choices", []):
+            content = choice.get("message", {}).get("content")
+            if content:
+                text_parts.append(content)
+        return "\n".join(text_parts).strip(), note
+
+    def delta(self, event: Dict[str, Any]) -> Tuple[str, bool]:
+        pieces: List[str] = []
+        finished = False
+        for choice in event.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                pieces.append(content)
+            finished = finished or bool(choice.get("finish_reason"))
+        return "".join(pieces), finished
+
+    def error_detail(self, response: requests.Response) -> Any:
+        detail = super().error_detail(response)
+        if isinstance(detail, dict) and isinstance(detail.get("error"), dict):
+            return detail["error"].get("message") or detail
+        return detail
+
+
+class GeminiProvider(LlmProvider):
+    """
+    Gemini generateContent；流式为 streamGenerateContent?alt=sse，以带 finishReason 的分片结束。
+    """
+
+    name = "Gemini"
+    cache_name = "gemini"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str | None = None,
+        max_retries: int | None = None,
+        backoff_seconds: float | None = None,
+    ) -> None:
+        super().__init__(
+            model or os.getenv("GEMINI_MODEL", "gemini-2.0-flash"),
+            max_retries if max_retries is not None else int(os.getenv("GEMINI_MAX_RETRIES", "6")),
+            backoff_seconds if backoff_seconds is not None else float(os.getenv("GEMINI_RETRY_BACKOFF", "5")),
+        )
+        self.api_key = api_key
+        self.api_version = os.getenv("GEMINI_API_VERSION", "v1")
+        self.url = os.getenv(
+            "GEMINI_API_URL",
+            f"https://generativelanguage.googleapis.com/{self.api_version}/models/{self.model}:generateContent",
+        )
+
+    def endpoint(self, stream: bool) -> Tuple[str, Dict[str, str]]:
+        if stream:
+            return self.url.replace(":generateContent", ":streamGenerateContent"), {"key": self.api_key, "alt": "sse"}
+        return self.url, {"key": self.api_key}
+
+    def body(self, system_prompt: str, blocks: Sequence[str], stream: bool) -> Dict[str, Any]:
+        parts = [{"text": system_prompt}] + [{"text": block} for block in blocks]
+        return {"contents": [{"parts": parts}]}
+
+    def cache_key(self, system_prompt: str, blocks: Sequence[str]) -> str:
+        return llm_cache_key(self.cache_name, self.model, {"api_version": self.api_version}, system_prompt, list(blocks))
+
+    def parse(self, result: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        usage = result.get("usageMetadata")
+        note = None
+        if isinstance(usage, dict):
+            note = f"输入 {usage.get('promptTokenCount')} tokens，输出 {usage.get('candidatesTokenCount')} tokens"
+        text_parts: List[str] = []
+        for candidate in result.get("candidates", []):
+            for part in candidate.get("content", {}).get("parts", []):
+                if part.get("text"):
+                    text_parts.append(part["text"])
+        return "\n".join(text_parts).strip(), note
+
+    def delta(self, event: Dict[str, Any]) -> Tuple[str, bool]:
+        pieces: List[str] = []
+        finished = False
+        for candidate in event.get("candidates", []):
+            for part in candidate.get("content", {}).get("parts", []):
+                if part.get("text"):
+                    pieces.append(part["text"])
+            finished = finished or bool(candidate.get("finishReason"))
+        return "".join(pieces), finished
+
+
+class FakeAdapter(HTTPAdapter):
+    """
+    进程内的假模型接口（OpenAI 兼容协议）：前 len(statuses) 次请求依次返回脚本中的状态码，
+    之后返回 reply；latency 为每次响应前的等待秒数。不建立任何网络连接。
+    """
+
+    def __init__(
+        self,
+        reply: str,
+        statuses: Sequence[int] = (),
+        retry_after: float | None = None,
+        latency: float = 0.0,
+        chunk_chars: int = 16,
+    ) -> None:
+        super().__init__()
+        self.reply = reply
+        self.statuses = list(statuses)
+        self.retry_after = retry_after
+        self.latency = latency
+        self.chunk_chars = max(1, chunk_chars)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _stream_body(self, model: str) -> bytes:
+        chunks = [self.reply[i : i + self.chunk_chars] for i in range(0, len(self.reply), self.chunk_chars)]
+        lines = []
+        for index, chunk in enumerate(chunks):
+            finish = "stop" if index == len(chunks) - 1 else None
+            event = {"model": model, "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": finish}]}
+            lines.append(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+        lines.append("data: [DONE]\n\n")
+        return "".join(lines).encode("utf-8")
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        with self._lock:
+            index = self.calls
+            self.calls += 1
+        started = time.monotonic()
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.loads(request.body or b"{}")
+        status = self.statuses[index] if index < len(self.statuses) else 200
+        headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+        if status != 200:
+            content = json.dumps({"error": {"code": status, "message": "fake provider failure"}}).encode("utf-8")
+            if self.retry_after is not None:
+                headers["Retry-After"] = str(self.retry_after)
+        elif body.get("stream"):
+            content = self._stream_body(body.get("model", "fake"))
+            headers["Content-Type"] = "text/event-stream"
+        else:
+            result = {
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(self.reply)},
+            }
+            content = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        response = requests.Response()
+        response.status_code = status
+        response.reason = "OK" if status == 200 else "Fake Error"
+        response.headers = headers
+        response.raw = io.BytesIO(content)
+        response.url = request.url or ""
+        response.request = request
+        response.elapsed = timedelta(seconds=time.monotonic() - started)
+        return response
+
+
+class FakeProvider(DeepSeekProvider):
+    """
+    不访问网络的提供方：按 DeepSeek 协议请求 fake://llm，由挂载的 FakeAdapter 应答。
+    """
+
+    name = "Fake"
+    cache_name = "fake"
+
+    def __init__(
+        self,
+        reply: str = "## 市场概述\n- 假模型回复。",
+        statuses: Sequence[int] = (),
+        retry_after: float | None = None,
+        latency: float = 0.0,
+        max_retries: int = 6,
+        backoff_seconds: float = 0.05,
+    ) -> None:
+        super().__init__("fake", model="fake", max_retries=max_retries, backoff_seconds=backoff_seconds, url="fake://llm/chat/completions")
+        self.adapter = FakeAdapter(reply, statuses, retry_after, latency)
+
+    def adapters(self) -> Dict[str, HTTPAdapter]:
+        return {"fake://": self.adapter}
+
+
+class LlmHttpClient:
+    """
+    共享 Session 的模型请求客户端；post 负责重试与耗时记录，返回最后一次的响应（可能仍是错误状态）。
+    """
+
+    def __init__(self, pool_size: int = LLM_POOL_SIZE) -> None:
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=pool_size))
+        self.session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=pool_size))
+        self.attempts: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _record(self, provider: str, attempt: int, status: int | None, elapsed: float, error: str | None = None) -> None:
+        with self._lock:
+            self.attempts.append(
+                {"provider": provider, "attempt": attempt, "status": status, "elapsed": round(elapsed, 4), "error": error}
+            )
+
+    def post(
+        self,
+        provider: LlmProvider,
+        body: Dict[str, Any],
+        stream: bool = False,
+        proxies: Dict[str, str] | None = None,
+        cancel: threading.Event | None = None,
+        deadline: float | None = None,
+        on_throttle: Callable[[], None] | None = None,
+    ) -> requests.Response:
+        """
+        发送请求并按需重试；每次尝试记录状态与耗时（流式请求为收到响应头的耗时）。
+        重试次数用尽时返回最后一次的错误响应，连接错误则抛出 requests 异常。
+        """
+        for prefix, adapter in provider.adapters().items():
+            self.session.mount(prefix, adapter)
+        url, params = provider.endpoint(stream)
+        retries = provider.retries
+        attempt = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise ProviderCancelled("已取消")
+            started = time.monotonic()
+            try:
+                response = self.session.post(
+                    url,
+                    params=params,
+                    headers=provider.headers(),
+                    json=body,
+                    proxies=proxies,
+                    timeout=request_timeout(deadline),
+                    stream=stream,
+                )
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                self._record(provider.name, attempt, None, time.monotonic() - started, type(exc).__name__)
+                if attempt >= retries - 1:
+                    raise
+                delay = retry_delay(None, attempt, provider.backoff)
+                print(f"{provider.name} 连接失败（{type(exc).__name__}），{delay:.1f}s 后重试（第 {attempt + 1}/{retries} 次）")
+            else:
+                self._record(provider.name, attempt, response.status_code, time.monotonic() - started)
+                if response.status_code == 429 and on_throttle is not None:
+                    on_throttle()
+                if response.status_code not in LLM_RETRY_STATUSES or attempt >= retries - 1:
+                    return response
+                delay = retry_delay(response, attempt, provider.backoff)
+                response.close()
+                print(f"{provider.name} API 返回 {response.status_code}，{delay:.1f}s 后重试（第 {attempt + 1}/{retries} 次）")
+            wait_before_retry(delay, cancel, deadline)
+            attempt += 1
+
+    def format_stats(self) -> Optional[str]:
+        with self._lock:
+            attempts = list(self.attempts)
+        if not attempts:
+            return None
+        by_provider: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for record in attempts:
+            by_provider[record["provider"]].append(record)
+        parts = []
+        for name, records in by_provider.items():
+            statuses = ", ".join(str(r["status"] or r["error"]) for r in records)
+            latency = "/".join(f"{r['elapsed']:.2f}s" for r in records)
+            parts.append(f"{name} {len(records)} 次（{statuses}；耗时 {latency}）")
+        return "模型请求：" + "；".join(parts)
+
+
+_shared_client: Optional[LlmHttpClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LlmHttpClient:
+    """
+    进程内共享的模型请求客户端，所有提供方复用同一个连接池。
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = LlmHttpClient()
+        return _shared_client
+
+
+def format_llm_stats() -> Optional[str]:
+    if _shared_client is None:
+        return None
+    return _shared_client.format_stats()
@@ -1,18 +1,48 @@
 from __future__ import annotations
 
+import argparse
 import json
 import os
+import threading
 import time
 import re
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 from zoneinfo import ZoneInfo
 
 import requests
 
+from llm_cache import LLM_CACHE_REFRESH, LlmCache, get_llm_cache
+from llm_client import (
+    DeepSeekProvider,
+    GeminiProvider,
+    LlmHttpClient,
+    LlmProvider,
+    ProviderCancelled,
+    format_llm_stats,
+    get_llm_client,
+)
+from prompt_budget import (
+    PRIORITY_DERIVATIVES_RAW,
+    PRIORITY_NEWS_RAW,
+    PRIORITY_REQUIRED,
+    PRIORITY_SUMMARY,
+    budget_prompt,
+    compact_json,
+    describe_budget,
+)
+
 SIGNAL_FILE = Path("signals_60d.json")
 ONCHAIN_SNAPSHOT_FILE = Path("global_onchain_news_snapshot.json")
+# 模型竞速：主模型发出后超过该秒数仍未返回、或首次收到 429 时，并行请求备用模型；设为负数时恢复串行回退
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "20"))
+# 整个模型调用步骤的墙钟上限（秒），超时后放弃所有请求，改用离线回退
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "300"))
+# 流式输出：使用 SSE / streamGenerateContent 接口，收到的内容边到边写入 model_analysis.md；设为 0 使用一次性返回的接口
+LLM_STREAM = os.getenv("LLM_STREAM", "1").lower() not in {"0", "false", "no"}
+STREAM_CUT_NOTE = "> 注意：回复流中断，以上为已收到的部分内容。"
 
 
 def load_signals(path: Path) -> List[Dict[str, Any]]:
@@ -59,7 +89,7 @@ def _summarize_news(snapshot: Dict[str, Any]) -> str | None:
 
 def build_onchain_parts(snapshot: Dict[str, Any]) -> Dict[str, Any]:
     if not snapshot:
-        return {"extra_blocks": [], "paragraphs": {}}
+        return {"extra_blocks": [], "raw_blocks": [], "paragraphs": {}}
     dr = snapshot.get("daily_report", {}) if isinstance(snapshot, dict) else {}
     stable_para = dr.get("stablecoins", {}).get("paragraph")
     bridge_para = dr.get("bridges", {}).get("paragraph")
@@ -90,7 +120,7 @@ def build_onchain_parts(snapshot: Dict[str, Any]) -> Dict[str, Any]:
 
     gas_para = "；".join([p for p in gas_para_parts if p]) if gas_para_parts else None
 
-    news_summary = None
+    news_summary = _summarize_news(snapshot)
     dr_news = dr.get("news") if isinstance(dr, dict) else None
 
     def _format_usd(value: Any) -> str:
@@ -165,16 +195,21 @@ def build_onchain_parts(snapshot: Dict[str, Any]) -> Dict[str, Any]:
         extra_blocks.append("恐慌指数摘要：" + str(fear_para))
     if gas_para:
         extra_blocks.append("Gas/Mempool 摘要：" + str(gas_para))
-    if isinstance(dr_news, dict):
-        extra_blocks.append(
-            "新闻原始数据（JSON）：\n" + json.dumps(dr_news, ensure_ascii=False, indent=2)
-        )
+    if news_summary:
+        extra_blocks.append("新闻摘要：" + news_summary)
     if derivatives_para:
         extra_blocks.append("衍生品摘要：" + derivatives_para)
+    # 原始数据以精简 JSON 提供，token 超出预算时最先被丢弃
+    raw_blocks: List[Tuple[int, str]] = []
+    if isinstance(dr_news, dict):
+        raw_blocks.append((PRIORITY_NEWS_RAW, "新闻原始数据（精简 JSON）：\n" + compact_json(dr_news)))
     if isinstance(derivatives_okx, dict):
-        extra_blocks.append("衍生品原始数据（OKX）：\n" + json.dumps(derivatives_okx, ensure_ascii=False, indent=2))
+        raw_blocks.append(
+            (PRIORITY_DERIVATIVES_RAW, "衍生品原始数据（OKX，精简 JSON）：\n" + compact_json(derivatives_okx))
+        )
     return {
         "extra_blocks": extra_blocks,
+        "raw_blocks": raw_blocks,
         "paragraphs": {
             "stable": stable_para,
             "bridge": bridge_para,
@@ -322,6 +357,7 @@ def build_payload(
         "instructions": instructions,
         "recent_data": signals,
         "extra_blocks": [],
+        "raw_blocks": [],
     }
     payload["extra_blocks"].append(f"今日日期（北京）：{cn_today_str}")
     if latest_date_str:
@@ -335,105 +371,224 @@ def build_payload(
         payload["extra_blocks"].append(
             "最新均线相对位置：" + json.dumps(latest_relation, ensure_ascii=False)
         )
+    # 日期、最新交易日与均线位置必须保留，链上摘要次之
+    required_blocks = len(payload["extra_blocks"])
     if onchain:
         oc = build_onchain_parts(onchain)
         payload["extra_blocks"].extend(oc.get("extra_blocks", []))
+        payload["raw_blocks"].extend(oc.get("raw_blocks", []))
         payload["onchain_paragraphs"] = oc.get("paragraphs", {})
+    payload["prompt_blocks"] = [
+        (PRIORITY_REQUIRED if i < required_blocks else PRIORITY_SUMMARY, block)
+        for i, block in enumerate(payload["extra_blocks"])
+    ] + payload["raw_blocks"]
     return payload
 
 
-def call_deepseek(
-    api_key: str,
-    proxy: str | None,
-    payload: Dict[str, Any],
-    model: str | None = None,
-    max_retries: int | None = None,
-    backoff_seconds: int | None = None,
-) -> str:
-    url = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
-    model_name = model or os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
-    proxies = {"http": proxy, "https": proxy} if proxy else None
+def build_user_blocks(payload: Dict[str, Any]) -> List[str]:
+    """
+    按 token 预算组装用户消息块（结果缓存在 payload["prompt"]，两个模型共用）。
+    """
+    prompt = payload.get("prompt")
+    if prompt is None:
+        blocks = payload.get("prompt_blocks")
+        if blocks is None:
+            blocks = [(PRIORITY_REQUIRED, str(block)) for block in payload.get("extra_blocks", [])]
+        prompt = budget_prompt(payload["instructions"], payload["recent_data"], blocks)
+        payload["prompt"] = prompt
+        print(describe_budget(prompt, len(payload["recent_data"])))
+    return prompt["blocks"]
+
+
+class ReportStream:
+    """
+    将流式回复逐段写入报告文件。竞速时第一个产出内容的模型获得写入权，其余模型的流随即放弃。
+    close 之后不再授予写入权，超过截止时间仍在运行的调用不会覆盖随后写出的报告。
+    """
 
-    system_prompt = payload["instructions"]
-    user_blocks = [
-        "以下是最近60天的信号数据（JSON）：\n" + json.dumps(payload["recent_data"], ensure_ascii=False, indent=2)
-    ]
-    for block in payload.get("extra_blocks", []):
-        user_blocks.append(str(block))
-    user_message = "\n\n".join(user_blocks)
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.owner: str | None = None
+        self.claimed = threading.Event()
+        self.closed = False
+        self._lock = threading.Lock()
+        self._file = None
+
+    def claim(self, label: str) -> bool:
+        with self._lock:
+            if self.closed:
+                return False
+            if self.owner is None:
+                self.owner = label
+                self.claimed.set()
+                self._file = self.path.open("w", encoding="utf-8")
+                self._file.write(f"## {label} 回复\n\n")
+                self._file.flush()
+            return self.owner == label
+
+    def write(self, text: str) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.write(text)
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _sse_events(response: requests.Response) -> Iterator[Dict[str, Any]]:
+    # text/event-stream 固定为 UTF-8，服务端通常不带 charset
+    response.encoding = "utf-8"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            return
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        if isinstance(event, dict):
+            yield event
+
+
+def _read_stream(
+    response: requests.Response,
+    provider: LlmProvider,
+    stream: ReportStream,
+    started: float,
+    deadline: float | None,
+    cancel: threading.Event | None = None,
+) -> Tuple[str, bool]:
+    """
+    读取 SSE 流并写入 stream，返回 (全文, 是否完整)。
+    已收到内容后连接中断、超过截止时间或缺少结束标记时保留已收到的部分；尚未收到内容即中断则抛出异常。
+    cancel 被设置（竞速已结束）时在下一个事件处抛出 ProviderCancelled，不再写入报告。
+    """
+    label = provider.name
+    pieces: List[str] = []
+    first_at: float | None = None
+    finished = False
+    try:
+        for event in _sse_events(response):
+            if cancel is not None and cancel.is_set():
+                raise ProviderCancelled("已取消")
+            text, done = provider.delta(event)
+            finished = finished or done
+            if text:
+                if first_at is None:
+                    first_at = time.monotonic()
+                    if not stream.claim(label):
+                        raise ProviderCancelled(f"{stream.owner} 已开始输出" if stream.owner else "报告已写出")
+                pieces.append(text)
+                stream.write(text)
+            if deadline is not None and time.monotonic() >= deadline and not finished:
+                print(f"{label} 流式输出超过截止时间，保留已收到的部分。")
+                break
+    except requests.RequestException as exc:
+        if not pieces:
+            raise
+        print(f"{label} 流式连接中断（{exc}），保留已收到的部分。")
+    finally:
+        response.close()
+    total = time.monotonic() - started
+    if first_at is None:
+        return "", finished
+    text = "".join(pieces).strip()
+    print(
+        f"{label} 流式输出：响应头 {response.elapsed.total_seconds():.2f}s，"
+        f"首段内容 {first_at - started:.2f}s，总耗时 {total:.2f}s，共 {len(text)} 字"
+    )
+    if not finished:
+        stream.write("\n\n" + STREAM_CUT_NOTE)
+    return text, finished
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_message},
-    ]
 
-    retries = max_retries if max_retries is not None else int(os.getenv("DEEPSEEK_MAX_RETRIES", "6"))
-    retries = max(1, retries)
-    backoff = backoff_seconds if backoff_seconds is not None else int(os.getenv("DEEPSEEK_RETRY_BACKOFF", "60"))
-    backoff = max(1, backoff)
+def _cached_reply(cache: LlmCache | None, key: str, refresh: bool, label: str) -> str | None:
+    if cache is None or refresh:
+        return None
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    created = datetime.fromtimestamp(entry["created_at"], tz=timezone.utc).isoformat(timespec="seconds")
+    print(f"输入未变化，使用缓存的 {label} 回复（{entry['model']}，生成于 {created}）。")
+    return entry["text"]
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-    request_payload = {
-        "model": model_name,
-        "messages": messages,
-        "temperature": float(os.getenv("DEEPSEEK_TEMPERATURE", "0.6")),
-        "max_tokens": int(os.getenv("DEEPSEEK_MAX_TOKENS", "2048")),
-        "stream": False,
-    }
 
-    for attempt in range(retries):
-        response = requests.post(
-            url,
-            headers=headers,
-            json=request_payload,
-            proxies=proxies,
-            timeout=120,
-        )
-        if response.status_code == 429:
-            if attempt < retries - 1:
-                wait_seconds = backoff * (attempt + 1)
-                print(f"DeepSeek API 返回 429，{wait_seconds}s 后重试（第 {attempt + 1}/{retries} 次）")
-                time.sleep(wait_seconds)
-                continue
-            raise RuntimeError("DeepSeek API 返回 429（请求过多）。请稍后再试或检查配额。")
-        if response.status_code >= 500 and attempt < retries - 1:
-            wait_seconds = backoff * (attempt + 1)
-            print(f"DeepSeek API 返回 {response.status_code}，{wait_seconds}s 后重试（第 {attempt + 1}/{retries} 次）")
-            time.sleep(wait_seconds)
-            continue
-        if response.status_code == 400:
-            try:
-                err_obj = response.json()
-                detail = err_obj.get("error", {}).get("message") or err_obj
-            except ValueError:
-                detail = response.text
-            print(f"DeepSeek API 返回 400：{detail}")
-            raise RuntimeError(f"DeepSeek API 返回 400（请求无效）：{detail}")
-        if response.status_code >= 400:
-            try:
-                detail = response.json()
-            except ValueError:
-                detail = response.text
-            response.raise_for_status()
+def call_provider(
+    provider: LlmProvider,
+    proxy: str | None,
+    payload: Dict[str, Any],
+    refresh: bool = LLM_CACHE_REFRESH,
+    cancel: threading.Event | None = None,
+    deadline: float | None = None,
+    on_throttle: Callable[[], None] | None = None,
+    stream: ReportStream | None = None,
+    client: LlmHttpClient | None = None,
+) -> str:
+    """
+    通过共享的 LlmHttpClient 调用一个提供方：先查回复缓存，再请求（重试见 LlmHttpClient.post），
+    stream 不为空时使用流式接口。回复流中断时返回带中断说明的部分内容，且不写入缓存。
+    """
+    label = provider.name
+    system_prompt = payload["instructions"]
+    blocks = build_user_blocks(payload)
+    cache = get_llm_cache()
+    cache_key = provider.cache_key(system_prompt, blocks)
+    cached = _cached_reply(cache, cache_key, refresh, label)
+    if cached is not None:
+        return cached
+
+    client = client or get_llm_client()
+    proxies = {"http": proxy, "https": proxy} if proxy else None
+    response = client.post(
+        provider,
+        provider.body(system_prompt, blocks, stream is not None),
+        stream=stream is not None,
+        proxies=proxies,
+        cancel=cancel,
+        deadline=deadline,
+        on_throttle=on_throttle,
+    )
+    if response.status_code == 429:
+        raise RuntimeError(f"{label} API 返回 429（请求过多）。请稍后再试或检查配额。")
+    if response.status_code >= 400:
+        raise RuntimeError(f"{label} API 调用失败（{response.status_code}）：{provider.error_detail(response)}")
+
+    if stream is not None:
+        # 以最后一次尝试发出请求的时刻为起点
+        started = time.monotonic() - response.elapsed.total_seconds()
+        text, complete = _read_stream(response, provider, stream, started, deadline, cancel)
+        if not complete:
+            return f"{text}\n\n{STREAM_CUT_NOTE}"
+    else:
         try:
             result = response.json()
         except ValueError as exc:
-            raise RuntimeError(f"DeepSeek API 返回无法解析的内容：{response.text[:500]}") from exc
-        break
-    else:
-        raise RuntimeError("DeepSeek API 调用失败，已达到最大重试次数。")
+            raise RuntimeError(f"{label} API 返回无法解析的内容：{response.text[:500]}") from exc
+        text, usage = provider.parse(result)
+        if usage:
+            print(f"{label} 用量：{usage}")
+    if cache is not None and text:
+        cache.put(cache_key, provider.cache_name, provider.model, text)
+    return text
+
 
-    text_parts: List[str] = []
-    choices = result.get("choices", [])
-    for choice in choices:
-        msg = choice.get("message", {})
-        content = msg.get("content")
-        if content:
-            text_parts.append(content)
-    return "\n".join(text_parts).strip()
+def call_deepseek(
+    api_key: str,
+    proxy: str | None,
+    payload: Dict[str, Any],
+    model: str | None = None,
+    max_retries: int | None = None,
+    backoff_seconds: float | None = None,
+    **kwargs: Any,
+) -> str:
+    return call_provider(DeepSeekProvider(api_key, model, max_retries, backoff_seconds), proxy, payload, **kwargs)
 
 
 def call_gemini(
@@ -442,74 +597,86 @@ def call_gemini(
     payload: Dict[str, Any],
     model: str | None = None,
     max_retries: int | None = None,
-    backoff_seconds: int | None = None,
+    backoff_seconds: float | None = None,
+    **kwargs: Any,
 ) -> str:
-    model_name = model or os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
-    api_version = os.getenv("GEMINI_API_VERSION", "v1")
-    base_url = os.getenv(
-        "GEMINI_API_URL",
-        f"https://generativelanguage.googleapis.com/{api_version}/models/{model_name}:generateContent",
-    )
-    proxies = {"http": proxy, "https": proxy} if proxy else None
+    return call_provider(GeminiProvider(api_key, model, max_retries, backoff_seconds), proxy, payload, **kwargs)
 
-    parts = [
-        {"text": payload["instructions"]},
-        {
-            "text": "以下是最近60天的信号数据（JSON）：\n"
-            + json.dumps(payload["recent_data"], ensure_ascii=False, indent=2)
-        },
-    ]
-    for block in payload.get("extra_blocks", []):
-        parts.append({"text": str(block)})
-
-    request_payload = {"contents": [{"parts": parts}]}
-
-    retries = max_retries if max_retries is not None else int(os.getenv("GEMINI_MAX_RETRIES", "6"))
-    retries = max(1, retries)
-    backoff = backoff_seconds if backoff_seconds is not None else int(os.getenv("GEMINI_RETRY_BACKOFF", "60"))
-    backoff = max(1, backoff)
-
-    for attempt in range(retries):
-        response = requests.post(
-            base_url,
-            params={"key": api_key},
-            json=request_payload,
-            proxies=proxies,
-            timeout=120,
-        )
-        if response.status_code == 429:
-            if attempt < retries - 1:
-                wait_seconds = backoff * (attempt + 1)
-                print(f"Gemini API 返回 429，{wait_seconds}s 后重试（第 {attempt + 1}/{retries} 次）")
-                time.sleep(wait_seconds)
-                continue
-            raise RuntimeError("Gemini API 返回 429（请求过多）。请稍后再试或检查配额。")
-        if response.status_code >= 500 and attempt < retries - 1:
-            wait_seconds = backoff * (attempt + 1)
-            print(f"Gemini API 返回 {response.status_code}，{wait_seconds}s 后重试（第 {attempt + 1}/{retries} 次）")
-            time.sleep(wait_seconds)
-            continue
-        if response.status_code >= 400:
-            try:
-                detail = response.json()
-            except ValueError:
-                detail = response.text
-            raise RuntimeError(f"Gemini API 调用失败：{detail}")
-        try:
-            result = response.json()
-        except ValueError as exc:
-            raise RuntimeError(f"Gemini API 返回无法解析的内容：{response.text[:500]}") from exc
-        break
-    else:
-        raise RuntimeError("Gemini API 调用失败，已达到最大重试次数。")
 
-    text_parts: List[str] = []
-    for candidate in result.get("candidates", []):
-        for part in candidate.get("content", {}).get("parts", []):
-            text = part.get("text")
-            if text:
-                text_parts.append(text)
-    return "\n".join(text_parts).strip()
+ProviderCall = Callable[[threading.Event, float, Callable[[], None]], str]
+
+
+def race_providers(
+    providers: List[Tuple[str, ProviderCall]],
+    hedge_delay: float = LLM_HEDGE_DELAY,
+    deadline_seconds: float = LLM_DEADLINE,
+    streaming: threading.Event | None = None,
+) -> Tuple[str | None, str | None]:
+    """
+    按优先级竞速调用模型：先启动第一个，超过 hedge_delay 秒未返回、收到 429 或失败 / 空响应时启动下一个，
+    取最先返回的非空回复，其余调用通过取消事件在下次重试前退出。hedge_delay 为负数时逐个串行调用。
+    streaming 被设置（已有模型开始流式输出）后不再按时间或 429 启动备用模型，只在失败 / 空响应时启动。
+    整个过程不超过 deadline_seconds 秒（单次请求的超时也按剩余时间收紧）。返回 (胜出的模型名, 回复)。
+    """
+    if not providers:
+        return None, None
+    deadline = time.monotonic() + deadline_seconds
+    cancels = [threading.Event() for _ in providers]
+    throttled = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(providers), thread_name_prefix="llm")
+    pending: Dict[Future, int] = {}
+    next_index = 0
+    launched_at = 0.0
+
+    def launch() -> None:
+        nonlocal next_index, launched_at
+        index = next_index
+        label, call = providers[index]
+        if index > 0:
+            print(f"启动备用模型 {label}。")
+        throttled.clear()
+        pending[executor.submit(call, cancels[index], deadline, throttled.set)] = index
+        next_index += 1
+        launched_at = time.monotonic()
+
+    try:
+        launch()
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                print(f"模型调用超过 {deadline_seconds:g}s 截止时间，放弃等待。")
+                return None, None
+            timeout = deadline - now
+            can_hedge = (
+                hedge_delay >= 0 and next_index < len(providers) and not (streaming is not None and streaming.is_set())
+            )
+            if can_hedge:
+                timeout = min(timeout, max(0.0, launched_at + hedge_delay - now), 0.5)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            failed = False
+            for future in done:
+                label = providers[pending.pop(future)][0]
+                try:
+                    text = future.result()
+                except Exception as exc:
+                    print(f"{label} 调用失败：{exc}")
+                    failed = True
+                    continue
+                if text:
+                    return label, text
+                print(f"{label} 返回空响应。")
+                failed = True
+            if next_index < len(providers) and (
+                failed
+                or not pending
+                or (can_hedge and (throttled.is_set() or time.monotonic() - launched_at >= hedge_delay))
+            ):
+                launch()
+        return None, None
+    finally:
+        for cancel in cancels:
+            cancel.set()
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 def save_report(payload: Dict[str, Any], analysis_text: str, path: Path, model_label: str) -> None:
@@ -600,57 +767,89 @@ def build_offline_text(payload: Dict[str, Any]) -> str:
     return "\n".join(parts)
 
 
-def main() -> None:
-    deepseek_key = os.environ.get("DEEPSEEK_API_KEY")
-    gemini_key = os.environ.get("GEMINI_API_KEY")
-    # 若均未配置模型 Key，不再直接退出；改用离线回退生成
-
+def resolve_llm_proxy() -> str | None:
+    """
+    模型请求使用的代理：优先 HTTPS_PROXY / HTTP_PROXY；USE_LOCAL_PROXY 开启时回落到本地 7890，
+    关闭时清除环境中的代理变量，避免 requests 读取。
+    """
     proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("HTTP_PROXY")
     if proxy is not None:
         proxy = proxy.strip()
 
     use_local_proxy = os.environ.get("USE_LOCAL_PROXY", "1").lower()
     if proxy:
-        pass
-    elif use_local_proxy in {"1", "true", "yes"}:
-        proxy = "http://127.0.0.1:7890"
-    else:
-        proxy = None
-        for key in ("HTTP_PROXY", "HTTPS_PROXY", "http_proxy", "https_proxy"):
-            os.environ.pop(key, None)
+        return proxy
+    if use_local_proxy in {"1", "true", "yes"}:
+        return "http://127.0.0.1:7890"
+    for key in ("HTTP_PROXY", "HTTPS_PROXY", "http_proxy", "https_proxy"):
+        os.environ.pop(key, None)
+    return None
 
-    signals = load_signals(SIGNAL_FILE)
-    onchain = load_onchain_snapshot(ONCHAIN_SNAPSHOT_FILE)
-    payload = build_payload(signals, onchain)
-    if payload["recent_data"]:
-        print("最新交易日数据快照：")
-        print(json.dumps(payload["recent_data"][-1], ensure_ascii=False, indent=2))
-    analysis_text = None
-    model_label = ""
 
+def generate_report(
+    payload: Dict[str, Any],
+    proxy: str | None,
+    refresh: bool = LLM_CACHE_REFRESH,
+    stream: bool = LLM_STREAM,
+    report_path: Path = Path("model_analysis.md"),
+    email_path: Path = Path("model_email_body.md"),
+) -> str:
+    """
+    竞速调用已配置 Key 的模型并写出报告与邮件正文；均不可用时使用离线回退。返回实际使用的模型名。
+    """
+    deepseek_key = os.environ.get("DEEPSEEK_API_KEY")
+    gemini_key = os.environ.get("GEMINI_API_KEY")
+    # 若均未配置模型 Key，不再直接退出；改用离线回退生成
+
+    report_stream = ReportStream(report_path) if stream else None
+    providers: List[Tuple[str, ProviderCall]] = []
     if gemini_key:
-        try:
-            analysis_text = call_gemini(
-                api_key=gemini_key,
-                proxy=proxy,
-                payload=payload,
+        providers.append(
+            (
+                "Gemini",
+                lambda cancel, deadline, on_throttle: call_gemini(
+                    api_key=gemini_key,
+                    proxy=proxy,
+                    payload=payload,
+                    refresh=refresh,
+                    cancel=cancel,
+                    deadline=deadline,
+                    on_throttle=on_throttle,
+                    stream=report_stream,
+                ),
             )
-            model_label = "Gemini"
-            if analysis_text:
-                print("使用 Gemini 生成分析。")
-            else:
-                print("Gemini 返回空响应，尝试回退 DeepSeek。")
-                analysis_text = None
-        except Exception as exc:
-            print(f"Gemini 调用失败：{exc}")
-
-    if analysis_text is None and deepseek_key:
-        try:
-            analysis_text = call_deepseek(api_key=deepseek_key, proxy=proxy, payload=payload)
-            model_label = "DeepSeek"
-            print("使用 DeepSeek 生成分析。")
-        except Exception as exc:
-            print(f"DeepSeek 调用失败：{exc}")
+        )
+    if deepseek_key:
+        providers.append(
+            (
+                "DeepSeek",
+                lambda cancel, deadline, on_throttle: call_deepseek(
+                    api_key=deepseek_key,
+                    proxy=proxy,
+                    payload=payload,
+                    refresh=refresh,
+                    cancel=cancel,
+                    deadline=deadline,
+                    on_throttle=on_throttle,
+                    stream=report_stream,
+                ),
+            )
+        )
+    if providers:
+        # 提示词在竞速前组装一次，两个模型共用
+        build_user_blocks(payload)
+    try:
+        model_label, analysis_text = race_providers(
+            providers, streaming=report_stream.claimed if report_stream is not None else None
+        )
+    finally:
+        if report_stream is not None:
+            report_stream.close()
+    llm_stats = format_llm_stats()
+    if llm_stats:
+        print(llm_stats)
+    if analysis_text is not None:
+        print(f"使用 {model_label} 生成分析。")
 
     # 离线回退：若所有模型不可用或均失败，则基于本地/缓存数据生成保守版文本
     if analysis_text is None:
@@ -658,10 +857,28 @@ def main() -> None:
         analysis_text = build_offline_text(payload)
         model_label = "Offline"
 
-    save_report(payload, analysis_text, Path("model_analysis.md"), model_label or "模型")
-    print("分析结果已写入 model_analysis.md")
-    save_email_body(analysis_text, Path("model_email_body.md"))
+    save_report(payload, analysis_text, report_path, model_label or "模型")
+    print(f"分析结果已写入 {report_path}")
+    save_email_body(analysis_text, email_path)
+    return model_label or "模型"
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="基于信号数据与链上快照调用模型生成日报。")
+    parser.add_argument("--refresh", action="store_true", default=LLM_CACHE_REFRESH, help="忽略模型回复缓存，强制重新调用")
+    parser.add_argument(
+        "--no-stream", dest="stream", action="store_false", default=LLM_STREAM, help="使用一次性返回的接口，不流式写入报告"
+    )
+    args = parser.parse_args(argv)
 
+    proxy = resolve_llm_proxy()
+    signals = load_signals(SIGNAL_FILE)
+    onchain = load_onchain_snapshot(ONCHAIN_SNAPSHOT_FILE)
+    payload = build_payload(signals, onchain)
+    if payload["recent_data"]:
+        print("最新交易日数据快照：")
+        print(json.dumps(payload["recent_data"][-1], ensure_ascii=False, indent=2))
+    generate_report(payload, proxy, refresh=args.refresh, stream=args.stream)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,265 @@
+"""
+本地新闻库：SQLite 存储 RSS 与 CryptoCompare 新闻，跨来源去重并保留历史。
+
+- 去重键：规范化 URL（去掉协议、www.、跟踪参数、锚点与末尾斜杠）的哈希；同一标题（忽略大小写与标点）视为同一条；
+- 发布时间统一解析为 UTC 时间戳（RFC-822 / ISO 8601 / Unix 秒），无法解析时以首次入库时间代替；
+- 每条新闻可属于多个主题（news_topics），快照按 (topic, published_at) 索引查询各主题最新 N 条。
+"""
+
+from __future__ import annotations
+
+import email.utils
+import hashlib
+import html
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 新闻库路径，设为空字符串时仅在内存中去重，不保留历史
+NEWS_STORE_PATH = os.getenv("NEWS_STORE_PATH", "data/news.sqlite")
+# 快照中每个主题保留的条数与摘要长度（库中保存完整摘要）
+NEWS_TOP_N = int(os.getenv("NEWS_TOP_N", "10"))
+NEWS_SUMMARY_CHARS = int(os.getenv("NEWS_SUMMARY_CHARS", "280"))
+
+_TRACKING_PARAMS = {"ref", "fbclid", "gclid", "mc_cid", "mc_eid"}
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS news_items (
+    id TEXT PRIMARY KEY,
+    title_hash TEXT UNIQUE,
+    url TEXT,
+    title TEXT,
+    summary TEXT,
+    source TEXT,
+    feed TEXT,
+    tags TEXT,
+    published_raw TEXT,
+    published_at REAL NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS news_topics (
+    topic TEXT NOT NULL,
+    item_id TEXT NOT NULL REFERENCES news_items (id),
+    published_at REAL NOT NULL,
+    PRIMARY KEY (topic, item_id)
+);
+CREATE INDEX IF NOT EXISTS news_topics_recent ON news_topics (topic, published_at DESC);
+CREATE INDEX IF NOT EXISTS news_items_published ON news_items (published_at);
+"""
+
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if not host:
+        return None
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("", host, path, urlencode(sorted(query)), ""))
+
+
+def normalize_title(title: Optional[str]) -> Optional[str]:
+    if not title:
+        return None
+    text = re.sub(r"[\W_]+", " ", html.unescape(title).lower()).strip()
+    return text or None
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _feed_source(feed: Optional[str]) -> Optional[str]:
+    host = urlsplit(feed).hostname if feed else None
+    if host and host.startswith("www."):
+        return host[4:]
+    return host or feed
+
+
+def parse_published(value: Any) -> Optional[float]:
+    """
+    将 RSS pubDate（RFC-822）、ISO 8601 字符串或 Unix 秒解析为 UTC 时间戳。
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if text.isdigit():
+        return float(text)
+    try:
+        dt = email.utils.parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        try:
+            dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def clean_summary(text: Optional[str], limit: int = NEWS_SUMMARY_CHARS) -> str:
+    """
+    去掉 HTML 标签与多余空白并截断，用于快照输出。
+    """
+    plain = re.sub(r"\s+", " ", html.unescape(re.sub(r"<[^>]+>", " ", text or ""))).strip()
+    if limit and len(plain) > limit:
+        plain = plain[: limit - 1].rstrip() + "…"
+    return plain
+
+
+class NewsStore:
+    """
+    新闻库；单连接加锁，写入与查询都在调用线程中进行。
+    """
+
+    def __init__(self, path: str = NEWS_STORE_PATH) -> None:
+        self.path = path or ":memory:"
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> "NewsStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _existing_id(self, item_id: str, title_hash: Optional[str]) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT id FROM news_items WHERE id = ? OR (title_hash IS NOT NULL AND title_hash = ?)",
+            (item_id, title_hash),
+        ).fetchone()
+        return row[0] if row else None
+
+    def add(self, topics: Iterable[str], items: Iterable[Dict[str, Any]], feed: Optional[str] = None) -> int:
+        """
+        写入一批新闻并关联到 topics；已存在的条目只补充主题关联。返回新入库条数。
+        """
+        topics = list(topics)
+        now = time.time()
+        added = 0
+        with self._lock, self._conn:
+            for item in items:
+                url_key = normalize_url(item.get("link"))
+                title_key = normalize_title(item.get("title"))
+                if url_key is None and title_key is None:
+                    continue
+                title_hash = _digest(title_key) if title_key else None
+                item_id = _digest(url_key) if url_key else title_hash
+                existing = self._existing_id(item_id, title_hash)
+                if existing is None:
+                    published_at = parse_published(item.get("published"))
+                    tags = item.get("tags")
+                    self._conn.execute(
+                        "INSERT INTO news_items (id, title_hash, url, title, summary, source, feed, tags, "
+                        "published_raw, published_at, first_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            item_id,
+                            title_hash,
+                            item.get("link"),
+                            (item.get("title") or "").strip(),
+                            item.get("summary"),
+                            item.get("source") or _feed_source(feed),
+                            feed,
+                            str(tags) if tags is not None else None,
+                            None if item.get("published") is None else str(item.get("published")),
+                            published_at if published_at is not None else now,
+                            now,
+                        ),
+                    )
+                    added += 1
+                else:
+                    item_id = existing
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO news_topics (topic, item_id, published_at) "
+                    "SELECT ?, id, published_at FROM news_items WHERE id = ?",
+                    [(topic, item_id) for topic in topics],
+                )
+        return added
+
+    def query(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        按发布时间倒序查询新闻历史，可按主题与时间范围（UTC 时间戳）过滤。
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        if topic is not None:
+            sql = (
+                "SELECT i.url, i.title, i.summary, i.source, i.published_at FROM news_topics t "
+                "JOIN news_items i ON i.id = t.item_id"
+            )
+            clauses.append("t.topic = ?")
+            params.append(topic)
+            column = "t.published_at"
+        else:
+            sql = "SELECT url, title, summary, source, published_at FROM news_items"
+            column = "published_at"
+        if since is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append(f"{column} < ?")
+            params.append(until)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {column} DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_item(row) for row in rows]
+
+    def top(self, topic: str, limit: int = NEWS_TOP_N, summary_chars: int = NEWS_SUMMARY_CHARS) -> List[Dict[str, Any]]:
+        """
+        某主题最新的 limit 条，摘要清理并截断，供快照使用。
+        """
+        items = self.query(topic=topic, limit=limit)
+        for item in items:
+            item["summary"] = clean_summary(item.get("summary"), summary_chars)
+        return items
+
+    def counts(self) -> Tuple[int, int]:
+        with self._lock:
+            items = self._conn.execute("SELECT COUNT(*) FROM news_items").fetchone()[0]
+            links = self._conn.execute("SELECT COUNT(*) FROM news_topics").fetchone()[0]
+        return items, links
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _row_to_item(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    url, title, summary, source, published_at = row
+    return {
+        "title": title,
+        "link": url,
+        "published": datetime.fromtimestamp(published_at, tz=timezone.utc).isoformat(),
+        "source": source,
+        "summary": summary,
+    }
@@ -0,0 +1,247 @@
+"""
+进程内共享的 OKX REST 客户端：连接池 + 令牌桶限速 + 429/5xx 抖动重试。
+
+OkxAdapter 挂载在 https://www.okx.com 上，Session 复用 keep-alive 连接；
+每次实际发出的请求（含重试）都先从对应接口的令牌桶取令牌，命中本地 HTTP 缓存的请求不占用额度。
+获取数据.py 的 make_okx_request 与 ccxt 交易所实例、fetch_onchain_and_news.py 的 OKX 请求共用同一个客户端。
+"""
+
+from __future__ import annotations
+
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import CachedSession, get_shared_cache
+
+OKX_BASE_URL = "https://www.okx.com"
+# 连接池大小，需不小于并发访问 OKX 的线程数（批量模式下为 BATCH_MAX_WORKERS）
+OKX_POOL_SIZE = int(os.getenv("OKX_POOL_SIZE", "8"))
+# 429 / 5xx / 连接错误的最大重试次数与退避基数（秒），实际等待为 base * 2^n 再乘以 0.5~1.5 的随机抖动
+OKX_MAX_RETRIES = int(os.getenv("OKX_MAX_RETRIES", "3"))
+OKX_RETRY_BACKOFF = float(os.getenv("OKX_RETRY_BACKOFF", "0.5"))
+OKX_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# OKX 公共接口按 IP 的限速（每 2 秒请求数），按路径前缀最长匹配；未列出的接口使用 OKX_DEFAULT_RATE_LIMIT
+OKX_RATE_WINDOW = 2.0
+OKX_RATE_LIMITS: Dict[str, int] = {
+    "/api/v5/market/candles": 40,
+    "/api/v5/market/history-candles": 20,
+    "/api/v5/market/ticker": 20,
+    "/api/v5/public/instruments": 20,
+    "/api/v5/public/open-interest": 20,
+    "/api/v5/public/funding-rate": 20,
+    "/api/v5/public/liquidation-orders": 40,
+    "/api/v5/rubik/stat": 5,
+}
+OKX_DEFAULT_RATE_LIMIT = 10
+
+
+class OkxApiError(RuntimeError):
+    """
+    OKX 返回 code != "0" 的业务错误。
+    """
+
+    def __init__(self, code: Any, message: Any, payload: Any = None) -> None:
+        super().__init__(f"OKX API error {code}: {message}")
+        self.code = code
+        self.payload = payload
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶：容量 capacity，每秒补充 rate 个令牌；acquire 在令牌不足时阻塞等待。
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        取一个令牌，返回因限速等待的秒数。
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def _backoff_delay(attempt: int, base: float) -> float:
+    return base * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+class OkxAdapter(HTTPAdapter):
+    """
+    带连接池、按接口限速与抖动重试的 HTTPAdapter；同一实例可挂到多个 Session 上共享额度与连接。
+    """
+
+    def __init__(
+        self,
+        pool_size: int = OKX_POOL_SIZE,
+        max_retries: int = OKX_MAX_RETRIES,
+        backoff: float = OKX_RETRY_BACKOFF,
+        rate_limits: Mapping[str, int] = OKX_RATE_LIMITS,
+        default_rate_limit: int = OKX_DEFAULT_RATE_LIMIT,
+        rate_window: float = OKX_RATE_WINDOW,
+    ) -> None:
+        super().__init__(pool_connections=2, pool_maxsize=pool_size)
+        self.retries = max_retries
+        self.backoff = backoff
+        # 按最长前缀优先匹配
+        self._prefixes = sorted(rate_limits, key=len, reverse=True)
+        self._buckets = {
+            prefix: TokenBucket(limit / rate_window, limit) for prefix, limit in rate_limits.items()
+        }
+        self._default_bucket = TokenBucket(default_rate_limit / rate_window, default_rate_limit)
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, float] = {"requests": 0, "retries": 0, "throttled_s": 0.0}
+
+    def bucket_for(self, path: str) -> TokenBucket:
+        for prefix in self._prefixes:
+            if path.startswith(prefix):
+                return self._buckets[prefix]
+        return self._default_bucket
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        bucket = self.bucket_for(requests.utils.urlparse(request.url or "").path)
+        attempt = 0
+        while True:
+            self._count("throttled_s", bucket.acquire())
+            self._count("requests")
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+                delay = _backoff_delay(attempt, self.backoff)
+            else:
+                if response.status_code not in OKX_RETRY_STATUSES or attempt >= self.retries:
+                    # 供 source_metrics 记录每次调用的重试次数
+                    response.retries = attempt  # type: ignore[attr-defined]
+                    return response
+                retry_after = _retry_after(response)
+                delay = retry_after if retry_after is not None else _backoff_delay(attempt, self.backoff)
+                response.close()
+            attempt += 1
+            self._count("retries")
+            time.sleep(delay)
+
+
+class OkxSession(CachedSession):
+    """
+    OkxClient 使用的 Session。ccxt 交易所实例析构时会调用 session.close()，
+    这里不关闭挂载的共享 OkxAdapter，以免一个实例被回收就清空其余请求的连接池。
+    """
+
+    def close(self) -> None:
+        pass
+
+
+class OkxClient:
+    """
+    OKX REST 客户端：持有带本地缓存的 Session（见 http_cache.py），OKX 域名挂载共享的 OkxAdapter。
+    """
+
+    def __init__(self, proxy: Optional[str] = None, adapter: Optional[OkxAdapter] = None, base_url: str = OKX_BASE_URL) -> None:
+        self.base_url = base_url
+        self.adapter = adapter or OkxAdapter()
+        self.session = OkxSession(get_shared_cache())
+        self.session.mount(base_url, self.adapter)
+        if proxy:
+            self.session.proxies.update({"http": proxy, "https": proxy})
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None, timeout: float = 30) -> requests.Response:
+        return self.session.get(f"{self.base_url}{path}", params=params, timeout=timeout)
+
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None, timeout: float = 30) -> Dict[str, Any]:
+        """
+        请求 OKX 接口并返回解析后的 JSON；传输错误抛出 requests 异常，业务错误抛出 OkxApiError。
+        """
+        response = self.get(path, params=params, timeout=timeout)
+        response.raise_for_status()
+        payload = response.json()
+        if isinstance(payload, dict) and payload.get("code") not in (None, "0"):
+            message = payload.get("msg") or payload.get("error_message") or payload
+            raise OkxApiError(payload.get("code"), message, payload)
+        return payload
+
+
+_shared_adapter: Optional[OkxAdapter] = None
+_clients: Dict[Optional[str], OkxClient] = {}
+_clients_lock = threading.Lock()
+
+
+def shared_okx_adapter() -> OkxAdapter:
+    """
+    进程内唯一的 OkxAdapter，所有 OKX 请求共用连接池与限速额度。
+    """
+    global _shared_adapter
+    with _clients_lock:
+        if _shared_adapter is None:
+            _shared_adapter = OkxAdapter()
+        return _shared_adapter
+
+
+def get_okx_client(proxy: Optional[str] = None) -> OkxClient:
+    """
+    按代理复用 OkxClient；不同代理的客户端仍共用同一个 OkxAdapter。
+    """
+    adapter = shared_okx_adapter()
+    with _clients_lock:
+        client = _clients.get(proxy)
+        if client is None:
+            client = OkxClient(proxy, adapter=adapter)
+            _clients[proxy] = client
+        return client
+
+
+def mount_okx_adapter(session: requests.Session) -> requests.Session:
+    """
+    在已有 Session 上挂载共享的 OkxAdapter，使其中的 OKX 请求同样走连接池与限速。
+    """
+    session.mount(OKX_BASE_URL, shared_okx_adapter())
+    return session
+
+
+def format_okx_stats() -> Optional[str]:
+    if _shared_adapter is None:
+        return None
+    stats = _shared_adapter.stats
+    return f"OKX 请求：{int(stats['requests'])} 次，重试 {int(stats['retries'])} 次，限速等待 {stats['throttled_s']:.1f} 秒"
@@ -0,0 +1,308 @@
+"""
+OKX 爆仓订单（/api/v5/public/liquidation-orders）的共享分页器与本地追加日志。
+
+原始成交明细按行追加写入 LIQUIDATION_LOG_DIR/{uly}_{instType}.jsonl，
+状态文件记录已见到的最新成交时间（水位线）以及连续覆盖的起点。
+之后的运行只需从当前时间向前翻页到水位线，必要时再向更早回补到所需窗口起点，
+获取数据.py 的 30 天日聚合与 fetch_onchain_and_news.py 的 72 小时汇总都从日志读取。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows：只有进程内的线程锁
+    fcntl = None
+
+LIQUIDATION_ORDERS_PATH = "/api/v5/public/liquidation-orders"
+# 本地日志目录，设为空字符串则不落盘，每次按窗口完整翻页
+LIQUIDATION_LOG_DIR = os.getenv("LIQUIDATION_LOG_DIR", "data/liquidations")
+# 日志保留天数，超出部分在追加新数据时压缩掉
+LIQUIDATION_RETENTION_DAYS = float(os.getenv("LIQUIDATION_RETENTION_DAYS", "45"))
+
+PageFetcher = Callable[[Dict[str, Any]], Any]
+FillKey = Tuple[int, str, str, str]
+
+_log_locks: Dict[str, threading.Lock] = {}
+_log_locks_guard = threading.Lock()
+
+
+def _thread_lock(path: str) -> threading.Lock:
+    with _log_locks_guard:
+        return _log_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def _write_atomic(path: str, text: str) -> None:
+    """
+    写入同目录下唯一命名的临时文件后原子替换，并发写入方不会互相覆盖或改名对方的临时文件。
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def fill_ts(detail: Dict[str, Any]) -> Optional[int]:
+    try:
+        return int(detail.get("ts") or detail.get("time"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _fill_key(detail: Dict[str, Any]) -> Optional[FillKey]:
+    """
+    成交明细的去重键：时间、方向、数量与破产价格（同一毫秒内的不同成交不会被合并）。
+    """
+    ts = fill_ts(detail)
+    if ts is None:
+        return None
+    side = str(detail.get("posSide") or detail.get("side") or "")
+    return ts, side, str(detail.get("sz")), str(detail.get("bkPx"))
+
+
+def _page_details(payload: Any) -> Optional[List[Dict[str, Any]]]:
+    data_entries = payload.get("data") if isinstance(payload, dict) else None
+    if not isinstance(data_entries, list):
+        return None
+    details: List[Dict[str, Any]] = []
+    for entry in data_entries:
+        entry_details = entry.get("details") if isinstance(entry, dict) else None
+        if isinstance(entry_details, list):
+            details.extend(d for d in entry_details if isinstance(d, dict))
+    return details
+
+
+def page_liquidations(
+    fetch_page: PageFetcher,
+    uly: str,
+    inst_type: str,
+    stop_ms: int,
+    after: Optional[str] = None,
+    batch_limit: int = 100,
+    max_batches: int = 500,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    从 after（缺省为当前时间）向前翻页，直到出现早于 stop_ms 的成交或历史耗尽。
+    返回 (ts >= stop_ms 的原始成交明细, 是否完整覆盖到 stop_ms)；仅在达到 max_batches 时不完整。
+    fetch_page 接收查询参数并返回解析后的 JSON，出错时由调用方抛出异常。
+    """
+    fills: List[Dict[str, Any]] = []
+    for _ in range(max_batches):
+        params: Dict[str, Any] = {
+            "instType": inst_type,
+            "uly": uly,
+            "state": "filled",
+            "limit": str(batch_limit),
+        }
+        if after:
+            params["after"] = after
+        details = _page_details(fetch_page(params))
+        if not details:
+            return fills, True
+        oldest_ts: Optional[int] = None
+        for detail in details:
+            ts = fill_ts(detail)
+            if ts is None:
+                continue
+            if oldest_ts is None or ts < oldest_ts:
+                oldest_ts = ts
+            if ts >= stop_ms:
+                fills.append(detail)
+        if oldest_ts is None or oldest_ts < stop_ms or len(details) < batch_limit:
+            return fills, True
+        after = str(oldest_ts - 1)
+    return fills, False
+
+
+class LiquidationLog:
+    """
+    单个合约的追加日志：每行一条原始成交明细，配套状态文件保存水位线。
+    """
+
+    def __init__(self, uly: str = "ETH-USDT", inst_type: str = "SWAP", log_dir: str = LIQUIDATION_LOG_DIR) -> None:
+        self.uly = uly
+        self.inst_type = inst_type
+        self.path = os.path.join(log_dir, f"{uly}_{inst_type}.jsonl")
+        self.state_path = os.path.join(log_dir, f"{uly}_{inst_type}.state.json")
+
+    def load_state(self) -> Dict[str, Optional[int]]:
+        """
+        newest_ts 为已写入的最新成交时间；covered_from 为自该时间起至 newest_ts 日志连续完整。
+        """
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {"newest_ts": None, "covered_from": None}
+        return {"newest_ts": state.get("newest_ts"), "covered_from": state.get("covered_from")}
+
+    def _save_state(self, newest_ts: Optional[int], covered_from: Optional[int]) -> None:
+        _write_atomic(self.state_path, json.dumps({"newest_ts": newest_ts, "covered_from": covered_from}))
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """
+        同一日志的同步互斥：进程内按路径的线程锁，加上 .lock 文件的 flock（跨进程）。
+        """
+        with _thread_lock(self.path):
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_fills(self, since_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        读取日志中 ts >= since_ms 的成交明细（按键去重，忽略损坏的行），按时间升序返回。
+        """
+        fills: Dict[FillKey, Dict[str, Any]] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        detail = json.loads(line)
+                    except ValueError:
+                        continue
+                    key = _fill_key(detail) if isinstance(detail, dict) else None
+                    if key is None or (since_ms is not None and key[0] < since_ms):
+                        continue
+                    fills[key] = detail
+        except OSError:
+            return []
+        return [fills[key] for key in sorted(fills)]
+
+    def _append(self, fills: List[Dict[str, Any]], known: Set[FillKey]) -> int:
+        lines: List[str] = []
+        for detail in sorted(fills, key=lambda d: fill_ts(d) or 0):
+            key = _fill_key(detail)
+            if key is None or key in known:
+                continue
+            known.add(key)
+            lines.append(json.dumps(detail, ensure_ascii=False, separators=(",", ":")))
+        if lines:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        return len(lines)
+
+    def _compact(self, retain_from_ms: int) -> None:
+        kept = self.read_fills(since_ms=retain_from_ms)
+        _write_atomic(
+            self.path,
+            "".join(json.dumps(detail, ensure_ascii=False, separators=(",", ":")) + "\n" for detail in kept),
+        )
+
+    def sync(
+        self,
+        fetch_page: PageFetcher,
+        since_ms: int,
+        batch_limit: int = 100,
+        max_batches: int = 500,
+        retention_days: float = LIQUIDATION_RETENTION_DAYS,
+    ) -> Dict[str, int]:
+        """
+        补齐日志：先从当前时间翻页到水位线，再在覆盖起点晚于 since_ms 时向更早回补。
+        任一页请求出错时异常向上抛出，本次已翻到的数据不写入，水位线保持不变。
+        整个同步（读水位线、翻页、追加、压缩、写状态）持有日志锁，并发的同步依次进行，后者只需翻到前者的水位线。
+        返回 {"requests": 请求次数, "appended": 新增条数}。
+        """
+        with self._locked():
+            return self._sync(fetch_page, since_ms, batch_limit, max_batches, retention_days)
+
+    def _sync(
+        self,
+        fetch_page: PageFetcher,
+        since_ms: int,
+        batch_limit: int,
+        max_batches: int,
+        retention_days: float,
+    ) -> Dict[str, int]:
+        calls = 0
+
+        def counted(params: Dict[str, Any]) -> Any:
+            nonlocal calls
+            calls += 1
+            return fetch_page(params)
+
+        state = self.load_state()
+        newest_ts, covered_from = state["newest_ts"], state["covered_from"]
+        fetched: List[Dict[str, Any]] = []
+        if newest_ts is None or covered_from is None:
+            fills, complete = page_liquidations(counted, self.uly, self.inst_type, since_ms, None, batch_limit, max_batches)
+            fetched.extend(fills)
+            stamps = [fill_ts(d) for d in fills]
+            newest_ts = max(stamps) if stamps else None
+            covered_from = since_ms if complete else (min(stamps) if stamps else None)
+        else:
+            fills, complete = page_liquidations(counted, self.uly, self.inst_type, newest_ts, None, batch_limit, max_batches)
+            fetched.extend(fills)
+            stamps = [fill_ts(d) for d in fills]
+            if stamps:
+                if not complete:
+                    # 新数据超过翻页上限，与旧日志之间留有缺口，只能从本次最早的成交重新计算连续覆盖
+                    print(f"爆仓日志 {self.path} 新增数据超过 {max_batches} 页，较早部分存在缺口。")
+                    covered_from = min(stamps)
+                newest_ts = max(newest_ts, max(stamps))
+            if covered_from > since_ms:
+                fills, complete = page_liquidations(
+                    counted, self.uly, self.inst_type, since_ms, str(covered_from - 1), batch_limit, max_batches
+                )
+                fetched.extend(fills)
+                stamps = [fill_ts(d) for d in fills]
+                covered_from = since_ms if complete else (min(stamps) if stamps else covered_from)
+
+        known = {key for key in (_fill_key(d) for d in self.read_fills()) if key is not None}
+        appended = self._append(fetched, known)
+        retain_from = int((time.time() - retention_days * 86400) * 1000)
+        if appended and known and min(key[0] for key in known) < retain_from:
+            self._compact(retain_from)
+            if covered_from is not None:
+                covered_from = max(covered_from, retain_from)
+        if newest_ts is not None:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            self._save_state(newest_ts, covered_from)
+        return {"requests": calls, "appended": appended}
+
+
+def collect_liquidation_fills(
+    fetch_page: PageFetcher,
+    uly: str,
+    inst_type: str,
+    since_ms: int,
+    batch_limit: int = 100,
+    max_batches: int = 500,
+    log_dir: str = LIQUIDATION_LOG_DIR,
+) -> List[Dict[str, Any]]:
+    """
+    返回 ts >= since_ms 的原始爆仓成交明细（按时间升序）。
+    配置了 log_dir 时先增量同步本地日志再从日志读取，否则直接按窗口完整翻页。
+    """
+    if not log_dir:
+        fills, _ = page_liquidations(fetch_page, uly, inst_type, since_ms, None, batch_limit, max_batches)
+        unique = {key: d for key, d in ((_fill_key(d), d) for d in fills) if key is not None}
+        return [unique[key] for key in sorted(unique)]
+    log = LiquidationLog(uly, inst_type, log_dir)
+    log.sync(fetch_page, since_ms, batch_limit=batch_limit, max_batches=max_batches)
+    return log.read_fills(since_ms=since_ms)
@@ -0,0 +1,513 @@
+"""
+日常任务的 DAG 运行器：把 获取数据.py、fetch_onchain_and_news.py 与 model_analysis.py 的步骤拆成带依赖的阶段，
+在线程池中并发执行互不依赖的阶段，整条任务的墙钟耗时收敛到最长依赖链。
+
+    candles ───────┐
+    open_interest ─┼─> indicators ─┬─> signals ──┐
+    liquidations ──┤               └─> charts    ├─> prompt ─> llm
+                   └─> snapshot ─────────────────┘
+
+snapshot 排在 liquidations 之后：两者共用同一份本地爆仓日志（okx_liquidations.py），
+先由 liquidations 同步，快照只需补翻水位线之后的少量成交。
+
+- 数据源阶段（candles / open_interest / liquidations / snapshot / prompt）每次都运行，指纹为其结果的哈希；
+- 其余阶段的输入哈希由阶段名、参数、实现代码与上游指纹计算。写文件的阶段在上次清单中输入哈希相同、
+  输出文件仍在且内容未变时跳过；只在内存中传递结果的阶段（indicators）延迟到下游确实需要时才计算；
+- 每次运行把各阶段的状态、起止时间、输入哈希与输出文件哈希写入 PIPELINE_MANIFEST_PATH，并给出关键路径。
+
+用法：python pipeline.py [--data-only] [--force [阶段 ...]] [--refresh]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import pandas as pd
+import requests
+
+import fetch_onchain_and_news as onchain
+import model_analysis
+import 获取数据 as daily
+from llm_cache import LLM_CACHE_REFRESH
+
+# 运行清单（各阶段耗时、输入 / 输出哈希），下次运行据此判断哪些阶段可以跳过；设为空字符串则不读写
+PIPELINE_MANIFEST_PATH = os.getenv("PIPELINE_MANIFEST_PATH", "data/pipeline_manifest.json")
+# 同时执行的阶段数，设为 1 时按依赖顺序串行执行
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+
+ROOT = Path(__file__).resolve().parent
+MANIFEST_VERSION = 1
+# 快照中每次运行必变、不影响下游内容的字段，不计入指纹
+SNAPSHOT_VOLATILE_KEYS = ("generated_at", "timings")
+
+
+class Stage:
+    """
+    一个流水线阶段：func 接收 {上游阶段名: 结果}；outputs 为写出的文件。
+    pure 为 False 的阶段（读取外部数据源）每次都运行，指纹取自结果（可用 fingerprint 覆盖）；
+    pure 阶段的指纹即输入哈希。cacheable 判断本次结果能否用于下次跳过。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Any],
+        deps: Sequence[str] = (),
+        outputs: Sequence[str] = (),
+        params: Optional[Dict[str, Any]] = None,
+        code: Sequence[str] = (),
+        pure: bool = True,
+        fingerprint: Optional[Callable[[Any], str]] = None,
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.outputs = tuple(outputs)
+        self.params = params or {}
+        self.code = tuple(code)
+        self.pure = pure
+        self.fingerprint = fingerprint or value_fingerprint
+        self.cacheable = cacheable
+
+
+def value_fingerprint(value: Any) -> str:
+    digest = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(json.dumps([str(column) for column in value.columns]).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def file_sha256(path: str) -> Optional[str]:
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+_code_hashes: Dict[str, Optional[str]] = {}
+
+
+def _code_hash(module_file: str) -> Optional[str]:
+    if module_file not in _code_hashes:
+        _code_hashes[module_file] = file_sha256(str(ROOT / module_file))
+    return _code_hashes[module_file]
+
+
+def input_hash(stage: Stage, dep_fingerprints: Dict[str, str]) -> str:
+    blob = {
+        "stage": stage.name,
+        "params": stage.params,
+        "code": {module_file: _code_hash(module_file) for module_file in stage.code},
+        "deps": dep_fingerprints,
+    }
+    return value_fingerprint(blob)
+
+
+def load_manifest(path: str = PIPELINE_MANIFEST_PATH) -> Dict[str, Any]:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as exc:
+        print(f"读取运行清单失败：{exc}，本次不跳过任何阶段。")
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def save_manifest(manifest: Dict[str, Any], path: str = PIPELINE_MANIFEST_PATH) -> Optional[Path]:
+    if not path:
+        return None
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, target)
+    return target
+
+
+def critical_path(stages: Dict[str, Stage], records: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    按各阶段实际耗时计算最长依赖链（跳过的阶段计 0）。
+    """
+    best: Dict[str, Tuple[float, List[str]]] = {}
+
+    def length(item: Tuple[float, List[str]]) -> Tuple[float, int]:
+        # 耗时相同（如都近似 0）时取更长的链
+        return item[0], len(item[1])
+
+    def visit(name: str) -> Tuple[float, List[str]]:
+        if name not in best:
+            elapsed = records[name].get("elapsed_s") or 0.0
+            upstream = max((visit(dep) for dep in stages[name].deps), default=(0.0, []), key=length)
+            best[name] = (upstream[0] + elapsed, upstream[1] + [name])
+        return best[name]
+
+    total, chain = max((visit(name) for name in stages), default=(0.0, []), key=length)
+    return {"stages": chain, "elapsed_s": round(total, 3)}
+
+
+class PipelineRun:
+    """
+    一次流水线运行。协调逻辑在调用线程中执行，阶段本身提交到线程池。
+
+    阶段状态：pending → deferred（纯内存阶段，等待下游需要）/ skipped / waiting（等待上游结果）→ running
+    → ran / failed；上游失败或被禁用时为 blocked，disabled 为本次未启用的阶段。
+    """
+
+    def __init__(
+        self,
+        stages: Iterable[Stage],
+        previous: Optional[Dict[str, Any]] = None,
+        force: Iterable[str] = (),
+        disabled: Iterable[str] = (),
+        max_workers: int = PIPELINE_MAX_WORKERS,
+    ) -> None:
+        self.stages: Dict[str, Stage] = {stage.name: stage for stage in stages}
+        for stage in self.stages.values():
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"阶段 {stage.name} 依赖未定义的阶段：{', '.join(missing)}")
+        self.previous = (previous or {}).get("stages", {})
+        self.force = set(force)
+        self.max_workers = max(1, max_workers)
+        self.records: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "deps": list(stage.deps)} for name, stage in self.stages.items()
+        }
+        for name in disabled:
+            if name in self.records:
+                self.records[name]["status"] = "disabled"
+        self.values: Dict[str, Any] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.started = 0.0
+
+    def _can_skip(self, stage: Stage, digest: str) -> bool:
+        if stage.name in self.force:
+            return False
+        previous = self.previous.get(stage.name) or {}
+        if previous.get("input_hash") != digest or not previous.get("cacheable"):
+            return False
+        recorded = previous.get("outputs") or {}
+        return all(path in recorded and file_sha256(path) == recorded[path] for path in stage.outputs)
+
+    def _has_value(self, name: str) -> bool:
+        # 写文件的阶段由下游自行读取文件，不需要内存中的结果
+        return name in self.values or (
+            bool(self.stages[name].outputs) and self.records[name]["status"] in {"ran", "skipped"}
+        )
+
+    def _resolve(self, name: str) -> bool:
+        stage = self.stages[name]
+        record = self.records[name]
+        dep_status = [self.records[dep]["status"] for dep in stage.deps]
+        if any(status in {"failed", "blocked", "disabled"} for status in dep_status):
+            record["status"] = "blocked"
+            return True
+        if not all(dep in self.fingerprints for dep in stage.deps):
+            return False
+        if stage.pure:
+            digest = input_hash(stage, {dep: self.fingerprints[dep] for dep in stage.deps})
+            record["input_hash"] = digest
+            if not stage.outputs and name not in self.force:
+                record["status"] = "deferred"
+                self.fingerprints[name] = digest
+                return True
+            if self._can_skip(stage, digest):
+                record["status"] = "skipped"
+                record["cacheable"] = True
+                record["outputs"] = dict(self.previous[name]["outputs"])
+                self.fingerprints[name] = digest
+                return True
+        record["status"] = "waiting"
+        return True
+
+    def _advance(self, executor: ThreadPoolExecutor, running: Dict[Future, str]) -> None:
+        changed = True
+        while changed:
+            changed = False
+            for name, record in self.records.items():
+                if record["status"] == "pending":
+                    changed |= self._resolve(name)
+                elif record["status"] == "waiting":
+                    needed = [dep for dep in self.stages[name].deps if not self._has_value(dep)]
+                    for dep in needed:
+                        if self.records[dep]["status"] == "deferred":
+                            self.records[dep]["status"] = "waiting"
+                            changed = True
+                    if not needed:
+                        record["status"] = "running"
+                        future = executor.submit(self._execute, name)
+                        running[future] = name
+                        changed = True
+
+    def _execute(self, name: str) -> Any:
+        stage = self.stages[name]
+        record = self.records[name]
+        record["started_s"] = round(time.monotonic() - self.started, 3)
+        started = time.monotonic()
+        try:
+            inputs = {dep: self.values.get(dep) for dep in stage.deps}
+            return stage.func(inputs)
+        finally:
+            record["elapsed_s"] = round(time.monotonic() - started, 3)
+
+    def _finish(self, name: str, future: Future) -> None:
+        stage = self.stages[name]
+        record = self.records[name]
+        try:
+            value = future.result()
+        except Exception as exc:
+            record["status"] = "failed"
+            record["error"] = f"{type(exc).__name__}: {exc}"
+            print(f"阶段 {name} 失败：{record['error']}")
+            traceback.print_exception(type(exc), exc, exc.__traceback__)
+            return
+        self.values[name] = value
+        if stage.pure:
+            self.fingerprints[name] = record["input_hash"]
+        else:
+            self.fingerprints[name] = stage.fingerprint(value)
+            record["fingerprint"] = self.fingerprints[name]
+        record["outputs"] = {path: file_sha256(path) for path in stage.outputs if os.path.exists(path)}
+        record["cacheable"] = stage.cacheable(value) if stage.cacheable else True
+        record["status"] = "ran"
+
+    def run(self) -> Dict[str, Any]:
+        started_at = datetime.now(timezone.utc).isoformat()
+        self.started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as executor:
+            running: Dict[Future, str] = {}
+            self._advance(executor, running)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._finish(running.pop(future), future)
+                self._advance(executor, running)
+        for record in self.records.values():
+            # 没有下游需要的纯内存阶段视为跳过
+            if record["status"] == "deferred":
+                record["status"] = "skipped"
+        wall = time.monotonic() - self.started
+        serial = sum(record.get("elapsed_s") or 0.0 for record in self.records.values())
+        return {
+            "version": MANIFEST_VERSION,
+            "started_at": started_at,
+            "wall_s": round(wall, 3),
+            "serial_s": round(serial, 3),
+            "critical_path": critical_path(self.stages, self.records),
+            "stages": self.records,
+        }
+
+
+def format_manifest(manifest: Dict[str, Any]) -> str:
+    lines = [f"{'阶段':<14}{'状态':<10}{'开始':>8}{'耗时':>9}"]
+    for name, record in manifest["stages"].items():
+        started = f"{record['started_s']:.1f}s" if "started_s" in record else "-"
+        elapsed = f"{record['elapsed_s']:.1f}s" if "elapsed_s" in record else "-"
+        lines.append(f"{name:<16}{record['status']:<10}{started:>8}{elapsed:>9}")
+    path = manifest["critical_path"]
+    lines.append(
+        f"墙钟 {manifest['wall_s']:.1f}s（各阶段累计 {manifest['serial_s']:.1f}s），"
+        f"关键路径 {' → '.join(path['stages'])} {path['elapsed_s']:.1f}s"
+    )
+    return "\n".join(lines)
+
+
+def _fetch_candles(inputs: Dict[str, Any]) -> pd.DataFrame:
+    df = daily.fetch_daily_ohlcv(daily.build_exchange())
+    print(f"获取到日线条数: {len(df)}，时间范围: {df.index.min()} ~ {df.index.max()}")
+    # 去除未收盘的当日 K 线
+    return df.iloc[:-1].copy() if len(df) > 0 else df
+
+
+def _fetch_open_interest(inputs: Dict[str, Any]) -> pd.DataFrame:
+    try:
+        oi_history = daily.fetch_open_interest_volume_history(limit=180)
+    except (requests.RequestException, RuntimeError, ValueError) as exc:
+        print(f"开仓量历史获取失败：{exc}")
+        return pd.DataFrame(columns=["open_interest_usd", "perp_volume_usd"])
+    if oi_history.empty:
+        print("未获取到开仓量历史数据。")
+    else:
+        daily.export_open_interest_history(oi_history)
+    return oi_history
+
+
+def _fetch_liquidations(inputs: Dict[str, Any]) -> pd.DataFrame:
+    try:
+        liquidation_daily = daily.fetch_liquidation_aggregates(hours=24 * 30)
+    except (requests.RequestException, RuntimeError, ValueError, OSError) as exc:
+        print(f"爆仓数据获取失败：{exc}")
+        return pd.DataFrame(columns=["liquidation_long_usd", "liquidation_short_usd"])
+    if liquidation_daily.empty:
+        print("未获取到爆仓聚合数据。")
+    else:
+        daily.export_liquidation_history(liquidation_daily)
+    return liquidation_daily
+
+
+def _compute_indicators(inputs: Dict[str, Any]) -> pd.DataFrame:
+    df = daily.compute_indicators(inputs["candles"], "okx", daily.DEFAULT_MA_WINDOWS)
+    if not inputs["open_interest"].empty:
+        df = daily.join_open_interest(df, inputs["open_interest"], "ETH")
+    if not inputs["liquidations"].empty:
+        df = df.join(inputs["liquidations"], how="left")
+    return df
+
+
+def _export_signals(inputs: Dict[str, Any]) -> None:
+    df = inputs["indicators"]
+    daily.export_recent_signals(df, lookback=60)
+    # 导出 ATR 指标至 360 天，以满足前端 360 天可视化需求
+    daily.export_atr_metrics(df, period=14, lookback=360, path="atr_metrics.json")
+    daily.print_volume_summary(df)
+
+
+def _render_charts(inputs: Dict[str, Any]) -> Dict[str, str]:
+    if not daily.plotting_available():
+        print("跳过绘图：Matplotlib/Numpy 未安装或未正确加载。")
+        return {}
+    jobs = daily.daily_chart_jobs(inputs["indicators"], inputs["open_interest"], inputs["liquidations"])
+    executor = daily.chart_executor()
+    try:
+        return daily.collect_charts(daily.submit_charts(jobs, executor))
+    finally:
+        if executor is not None:
+            daily.shutdown_chart_executor(executor)
+
+
+def _snapshot_fingerprint(snapshot: Dict[str, Any]) -> str:
+    return value_fingerprint({key: value for key, value in snapshot.items() if key not in SNAPSHOT_VOLATILE_KEYS})
+
+
+def _build_prompt(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    signals = model_analysis.load_signals(model_analysis.SIGNAL_FILE)
+    snapshot = model_analysis.load_onchain_snapshot(model_analysis.ONCHAIN_SNAPSHOT_FILE)
+    payload = model_analysis.build_payload(signals, snapshot)
+    if payload["recent_data"]:
+        print("最新交易日数据快照：")
+        print(json.dumps(payload["recent_data"][-1], ensure_ascii=False, indent=2))
+    return payload
+
+
+def build_stages(stream: bool = model_analysis.LLM_STREAM, refresh: bool = LLM_CACHE_REFRESH) -> List[Stage]:
+    providers = [name for name, key in (("Gemini", "GEMINI_API_KEY"), ("DeepSeek", "DEEPSEEK_API_KEY")) if os.environ.get(key)]
+    return [
+        Stage("candles", _fetch_candles, pure=False),
+        Stage("open_interest", _fetch_open_interest, outputs=["eth_open_interest_history.json"], pure=False),
+        Stage("liquidations", _fetch_liquidations, outputs=["eth_liquidations_daily.json"], pure=False),
+        Stage(
+            "indicators",
+            _compute_indicators,
+            deps=["candles", "open_interest", "liquidations"],
+            params={"mode": daily.INDICATOR_MODE, "ma_windows": daily.DEFAULT_MA_WINDOWS},
+            code=["获取数据.py", "indicator_engine.py"],
+        ),
+        Stage(
+            "signals",
+            _export_signals,
+            deps=["indicators"],
+            outputs=["signals_60d.json", "atr_metrics.json"],
+            params={"lookback": 60, "atr_lookback": 360},
+            code=["获取数据.py"],
+        ),
+        Stage(
+            "charts",
+            _render_charts,
+            deps=["indicators", "open_interest", "liquidations"],
+            outputs=["eth_okx_daily.png", "eth_open_interest_liquidations.png"],
+            params={"style": daily.CHART_STYLE_VERSION},
+            code=["获取数据.py"],
+        ),
+        Stage(
+            "snapshot",
+            lambda inputs: onchain.run_snapshot(onchain.DEFAULT_OUTPUT),
+            deps=["liquidations"],
+            outputs=[str(onchain.DEFAULT_OUTPUT)],
+            pure=False,
+            fingerprint=_snapshot_fingerprint,
+        ),
+        # 提示词包含当天（北京时间）日期，每次重新组装
+        Stage("prompt", _build_prompt, deps=["signals", "snapshot"], pure=False),
+        Stage(
+            "llm",
+            lambda inputs: model_analysis.generate_report(
+                inputs["prompt"], model_analysis.resolve_llm_proxy(), refresh=refresh, stream=stream
+            ),
+            deps=["prompt"],
+            outputs=["model_analysis.md", "model_email_body.md"],
+            params={"providers": providers},
+            code=["model_analysis.py", "prompt_budget.py"],
+            # 离线回退的报告不作为跳过依据，下次运行仍尝试调用模型
+            cacheable=lambda label: label != "Offline",
+        ),
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="按依赖并发运行日常数据、快照与模型分析阶段。")
+    parser.add_argument("--data-only", action="store_true", default=daily.DATA_ONLY, help="不绘图（不导入 matplotlib）")
+    parser.add_argument(
+        "--force", nargs="*", metavar="STAGE", help="忽略运行清单重新执行指定阶段；不带阶段名时重新执行全部阶段"
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", default=LLM_CACHE_REFRESH, help="重新调用模型（同时忽略模型回复缓存）"
+    )
+    parser.add_argument(
+        "--no-stream", dest="stream", action="store_false", default=model_analysis.LLM_STREAM, help="使用一次性返回的模型接口"
+    )
+    parser.add_argument("--max-workers", type=int, default=PIPELINE_MAX_WORKERS, help="同时执行的阶段数")
+    args = parser.parse_args(argv)
+
+    stages = build_stages(stream=args.stream, refresh=args.refresh)
+    if args.force is None:
+        force: Set[str] = set()
+    else:
+        force = set(args.force) or {stage.name for stage in stages}
+    if args.refresh:
+        force.add("llm")
+    run = PipelineRun(
+        stages,
+        previous=load_manifest(),
+        force=force,
+        disabled=["charts"] if args.data_only else [],
+        max_workers=args.max_workers,
+    )
+    manifest = run.run()
+    path = save_manifest(manifest)
+    print(format_manifest(manifest))
+    if path:
+        print(f"运行清单已写入 {path}")
+    okx_stats = daily.format_okx_stats()
+    if okx_stats:
+        print(okx_stats)
+    failed = [name for name, record in manifest["stages"].items() if record["status"] in {"failed", "blocked"}]
+    if failed:
+        print(f"未完成的阶段：{', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
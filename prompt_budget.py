@@ -0,0 +1,183 @@
+"""
+提示词压缩与 token 预算：把信号数据与原始数据块编码为紧凑的表格 / 精简 JSON，
+估算 token 数，并在超出预算时按优先级丢弃低优先级数据块、再从最早的交易日开始裁剪信号表。
+
+token 数为近似值：CJK 字符按 1 token、其余字符按每 4 个 1 token 计，不依赖具体模型的分词器；
+实际用量以模型返回的 usage 为准。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 单次请求（系统提示 + 用户消息）的 token 预算，设为 0 则不限制
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "16000"))
+# 超出预算时信号表至少保留的交易日数
+PROMPT_MIN_SIGNAL_ROWS = int(os.getenv("PROMPT_MIN_SIGNAL_ROWS", "20"))
+
+# 数据块优先级：数值越大越重要；REQUIRED 的数据块不会被丢弃
+PRIORITY_REQUIRED = 100
+PRIORITY_SUMMARY = 50
+PRIORITY_DERIVATIVES_RAW = 20
+PRIORITY_NEWS_RAW = 10
+
+_CJK_RE = re.compile(r"[⺀-鿿가-힯豈-﫿＀-￯]")
+
+PromptBlock = Tuple[int, str]
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def _ma_code(status: Any) -> str:
+    """
+    ma_status 单条均线的四个布尔值编码为短代码：A=above，B=below，↑3=stood_above_3，↓3=fell_below_3。
+    """
+    if not isinstance(status, dict):
+        return ""
+    code = ("A" if status.get("above") else "") + ("B" if status.get("below") else "")
+    code += ("↑3" if status.get("stood_above_3") else "") + ("↓3" if status.get("fell_below_3") else "")
+    return code or "-"
+
+
+def encode_signal_rows(rows: Sequence[Dict[str, Any]]) -> str:
+    """
+    将 signals_60d.json 的记录编码为 TSV：标量字段保持原名为列；
+    signals 合并为一列，列出取值为 true 的信号名；ma_status 每条均线一列（列名 ma_status.ma_N）。
+    """
+    scalar_cols: List[str] = []
+    ma_cols: List[str] = []
+    has_signals = False
+    for row in rows:
+        for key, value in row.items():
+            if key == "signals":
+                has_signals = True
+            elif key == "ma_status" and isinstance(value, dict):
+                ma_cols.extend(k for k in value if k not in ma_cols)
+            elif key not in scalar_cols:
+                scalar_cols.append(key)
+    header = scalar_cols + (["signals"] if has_signals else []) + [f"ma_status.{k}" for k in ma_cols]
+    lines = ["\t".join(header)]
+    for row in rows:
+        cells = [_cell(row.get(col)) for col in scalar_cols]
+        if has_signals:
+            flags = row.get("signals")
+            active = [name for name, on in flags.items() if on] if isinstance(flags, dict) else []
+            cells.append(",".join(active) or "-")
+        status = row.get("ma_status") if isinstance(row.get("ma_status"), dict) else {}
+        cells.extend(_ma_code(status.get(k)) for k in ma_cols)
+        lines.append("\t".join(cells))
+    return "\n".join(lines)
+
+
+SIGNAL_TABLE_LEGEND = (
+    "格式：TSV，首行为列名，每行一个交易日（按时间升序，最后一行为最新收盘日）；空单元格表示缺失，布尔值 1/0；"
+    "signals 列列出当日为 true 的信号名（- 表示无）；ma_status.ma_N 列：A=收盘在均线上方，B=下方，"
+    "↑3=已连续 3 天站上，↓3=已连续 3 天跌破。"
+)
+
+
+def compact_value(value: Any) -> Any:
+    """
+    无损压缩嵌套结构：字段相同的对象列表改写为 {"cols": [...], "rows": [[...], ...]}。
+    """
+    if isinstance(value, dict):
+        return {k: compact_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        items = [compact_value(v) for v in value]
+        if len(items) >= 3 and all(isinstance(v, dict) for v in items):
+            cols: List[str] = []
+            for item in items:
+                cols.extend(k for k in item if k not in cols)
+            if len(cols) <= 16 and all(not isinstance(v, (dict, list)) for item in items for v in item.values()):
+                return {"cols": cols, "rows": [[item.get(c) for c in cols] for item in items]}
+        return items
+    return value
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(compact_value(value), ensure_ascii=False, separators=(",", ":"))
+
+
+def fit_blocks(
+    blocks: Sequence[PromptBlock],
+    budget: int,
+    reserved: int = 0,
+) -> Tuple[List[str], List[str], int]:
+    """
+    在 budget（扣除 reserved）内保留尽量多的数据块：按优先级从低到高、同级从后往前丢弃，
+    PRIORITY_REQUIRED 的块始终保留。返回 (按原顺序保留的块, 被丢弃的块, 保留部分的 token 数)。
+    """
+    sizes = [estimate_tokens(text) for _, text in blocks]
+    total = reserved + sum(sizes)
+    dropped_idx: List[int] = []
+    if budget > 0:
+        order = sorted(
+            (i for i, (priority, _) in enumerate(blocks) if priority < PRIORITY_REQUIRED),
+            key=lambda i: (blocks[i][0], -i),
+        )
+        for i in order:
+            if total <= budget:
+                break
+            dropped_idx.append(i)
+            total -= sizes[i]
+    dropped = set(dropped_idx)
+    kept = [text for i, (_, text) in enumerate(blocks) if i not in dropped]
+    return kept, [blocks[i][1] for i in sorted(dropped)], total
+
+
+def budget_prompt(
+    system_prompt: str,
+    rows: Sequence[Dict[str, Any]],
+    blocks: Iterable[PromptBlock],
+    budget: int = PROMPT_TOKEN_BUDGET,
+    min_rows: int = PROMPT_MIN_SIGNAL_ROWS,
+    table_title: str = "信号数据",
+) -> Dict[str, Any]:
+    """
+    组装用户消息块：信号表（必留）+ 其余数据块。超出预算时先丢弃低优先级块，
+    仍超出则从最早的交易日裁剪信号表（至少保留 min_rows 行）。
+    返回 {"blocks", "dropped", "rows", "tokens", "budget"}。
+    """
+    blocks = list(blocks)
+    reserved = estimate_tokens(system_prompt)
+    kept_rows = list(rows)
+    while True:
+        table = f"以下是最近{len(kept_rows)}天的{table_title}（recent_data）。{SIGNAL_TABLE_LEGEND}\n" + encode_signal_rows(kept_rows)
+        kept, dropped, total = fit_blocks([(PRIORITY_REQUIRED, table)] + blocks, budget, reserved)
+        if budget <= 0 or total <= budget or len(kept_rows) <= min_rows:
+            break
+        over = total - budget
+        per_row = max(1, estimate_tokens(table) // max(1, len(kept_rows) + 1))
+        kept_rows = kept_rows[-max(min_rows, len(kept_rows) - math.ceil(over / per_row)):]
+    return {"blocks": kept, "dropped": dropped, "rows": len(kept_rows), "tokens": total, "budget": budget}
+
+
+def describe_budget(result: Dict[str, Any], full_rows: Optional[int] = None) -> str:
+    parts = [f"提示词约 {result['tokens']} tokens"]
+    if result["budget"] > 0:
+        parts.append(f"预算 {result['budget']}")
+    if result["dropped"]:
+        names = [text.split("：", 1)[0].split("\n", 1)[0][:20] for text in result["dropped"]]
+        parts.append("已丢弃：" + "、".join(names))
+    if full_rows is not None and result["rows"] < full_rows:
+        parts.append(f"信号表裁剪为最近 {result['rows']} 天")
+    return "，".join(parts)
@@ -0,0 +1,176 @@
+"""
+快照数据源计量：记录每次上游请求的耗时、字节数、状态码、重试次数与缓存命中，并按数据源汇总，
+写入快照的 timings 段，同时每次运行向 SNAPSHOT_METRICS_PATH 追加一行 JSON，便于跨日比较。
+
+数据源名称经 contextvars 传递：_run_sources 为每个数据源进入 source_scope(name)，嵌套的 scope 以 "/" 拼接
+（如 ethereum_flows/stablecoin_history）；在子线程中发出的请求需通过 contextvars.copy_context().run 提交
+才能归入所属数据源，否则按域名归类。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+# 计量日志（JSON Lines，每次运行一行），设为空字符串则只写入快照
+SNAPSHOT_METRICS_PATH = os.getenv("SNAPSHOT_METRICS_PATH", "data/snapshot_metrics.jsonl")
+
+_current_source: ContextVar[Optional[str]] = ContextVar("snapshot_source", default=None)
+
+
+@contextmanager
+def source_scope(name: str) -> Iterator[None]:
+    parent = _current_source.get()
+    token = _current_source.set(f"{parent}/{name}" if parent else name)
+    try:
+        yield
+    finally:
+        _current_source.reset(token)
+
+
+class SourceMetrics:
+    """
+    线程安全的请求记录器；calls 为逐次请求记录，sources 为 _run_sources 记录的各数据源墙钟耗时。
+    """
+
+    def __init__(self) -> None:
+        self.calls: List[Dict[str, Any]] = []
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = []
+            self.sources = {}
+            self.started = time.monotonic()
+
+    @contextmanager
+    def call(self, url: str) -> Iterator[Dict[str, Any]]:
+        """
+        计时一次请求；调用方在 with 块内补充 status / bytes / retries / cache，异常时记录异常类型。
+        """
+        record: Dict[str, Any] = {
+            "source": _current_source.get() or urlsplit(url).hostname,
+            "url": url,
+            "status": None,
+            "bytes": 0,
+            "retries": 0,
+            "cache": None,
+            "error": None,
+        }
+        started = time.monotonic()
+        try:
+            yield record
+        except Exception as exc:
+            record["error"] = record["error"] or type(exc).__name__
+            raise
+        finally:
+            record["elapsed_s"] = round(time.monotonic() - started, 4)
+            with self._lock:
+                self.calls.append(record)
+
+    def observe(self, record: Dict[str, Any], response: requests.Response, count_body: bool = True) -> None:
+        record["status"] = response.status_code
+        record["cache"] = response.headers.get("X-Cache")
+        record["retries"] = getattr(response, "retries", 0)
+        if count_body:
+            record["bytes"] = len(response.content or b"")
+
+    def get(self, session: requests.Session, url: str, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> requests.Response:
+        """
+        session.get 的计量版本（非流式）；异常原样抛出。
+        """
+        with self.call(url) as record:
+            response = session.get(url, params=params, **kwargs)
+            self.observe(record, response)
+            return response
+
+    def record_source(self, name: str, elapsed: float, error: Optional[str] = None) -> None:
+        """
+        以首次记录为准：超时占位之后才结束的数据源不覆盖 "timeout"。
+        """
+        with self._lock:
+            self.sources.setdefault(name, {"wall_s": round(elapsed, 3), "error": error})
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        按数据源汇总：墙钟耗时（仅顶层数据源）、请求数、字节数、重试次数、缓存命中与状态码分布。
+        """
+        with self._lock:
+            calls = list(self.calls)
+            sources = {name: dict(entry) for name, entry in self.sources.items()}
+        for record in calls:
+            entry = sources.setdefault(record["source"], {})
+            entry["calls"] = entry.get("calls", 0) + 1
+            entry["request_s"] = round(entry.get("request_s", 0.0) + record["elapsed_s"], 3)
+            entry["bytes"] = entry.get("bytes", 0) + record["bytes"]
+            entry["retries"] = entry.get("retries", 0) + record["retries"]
+            if record["cache"] in ("HIT", "REVALIDATED", "STALE"):
+                entry["cache_hits"] = entry.get("cache_hits", 0) + 1
+            status = Counter(entry.get("status", {}))
+            status[str(record["status"] or record["error"])] += 1
+            entry["status"] = dict(status)
+        return {
+            "total_s": round(time.monotonic() - self.started, 3),
+            "calls": len(calls),
+            "bytes": sum(record["bytes"] for record in calls),
+            "sources": dict(sorted(sources.items())),
+        }
+
+    def write_jsonl(
+        self, generated_at: str, summary: Optional[Dict[str, Any]] = None, path: str = SNAPSHOT_METRICS_PATH
+    ) -> Optional[Path]:
+        """
+        向计量日志追加一行：运行时间、汇总（缺省时现算）与逐次请求记录。
+        """
+        if not path:
+            return None
+        with self._lock:
+            calls = list(self.calls)
+        line = json.dumps(
+            {"generated_at": generated_at, **(summary or self.summary()), "requests": calls},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with target.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        return target
+
+
+_shared_metrics = SourceMetrics()
+
+
+def get_source_metrics() -> SourceMetrics:
+    """
+    进程内共享的记录器；aggregate_snapshot 每次运行前 reset。
+    """
+    return _shared_metrics
+
+
+def format_source_metrics(summary: Dict[str, Any], top: int = 5) -> Optional[str]:
+    sources = summary.get("sources") or {}
+    ranked = sorted(
+        ((name, entry) for name, entry in sources.items() if "wall_s" in entry),
+        key=lambda item: item[1]["wall_s"],
+        reverse=True,
+    )
+    if not ranked:
+        return None
+    parts = [f"{name} {entry['wall_s']:.1f}s" for name, entry in ranked[:top]]
+    return (
+        f"数据源耗时（总 {summary['total_s']:.1f}s，{summary['calls']} 次请求，"
+        f"{summary['bytes'] / 1024:.0f} KB）：" + "，".join(parts)
+    )
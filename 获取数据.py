@@ -1,31 +1,88 @@
 from __future__ import annotations
 
+import argparse
+import hashlib
 import json
+import multiprocessing
+import struct
 import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Iterable, List, Optional
-
-import ccxt
-# 尝试加载 matplotlib 进行可视化；如环境缺失则降级为仅导出数据
-try:
-    import matplotlib.dates as mdates
-    import matplotlib.pyplot as plt
-    # Configure fonts to support CJK glyphs when available
-    plt.rcParams['font.sans-serif'] = ['Noto Sans CJK SC', 'SimHei', 'DejaVu Sans']
-    plt.rcParams['axes.unicode_minus'] = False
-    from matplotlib.patches import Patch
-except Exception as _mpl_err:
-    plt = None
-    mdates = None
-    Patch = None
-    print(f"Matplotlib/Numpy 未就绪，绘图将跳过：{_mpl_err}")
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 import os
 import requests
 
+from history_store import HISTORY_STORE_PATH, HistoryStore, series_name, write_json_atomic
+from indicator_engine import update_indicator_frame
+from okx_client import format_okx_stats, get_okx_client
+from okx_liquidations import LIQUIDATION_LOG_DIR, LIQUIDATION_ORDERS_PATH, collect_liquidation_fills, fill_ts
+
+if TYPE_CHECKING:
+    import ccxt
+
 
 HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "30"))
+# 本地 K 线存储目录，设为空字符串则每次全量拉取
+OHLCV_STORE_DIR = os.getenv("OHLCV_STORE_DIR", "data/ohlcv")
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+# 指标计算方式：full 为每次全量重算；incremental 为读取 INDICATOR_STATE_DIR 下的引擎状态，仅计算新增 K 线
+INDICATOR_MODE = os.getenv("INDICATOR_MODE", "full").strip().lower()
+INDICATOR_STATE_DIR = os.getenv("INDICATOR_STATE_DIR", "data/indicators")
+# 多品种批量模式：BATCH_SYMBOLS=BTC,ETH,SOL,BNB,DOGE 时并发拉取各品种并在面板上一次计算指标
+BATCH_SYMBOLS = [s.strip().upper() for s in os.getenv("BATCH_SYMBOLS", "").split(",") if s.strip()]
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+BATCH_EXPORT_DIR = os.getenv("BATCH_EXPORT_DIR", "data/symbols")
+DEFAULT_MA_WINDOWS = [5, 10, 20, 60, 120, 180, 200, 250, 360]
+# 绘图进程数，设为 0/1 时在主进程内依次绘制
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+# 等待全部图表绘制完成的最长秒数，超时的图表记为 timeout，绘图进程随后被终止
+CHART_TIMEOUT = float(os.getenv("CHART_TIMEOUT", "300"))
+# 绘图代码或样式变更时递增，使已有 PNG 的输入哈希失效
+CHART_STYLE_VERSION = 1
+CHART_HASH_KEY = "InputHash"
+# 仅导出数据、不绘图（也可用命令行参数 --data-only）；此时不会导入 matplotlib
+DATA_ONLY = os.getenv("DATA_ONLY", "0").lower() in {"1", "true", "yes"}
+
+# matplotlib 与 ccxt 导入耗时较长（首次运行还要构建字体缓存），仅在需要绘图 / 访问交易所时加载
+_pyplot_modules: Optional[Tuple[Any, Any, Any]] = None
+_pyplot_error: Optional[Exception] = None
+
+
+def _load_pyplot() -> Optional[Tuple[Any, Any, Any]]:
+    """
+    按需加载 (pyplot, matplotlib.dates, Patch) 并配置中文字体；环境缺失时返回 None 且只提示一次。
+    """
+    global _pyplot_modules, _pyplot_error
+    if _pyplot_modules is None and _pyplot_error is None:
+        try:
+            import matplotlib.dates as mdates
+            import matplotlib.pyplot as plt
+            from matplotlib.patches import Patch
+
+            # Configure fonts to support CJK glyphs when available
+            plt.rcParams['font.sans-serif'] = ['Noto Sans CJK SC', 'SimHei', 'DejaVu Sans']
+            plt.rcParams['axes.unicode_minus'] = False
+            _pyplot_modules = (plt, mdates, Patch)
+        except Exception as exc:
+            _pyplot_error = exc
+            print(f"Matplotlib/Numpy 未就绪，绘图将跳过：{exc}")
+    return _pyplot_modules
+
+
+def plotting_available() -> bool:
+    return _load_pyplot() is not None
+
+
+def _require_pyplot() -> Tuple[Any, Any, Any]:
+    modules = _load_pyplot()
+    if modules is None:
+        raise RuntimeError(f"Matplotlib 不可用：{_pyplot_error}")
+    return modules
 
 
 def resolve_proxy(proxy_url: Optional[str] = None) -> Optional[str]:
@@ -50,61 +107,115 @@ def resolve_proxy(proxy_url: Optional[str] = None) -> Optional[str]:
 def make_okx_request(path: str, params: Dict[str, Any], proxy_url: Optional[str] = None) -> Dict[str, Any]:
     """
     Call OKX REST API and return parsed JSON payload, raising on transport or API errors.
+    请求经共享的 OkxClient 发出（连接池、限速与重试见 okx_client.py）。
     """
-    base_url = "https://www.okx.com"
-    session_params: Dict[str, Any] = {
-        "params": params,
-        "timeout": HTTP_TIMEOUT,
-    }
-    proxy = resolve_proxy(proxy_url)
-    if proxy:
-        session_params["proxies"] = {"http": proxy, "https": proxy}
-    response = requests.get(f"{base_url}{path}", **session_params)
-    response.raise_for_status()
-    payload = response.json()
-    if isinstance(payload, dict) and payload.get("code") not in (None, "0"):
-        code = payload.get("code")
-        message = payload.get("msg") or payload.get("error_message") or payload
-        raise RuntimeError(f"OKX API error {code}: {message}")
-    return payload
+    return get_okx_client(resolve_proxy(proxy_url)).get_json(path, params=params, timeout=HTTP_TIMEOUT)
 
 
 def build_exchange(proxy_url: Optional[str] = None) -> ccxt.okx:
     """
     Create an OKX exchange instance configured with an optional HTTP proxy.
     Clash 默认监听 127.0.0.1:7890，可以通过 proxy_url 覆盖。
+    ccxt 复用 OkxClient 的 Session，与 make_okx_request 共用连接池、限速额度和本地缓存。
     """
+    import ccxt
+
     settings: Dict[str, object] = {
         "enableRateLimit": True,
+        "session": get_okx_client(resolve_proxy(proxy_url)).session,
     }
-    proxy = resolve_proxy(proxy_url)
-    if proxy:
-        settings["proxies"] = {
-            "http": proxy,
-            "https": proxy,
-        }
     return ccxt.okx(settings)
 
 
+def ohlcv_store_path(store_dir: str, exchange_id: str, symbol: str, timeframe: str) -> str:
+    """
+    按交易所、交易对与周期生成本地 K 线存储文件路径。
+    """
+    safe_symbol = symbol.replace("/", "-").replace(":", "-")
+    return os.path.join(store_dir, f"{exchange_id}_{safe_symbol}_{timeframe}.npy")
+
+
+def load_ohlcv_store(path: str) -> np.ndarray:
+    """
+    以内存映射方式读取本地 K 线存储（N×6 float64，列顺序同 OHLCV_COLUMNS）。
+    文件缺失或格式不符时返回空数组，调用方将退回全量拉取。
+    """
+    empty = np.empty((0, len(OHLCV_COLUMNS)), dtype=np.float64)
+    if not os.path.exists(path):
+        return empty
+    try:
+        stored = np.load(path, mmap_mode="r")
+    except (OSError, ValueError) as exc:
+        print(f"读取本地 K 线存储失败：{exc}，将全量拉取。")
+        return empty
+    if stored.ndim != 2 or stored.shape[1] != len(OHLCV_COLUMNS):
+        print(f"本地 K 线存储格式不符（shape={stored.shape}），将全量拉取。")
+        return empty
+    return stored
+
+
+def save_ohlcv_store(path: str, rows: np.ndarray) -> None:
+    """
+    先写临时文件再原子替换，避免中途失败留下损坏的存储。
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(rows, dtype=np.float64))
+    os.replace(tmp_path, path)
+
+
+def merge_ohlcv_rows(stored: np.ndarray, fetched: Iterable[Iterable[float]]) -> np.ndarray:
+    """
+    合并本地与新拉取的 K 线；同一时间戳以新拉取的数据为准（覆盖交易所修订），按时间升序返回。
+    """
+    fresh = np.asarray(list(fetched), dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+    if len(stored) and len(fresh):
+        stale = np.isin(stored[:, 0], fresh[:, 0])
+        combined = np.concatenate([np.asarray(stored)[~stale], fresh])
+    elif len(fresh):
+        combined = fresh
+    else:
+        combined = np.array(stored, dtype=np.float64)
+    _, unique_idx = np.unique(combined[:, 0], return_index=True)
+    return combined[unique_idx]
+
+
 def fetch_daily_ohlcv(
     exchange: ccxt.okx,
     symbol: str = "ETH/USDT",
     days: int = 730,
+    store_dir: Optional[str] = OHLCV_STORE_DIR,
+    overlap_bars: int = 3,
 ) -> pd.DataFrame:
     """
     分批拉取最近指定天数的 OKX 日线数据。
     OKX 单次请求有数量限制，这里循环分页，覆盖约两年历史。
+    若 store_dir 下已有本地存储，则只请求最后一根已存 K 线之后的数据，
+    并回看 overlap_bars 根以覆盖交易所的修订；本地存储缺失或不足以覆盖窗口时全量拉取。
     返回列包括 open/high/low/close/volume，索引为北京时区的日期。
     """
     timeframe = "1d"
     limit = 200  # OKX 对日线最多返回 200 根
     timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
     since_dt = datetime.now(timezone.utc) - timedelta(days=days)
-    since = int(since_dt.timestamp() * 1000)
+    window_start = int(since_dt.timestamp() * 1000)
+    since = window_start
+
+    store_path: Optional[str] = None
+    stored = np.empty((0, len(OHLCV_COLUMNS)), dtype=np.float64)
+    if store_dir:
+        store_path = ohlcv_store_path(store_dir, getattr(exchange, "id", "okx"), symbol, timeframe)
+        stored = load_ohlcv_store(store_path)
+    if len(stored) and stored[0, 0] <= window_start + timeframe_ms:
+        since = max(window_start, int(stored[-1, 0]) - overlap_bars * timeframe_ms)
+        print(f"本地 K 线存储 {len(stored)} 根，增量拉取自 {datetime.fromtimestamp(since / 1000, tz=timezone.utc):%Y-%m-%d}")
 
     all_ohlcv: list[list[float]] = []
+    pages = 0
     while True:
         batch = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+        pages += 1
         if not batch:
             break
 
@@ -118,14 +229,17 @@ def fetch_daily_ohlcv(
         # 避免过度请求服务器
         time.sleep(exchange.rateLimit / 1000)
 
-    if not all_ohlcv:
+    if not all_ohlcv and not len(stored):
         raise RuntimeError("无法获取 OKX 日线数据，请检查网络或代理设置。")
 
-    raw_ohlcv = all_ohlcv
-    df = pd.DataFrame(
-        raw_ohlcv,
-        columns=["timestamp", "open", "high", "low", "close", "volume"],
-    )
+    merged = merge_ohlcv_rows(stored, all_ohlcv)
+    if store_path:
+        save_ohlcv_store(store_path, merged)
+        print(f"K 线请求 {pages} 页，本地存储已更新：{store_path}（共 {len(merged)} 根）")
+
+    raw_ohlcv = merged[merged[:, 0] >= window_start]
+    df = pd.DataFrame(raw_ohlcv, columns=OHLCV_COLUMNS)
+    df["timestamp"] = df["timestamp"].astype("int64")
 
     df = df.drop_duplicates(subset="timestamp")
     df["datetime"] = (
@@ -192,83 +306,50 @@ def fetch_liquidation_aggregates(
     hours: int = 24 * 14,
     proxy_url: Optional[str] = None,
     batch_limit: int = 100,
+    log_dir: str = LIQUIDATION_LOG_DIR,
 ) -> pd.DataFrame:
     """
     Fetch liquidation records from OKX and aggregate by day and position side.
+    成交明细先增量同步到本地爆仓日志（见 okx_liquidations.py），只翻页到上次的水位线。
     """
     cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
     cutoff_ms = int(cutoff.timestamp() * 1000)
+    fills = collect_liquidation_fills(
+        lambda params: make_okx_request(LIQUIDATION_ORDERS_PATH, params, proxy_url=proxy_url),
+        uly,
+        inst_type,
+        cutoff_ms,
+        batch_limit=batch_limit,
+        max_batches=500,
+        log_dir=log_dir,
+    )
     records: list[dict[str, Any]] = []
-    after: Optional[str] = None
-    seen: set[int] = set()
-    max_batches = 500
-    for _ in range(max_batches):
-        params = {
-            "instType": inst_type,
-            "uly": uly,
-            "state": "filled",
-            "limit": str(batch_limit),
+    for detail in fills:
+        ts_int = fill_ts(detail)
+        if ts_int is None:
+            continue
+        pos_side = (detail.get("posSide") or detail.get("side") or "").strip().lower()
+        if pos_side not in {"long", "short"}:
+            continue
+        try:
+            size = float(detail.get("sz", "0"))
+        except (TypeError, ValueError):
+            continue
+        price_raw = detail.get("bkPx")
+        try:
+            price = float(price_raw)
+        except (TypeError, ValueError):
+            price = None
+        notional_usd = size * price if price is not None else None
+        dt = pd.to_datetime(ts_int, unit="ms", utc=True).tz_convert("Asia/Shanghai")
+        record = {
+            "datetime": dt,
+            "pos_side": pos_side,
+            "size": size,
         }
-        if after:
-            params["after"] = after
-        payload = make_okx_request(
-            "/api/v5/public/liquidation-orders",
-            params,
-            proxy_url=proxy_url,
-        )
-        data_entries = payload.get("data", []) if isinstance(payload, dict) else []
-        details: List[Dict[str, Any]] = []
-        for entry in data_entries:
-            entry_details = entry.get("details")
-            if isinstance(entry_details, list):
-                details.extend(entry_details)
-        if not details:
-            break
-        reached_cutoff = False
-        oldest_ts: Optional[int] = None
-        for detail in details:
-            ts_raw = detail.get("ts") or detail.get("time")
-            try:
-                ts_int = int(ts_raw)
-            except (TypeError, ValueError, TypeError):
-                continue
-            if ts_int in seen:
-                continue
-            seen.add(ts_int)
-            if oldest_ts is None or ts_int < oldest_ts:
-                oldest_ts = ts_int
-            if ts_int < cutoff_ms:
-                reached_cutoff = True
-                continue
-            pos_side = (detail.get("posSide") or detail.get("side") or "").strip().lower()
-            if pos_side not in {"long", "short"}:
-                continue
-            try:
-                size = float(detail.get("sz", "0"))
-            except (TypeError, ValueError):
-                continue
-            price_raw = detail.get("bkPx")
-            try:
-                price = float(price_raw)
-            except (TypeError, ValueError):
-                price = None
-            notional_usd = size * price if price is not None else None
-            dt = pd.to_datetime(ts_int, unit="ms", utc=True).tz_convert("Asia/Shanghai")
-            record = {
-                "datetime": dt,
-                "pos_side": pos_side,
-                "size": size,
-            }
-            if notional_usd is not None:
-                record["notional_usd"] = notional_usd
-            records.append(record)
-        if oldest_ts is None:
-            break
-        after = str(oldest_ts - 1)
-        if reached_cutoff:
-            break
-        if len(details) < batch_limit:
-            break
+        if notional_usd is not None:
+            record["notional_usd"] = notional_usd
+        records.append(record)
     if not records:
         return pd.DataFrame(columns=["liquidation_long_usd", "liquidation_short_usd"])
     df = pd.DataFrame(records)
@@ -395,51 +476,143 @@ def add_price_moving_averages(df: pd.DataFrame, windows: Iterable[int]) -> pd.Da
     return df
 
 
-def add_dmi_indicators(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
-    """
-    计算 Directional Movement (DMI) 指标：+DI、-DI、ADX。
-    """
-    high = df["high"]
-    low = df["low"]
-    close = df["close"]
+def _shift_one(values: np.ndarray) -> np.ndarray:
+    shifted = np.empty_like(values)
+    shifted[:1] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
 
-    up_move = high.diff()
-    down_move = -low.diff()
 
-    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
-    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+def _wilder_smooth(columns: List[np.ndarray], period: int) -> List[np.ndarray]:
+    """
+    对同一周期的多列一次性做 Wilder 平滑（ewm alpha=1/period, adjust=False），按输入顺序返回各列结果。
+    输入可以是一维数组，也可以是 N×S 的面板（每列一个交易对），沿时间轴独立平滑。
+    """
+    if not columns:
+        return []
+    stacked = np.column_stack(columns)
+    smoothed = pd.DataFrame(stacked).ewm(alpha=1 / period, adjust=False).mean().to_numpy()
+    return [part.reshape(col.shape) for part, col in zip(np.hsplit(smoothed, len(columns)), columns)]
 
-    tr_components = pd.concat(
-        [
-            high - low,
-            (high - close.shift(1)).abs(),
-            (low - close.shift(1)).abs(),
-        ],
-        axis=1,
-    )
-    tr = tr_components.max(axis=1)
 
-    tr_series = pd.Series(tr, index=df.index)
-    atr = tr_series.ewm(alpha=1 / period, adjust=False).mean()
+def _mask_warmup(values: np.ndarray, rows: int, first_valid: Optional[np.ndarray]) -> None:
+    """
+    将预热期置为 NaN：一维从序列开头计；面板按各交易对首个有效收盘价所在行起算。
+    """
+    if first_valid is None:
+        values[:rows] = np.nan
+    else:
+        values[np.arange(len(values))[:, None] < first_valid + rows] = np.nan
 
-    plus_smoothed = pd.Series(plus_dm, index=df.index).ewm(alpha=1 / period, adjust=False).mean()
-    minus_smoothed = pd.Series(minus_dm, index=df.index).ewm(alpha=1 / period, adjust=False).mean()
-    atr_safe = atr.replace(0, np.nan)
-    plus_di = 100 * plus_smoothed / atr_safe
-    minus_di = 100 * minus_smoothed / atr_safe
 
-    dm_sum = (plus_di + minus_di).replace(0, np.nan)
-    dx = 100 * (plus_di - minus_di).abs() / dm_sum
-    adx = dx.ewm(alpha=1 / period, adjust=False).mean()
+def compute_true_range_family(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    dmi_period: Optional[int] = 14,
+    atr_periods: Iterable[int] = (14,),
+) -> Dict[str, np.ndarray]:
+    """
+    融合计算 TR、ATR、+DM/-DM、+DI/-DI、DX 与 ADX。
+    TR 与 DM 只在连续 float64 数组上计算一次；同一周期需要平滑的列合并为一次 ewm，
+    因此 DMI 的 ATR 与同周期的 ATR 指标共用一次平滑，多个 ATR 周期也不会重复计算 TR。
+    返回列名与 add_dmi_indicators / add_atr_indicator 写入 DataFrame 的列一致。
+    也接受 N×S 面板（每列一个交易对），各交易对独立计算，结果与逐个计算相同。
+    """
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    prev_close = _shift_one(close)
+    first_valid = np.argmax(~np.isnan(close), axis=0) if close.ndim == 2 else None
+
+    # TR 各分量取最大值并忽略 NaN（首根 K 线无前收盘价，TR 即最高减最低）
+    range_hl = high - low
+    gap = np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))
+    tr_dmi = np.fmax(range_hl, gap)
+    tr_atr = tr_dmi if not (range_hl < 0).any() else np.fmax(np.abs(range_hl), gap)
+
+    atr_list = sorted({int(p) for p in atr_periods})
+    periods = sorted(set(atr_list) | ({int(dmi_period)} if dmi_period else set()))
+    result: Dict[str, np.ndarray] = {}
+    plus_dm = minus_dm = None
+    if dmi_period:
+        up_move = high - _shift_one(high)
+        down_move = -(low - _shift_one(low))
+        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+
+    close_safe = np.where(close == 0, np.nan, close)
+    for period in periods:
+        columns: List[np.ndarray] = []
+        slots: Dict[str, int] = {}
+        if period in atr_list:
+            slots["atr"] = len(columns)
+            columns.append(tr_atr)
+        if period == dmi_period:
+            if tr_dmi is tr_atr and "atr" in slots:
+                slots["dmi_atr"] = slots["atr"]
+            else:
+                slots["dmi_atr"] = len(columns)
+                columns.append(tr_dmi)
+            slots["plus"] = len(columns)
+            columns.append(plus_dm)
+            slots["minus"] = len(columns)
+            columns.append(minus_dm)
+        smoothed = _wilder_smooth(columns, period)
+
+        if "atr" in slots:
+            atr = smoothed[slots["atr"]]
+            result[f"atr_{period}"] = atr
+            result[f"atr_pct_{period}"] = (atr / close_safe) * 100
+
+        if "dmi_atr" in slots:
+            atr_safe = smoothed[slots["dmi_atr"]].copy()
+            atr_safe[atr_safe == 0] = np.nan
+            plus_di = 100 * smoothed[slots["plus"]] / atr_safe
+            minus_di = 100 * smoothed[slots["minus"]] / atr_safe
+            dm_sum = plus_di + minus_di
+            dm_sum[dm_sum == 0] = np.nan
+            dx = 100 * np.abs(plus_di - minus_di) / dm_sum
+            adx = _wilder_smooth([dx], period)[0]
+            _mask_warmup(plus_di, period, first_valid)
+            _mask_warmup(minus_di, period, first_valid)
+            _mask_warmup(adx, period * 2, first_valid)
+            result["+di"] = plus_di
+            result["-di"] = minus_di
+            result["adx"] = adx
+    return result
+
+
+def add_volatility_indicators(
+    df: pd.DataFrame,
+    dmi_period: Optional[int] = 14,
+    atr_periods: Iterable[int] = (14,),
+) -> pd.DataFrame:
+    """
+    单次融合计算并写入 DMI（+DI、-DI、ADX）与一个或多个周期的 ATR / ATR%。
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns = compute_true_range_family(
+            df["high"].to_numpy(),
+            df["low"].to_numpy(),
+            df["close"].to_numpy(),
+            dmi_period=dmi_period,
+            atr_periods=atr_periods,
+        )
+    for name in ("+di", "-di", "adx"):
+        if name in columns:
+            df[name] = columns[name]
+    for period in sorted({int(p) for p in atr_periods}):
+        df[f"atr_{period}"] = columns[f"atr_{period}"]
+        df[f"atr_pct_{period}"] = columns[f"atr_pct_{period}"]
+    return df
 
-    plus_di.iloc[:period] = np.nan
-    minus_di.iloc[:period] = np.nan
-    adx.iloc[: period * 2] = np.nan
 
-    df["+di"] = plus_di
-    df["-di"] = minus_di
-    df["adx"] = adx
-    return df
+def add_dmi_indicators(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
+    """
+    计算 Directional Movement (DMI) 指标：+DI、-DI、ADX。
+    """
+    return add_volatility_indicators(df, dmi_period=period, atr_periods=())
 
 
 def add_atr_indicator(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
@@ -447,25 +620,7 @@ def add_atr_indicator(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
     计算 ATR 及 ATR%（ATR / close * 100）。
     使用 Wilder 平滑，与 add_dmi_indicators 中的 ATR 一致。
     """
-    high = df["high"]
-    low = df["low"]
-    close = df["close"]
-    prev_close = close.shift(1)
-
-    tr_components = pd.concat(
-        [
-            (high - low).abs(),
-            (high - prev_close).abs(),
-            (low - prev_close).abs(),
-        ],
-        axis=1,
-    )
-    tr = tr_components.max(axis=1)
-    atr = tr.ewm(alpha=1 / period, adjust=False).mean()
-
-    df[f"atr_{period}"] = atr
-    df[f"atr_pct_{period}"] = (atr / close.replace(0, np.nan)) * 100
-    return df
+    return add_volatility_indicators(df, dmi_period=None, atr_periods=(period,))
 
 
 def add_volume_indicators(df: pd.DataFrame, ma_window: int = 20) -> pd.DataFrame:
@@ -479,18 +634,94 @@ def add_volume_indicators(df: pd.DataFrame, ma_window: int = 20) -> pd.DataFrame
     return df
 
 
+def rolling_rank_pct(values: Iterable[float], window: int, chunk_size: int = 16384) -> np.ndarray:
+    """
+    计算每个位置的值在最近 window 个值（含自身）中的百分位名次，并列取平均名次。
+    与 rolling(window, min_periods=window).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+    逐位一致：窗口不足或含 NaN 时为 NaN。
+    基于 numpy 滑动窗口视图按块向量化比较，不再为每个窗口构造 Series；
+    chunk_size 限制单块临时数组为 chunk_size × window，长历史下内存仍然有界。
+    输入为 N×S 面板时沿时间轴（axis 0）对每列独立计算。
+    """
+    if window < 1:
+        raise ValueError("window 必须为正整数。")
+    arr = np.asarray(values, dtype=np.float64)
+    out = np.full(arr.shape, np.nan)
+    if len(arr) < window:
+        return out
+    windows = sliding_window_view(arr, window, axis=0)
+    for start in range(0, len(windows), chunk_size):
+        block = windows[start : start + chunk_size]
+        last = block[..., -1:]
+        less = (block < last).sum(axis=-1)
+        equal = (block == last).sum(axis=-1)
+        pct = (less + (equal + 1) / 2) / window
+        pct[np.isnan(block).any(axis=-1)] = np.nan
+        out[window - 1 + start : window - 1 + start + len(block)] = pct
+    return out
+
+
 def add_price_percentile(df: pd.DataFrame, window: int = 20) -> pd.DataFrame:
     """
     计算收盘价在近 window 天内的百分位。
     """
-    close = df["close"]
-    percentile = (
-        close.rolling(window=window, min_periods=window).apply(
-            lambda x: pd.Series(x).rank(pct=True).iloc[-1],
-            raw=False,
-        )
-    )
-    df[f"price_percentile_{window}"] = percentile
+    df[f"price_percentile_{window}"] = rolling_rank_pct(df["close"].to_numpy(), window)
+    return df
+
+
+class IndicatorPanel:
+    """
+    (symbol, datetime) 面板的宽表视图：每个字段是 datetime × symbol 的 DataFrame。
+    add_* 指标函数只通过 df["col"] 读写列，宽表上的 rolling / ewm / diff 均按列（即按交易对）独立计算，
+    因此同一组函数一次调用即可覆盖全部交易对，结果与逐个交易对计算一致。
+    各交易对按日期并集对齐，上市较晚的交易对前段为 NaN，拆回时按收盘价非空行还原。
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]) -> None:
+        self.symbols = list(frames)
+        stacked = pd.concat(
+            {symbol: frame[["open", "high", "low", "close", "volume"]] for symbol, frame in frames.items()},
+            axis=1,
+        ).sort_index()
+        self.index = stacked.index
+        self.columns: Dict[str, pd.DataFrame] = {
+            field: stacked.xs(field, axis=1, level=1)[self.symbols] for field in ("open", "high", "low", "close", "volume")
+        }
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        return self.columns[name]
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        if not isinstance(value, pd.DataFrame):
+            value = pd.DataFrame(np.asarray(value), index=self.index, columns=self.symbols)
+        self.columns[name] = value
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        df = pd.DataFrame({name: values[symbol] for name, values in self.columns.items()}, index=self.index)
+        return df[df["close"].notna()].copy()
+
+    def to_long(self) -> pd.DataFrame:
+        """
+        返回以 (symbol, datetime) 为索引的长表。
+        """
+        long = pd.concat({symbol: self.frame(symbol) for symbol in self.symbols}, names=["symbol", "datetime"])
+        return long
+
+
+def add_indicator_set(df: pd.DataFrame, ma_windows: Iterable[int] = DEFAULT_MA_WINDOWS) -> pd.DataFrame:
+    """
+    计算完整的日线指标组合；df 可以是单个交易对的 DataFrame，也可以是 IndicatorPanel。
+    """
+    df = add_bollinger_bands(df)
+    df = add_rsi_indicators(df, periods=[6, 14, 24])
+    df = add_macd_indicators(df)
+    df = add_volatility_indicators(df, dmi_period=14, atr_periods=[14])
+    df = add_price_moving_averages(df, windows=ma_windows)
+    df = add_volume_indicators(df, ma_window=20)
+    df = add_price_percentile(df, window=20)
     return df
 
 
@@ -562,71 +793,117 @@ def compute_signal_info(df: pd.DataFrame) -> Dict[str, Any]:
     }
 
 
-def export_recent_signals(df: pd.DataFrame, path: str = "signals_60d.json", lookback: int = 60) -> None:
+def _json_floats(values: Optional[Iterable[Any]], digits: int, length: int) -> List[Optional[float]]:
+    """
+    整列转换为 JSON 数值：NaN→None，逐值 round(x, digits)（与原逐行写法结果相同）。
+    """
+    if values is None:
+        return [None] * length
+    arr = np.asarray(values, dtype=np.float64)
+    return [None if v != v else round(v, digits) for v in arr.tolist()]
+
+
+def _json_bools(values: Iterable[Any]) -> List[bool]:
+    return np.asarray(values, dtype=bool).tolist()
+
+
+def build_recent_signal_columns(df: pd.DataFrame, lookback: int = 60) -> Dict[str, Any]:
+    """
+    以列数组构建最近 lookback 行的信号数据（struct of arrays），键顺序与 signals_60d.json 每行一致。
+    所有取值按列切片后一次性转换，不再逐行做标签查找。
+    """
     signals = compute_signal_info(df)
-    recent = df.iloc[-lookback:].copy()
-    adx_series = signals.get("adx")
-    plus_di_series = signals.get("+di")
-    minus_di_series = signals.get("-di")
-
-    rows: list[Dict[str, Any]] = []
-    for idx, row in recent.iterrows():
-        ma_status_entry: Dict[str, Dict[str, bool]] = {}
-        for ma_window, status in signals.get("ma_status", {}).items():
-            ma_status_entry[f"ma_{ma_window}"] = {
-                "above": bool(status["above"].loc[idx]),
-                "below": bool(status["below"].loc[idx]),
-                "stood_above_3": bool(status["stood_above_3"].loc[idx]),
-                "fell_below_3": bool(status["fell_below_3"].loc[idx]),
-            }
+    length = len(df.iloc[-lookback:])
+    start = len(df) - length
+
+    def tail(values: Any) -> Optional[np.ndarray]:
+        if values is None:
+            return None
+        return np.asarray(values)[start:]
+
+    def column(name: str) -> Optional[np.ndarray]:
+        return tail(df[name]) if name in df else None
+
+    def stars(values: Any) -> List[int]:
+        arr = np.asarray(tail(values), dtype=np.float64)
+        return [0 if v != v else int(v) for v in arr.tolist()]
+
+    columns: Dict[str, Any] = {
+        "date": df.index[start:].strftime("%Y-%m-%d").tolist(),
+        "close": _json_floats(column("close"), 2, length),
+        "volume": _json_floats(column("volume"), 2, length),
+        "volume_ratio_ma20": _json_floats(tail(signals["volume_ratio"]), 2, length),
+        "price_percentile_20": _json_floats(tail(signals["price_percentile"]), 4, length),
+        "rsi14": _json_floats(column("rsi_14"), 2, length),
+        "bb_lower": _json_floats(column("bb_lower"), 2, length),
+        "bb_lower_slope": _json_floats(column("bb_lower_slope"), 4, length),
+        "atr_pct_14": _json_floats(column("atr_pct_14"), 3, length),
+    }
+    for window in (5, 10, 20, 60, 120, 180):
+        columns[f"ma_{window}"] = _json_floats(column(f"ma_{window}"), 2, length)
+    columns["buy_stars"] = stars(signals["buy_stars"])
+    columns["sell_stars"] = stars(signals["sell_stars"])
+    columns["signals"] = {
+        "rsi_oversold": _json_bools(tail(signals["rsi_oversold"])),
+        "rsi_overbought": _json_bools(tail(signals["rsi_overbought"])),
+        "low_price_high_vol": _json_bools(tail(signals["low_high_mask"])),
+        "high_price_high_vol": _json_bools(tail(signals["high_high_mask"])),
+        "adx_down": _json_bools(tail(signals["adx_down"])),
+        "adx_up": _json_bools(tail(signals["adx_up"])),
+    }
+    for key, name in (("adx_14", "adx"), ("plus_di_14", "+di"), ("minus_di_14", "-di")):
+        series = signals.get(name)
+        columns[key] = _json_floats(tail(series) if isinstance(series, pd.Series) else None, 2, length)
+    columns["ma_status"] = {
+        f"ma_{window}": {flag: _json_bools(tail(values)) for flag, values in status.items()}
+        for window, status in signals.get("ma_status", {}).items()
+    }
+    return columns
 
-        entry: Dict[str, Any] = {
-            "date": idx.strftime("%Y-%m-%d"),
-            "close": round(float(row.get("close", float("nan"))), 2) if not pd.isna(row.get("close")) else None,
-            "volume": round(float(row.get("volume", float("nan"))), 2) if not pd.isna(row.get("volume")) else None,
-            "volume_ratio_ma20": round(float(signals["volume_ratio"].loc[idx]), 2) if signals["volume_ratio"] is not None and not pd.isna(signals["volume_ratio"].loc[idx]) else None,
-            "price_percentile_20": round(float(signals["price_percentile"].loc[idx]), 4) if signals["price_percentile"] is not None and not pd.isna(signals["price_percentile"].loc[idx]) else None,
-            "rsi14": round(float(row.get("rsi_14", float("nan"))), 2) if not pd.isna(row.get("rsi_14")) else None,
-            "bb_lower": round(float(row.get("bb_lower", float("nan"))), 2) if not pd.isna(row.get("bb_lower")) else None,
-            "bb_lower_slope": round(float(row.get("bb_lower_slope", float("nan"))), 4) if not pd.isna(row.get("bb_lower_slope")) else None,
-            "atr_pct_14": round(float(row.get("atr_pct_14", float("nan"))), 3) if not pd.isna(row.get("atr_pct_14")) else None,
-            "ma_5": round(float(row.get("ma_5", float("nan"))), 2) if not pd.isna(row.get("ma_5")) else None,
-            "ma_10": round(float(row.get("ma_10", float("nan"))), 2) if not pd.isna(row.get("ma_10")) else None,
-            "ma_20": round(float(row.get("ma_20", float("nan"))), 2) if not pd.isna(row.get("ma_20")) else None,
-            "ma_60": round(float(row.get("ma_60", float("nan"))), 2) if not pd.isna(row.get("ma_60")) else None,
-            "ma_120": round(float(row.get("ma_120", float("nan"))), 2) if not pd.isna(row.get("ma_120")) else None,
-            "ma_180": round(float(row.get("ma_180", float("nan"))), 2) if not pd.isna(row.get("ma_180")) else None,
-            "buy_stars": int(signals["buy_stars"].loc[idx]) if not pd.isna(signals["buy_stars"].loc[idx]) else 0,
-            "sell_stars": int(signals["sell_stars"].loc[idx]) if not pd.isna(signals["sell_stars"].loc[idx]) else 0,
-            "signals": {
-                "rsi_oversold": bool(signals["rsi_oversold"].loc[idx]),
-                "rsi_overbought": bool(signals["rsi_overbought"].loc[idx]),
-                "low_price_high_vol": bool(signals["low_high_mask"].loc[idx]),
-                "high_price_high_vol": bool(signals["high_high_mask"].loc[idx]),
-                "adx_down": bool(signals["adx_down"].loc[idx]),
-                "adx_up": bool(signals["adx_up"].loc[idx]),
-            },
-            "adx_14": (
-                round(float(adx_series.loc[idx]), 2)
-                if isinstance(adx_series, pd.Series) and idx in adx_series.index and not pd.isna(adx_series.loc[idx])
-                else None
-            ),
-            "plus_di_14": (
-                round(float(plus_di_series.loc[idx]), 2)
-                if isinstance(plus_di_series, pd.Series) and idx in plus_di_series.index and not pd.isna(plus_di_series.loc[idx])
-                else None
-            ),
-            "minus_di_14": (
-                round(float(minus_di_series.loc[idx]), 2)
-                if isinstance(minus_di_series, pd.Series) and idx in minus_di_series.index and not pd.isna(minus_di_series.loc[idx])
-                else None
-            ),
-            "ma_status": ma_status_entry,
-        }
-        rows.append(entry)
+
+def _columns_to_records(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    将列式信号数据转置为逐日记录；嵌套的 signals / ma_status 同样按列 zip 转置。
+    """
+    length = len(columns["date"])
+
+    def transpose(group: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+        if not group:
+            return [{} for _ in range(length)]
+        keys = list(group)
+        return [dict(zip(keys, values)) for values in zip(*group.values())]
+
+    nested: Dict[str, List[Any]] = {"signals": transpose(columns["signals"])}
+    ma_keys = list(columns["ma_status"])
+    ma_rows = [transpose(status) for status in columns["ma_status"].values()]
+    nested["ma_status"] = [dict(zip(ma_keys, values)) for values in zip(*ma_rows)] if ma_rows else [
+        {} for _ in range(length)
+    ]
+    keys = list(columns)
+    series = [nested[key] if key in nested else columns[key] for key in keys]
+    return [dict(zip(keys, values)) for values in zip(*series)]
+
+
+def export_recent_signals(
+    df: pd.DataFrame,
+    path: str = "signals_60d.json",
+    lookback: int = 60,
+    orient: str = "records",
+) -> None:
+    """
+    导出最近 lookback 天的信号。orient="records" 为逐日记录（默认，供模型与前端使用）；
+    orient="columns" 输出列式结构（每个字段一条数组），适合导出数千根 K 线给前端图表。
+    """
+    columns = build_recent_signal_columns(df, lookback=lookback)
+    if orient == "columns":
+        payload: Any = columns
+    elif orient == "records":
+        payload = _columns_to_records(columns)
+    else:
+        raise ValueError(f"未知的 orient：{orient}")
 
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(rows, f, ensure_ascii=False, indent=2)
+        json.dump(payload, f, ensure_ascii=False, indent=2)
 
     print(f"已导出最近 {lookback} 天信号至 {path}")
 
@@ -680,38 +957,68 @@ def export_atr_metrics(
     print(f"已导出 ATR 数据至 {path}（周期 {period}，最近 {lookback} 天）")
 
 
+OI_HISTORY_FIELDS = ("open_interest_usd", "perp_volume_usd")
+LIQUIDATION_HISTORY_FIELDS = (
+    "long_liquidations_usd",
+    "short_liquidations_usd",
+    "long_liquidations_sz",
+    "short_liquidations_sz",
+)
+
+
+def _optional_floats(values: Iterable[Any]) -> List[Optional[float]]:
+    return [float(value) if pd.notna(value) else None for value in values]
+
+
 def export_open_interest_history(
     df: pd.DataFrame,
     path: str = "eth_open_interest_history.json",
     lookback: int = 180,
+    store_path: str = HISTORY_STORE_PATH,
+    symbol: str = "ETH-USDT",
 ) -> None:
     """
     导出开仓量与永续成交额历史。
+    抓取结果先 upsert 到历史库的 "{symbol}:open_interest" 序列（保留全部历史），
+    导出文件取最近 lookback 天，变化率按库中前一日计算。
     """
     if df.empty:
         print("未获取到开仓量历史，跳过导出。")
         return
-    subset = df.sort_index().tail(lookback)
+    subset = df.sort_index()
+    dates = subset.index.strftime("%Y-%m-%d")
+    oi_values = _optional_floats(subset["open_interest_usd"]) if "open_interest_usd" in subset else [None] * len(subset)
+    volume_values = _optional_floats(subset["perp_volume_usd"]) if "perp_volume_usd" in subset else [None] * len(subset)
+    fetched = [
+        {"date": date_str, "open_interest_usd": oi_usd, "perp_volume_usd": volume_usd}
+        for date_str, oi_usd, volume_usd in zip(dates, oi_values, volume_values)
+    ]
+    series = series_name(symbol, "open_interest")
+    with HistoryStore(store_path) as store:
+        store.import_json(series, path, OI_HISTORY_FIELDS)
+        changed = store.upsert(series, fetched, OI_HISTORY_FIELDS)
+        if not changed and os.path.exists(path):
+            print(f"开仓量历史无变化，保留 {path}")
+            return
+        # 多取一天，使窗口第一天的变化率也有前值
+        history = store.query(series, limit=lookback + 1)
+
     rows: List[Dict[str, Any]] = []
-    for idx, row in subset.iterrows():
+    prev_oi: Optional[float] = None
+    for entry in history:
+        oi_usd = entry.get("open_interest_usd")
+        volume_usd = entry.get("perp_volume_usd")
+        change_pct = (oi_usd / prev_oi - 1) * 100 if oi_usd is not None and prev_oi else None
         rows.append(
             {
-                "date": idx.strftime("%Y-%m-%d"),
-                "open_interest_usd": round(float(row.get("open_interest_usd", float("nan"))), 2)
-                if pd.notna(row.get("open_interest_usd"))
-                else None,
-                "perp_volume_usd": round(float(row.get("perp_volume_usd", float("nan"))), 2)
-                if pd.notna(row.get("perp_volume_usd"))
-                else None,
-                "open_interest_usd_change_pct": round(
-                    float(row.get("open_interest_usd_change_pct", float("nan"))), 2
-                )
-                if pd.notna(row.get("open_interest_usd_change_pct"))
-                else None,
+                "date": entry["date"],
+                "open_interest_usd": round(oi_usd, 2) if oi_usd is not None else None,
+                "perp_volume_usd": round(volume_usd, 2) if volume_usd is not None else None,
+                "open_interest_usd_change_pct": round(change_pct, 2) if change_pct is not None else None,
             }
         )
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(rows, f, ensure_ascii=False, indent=2)
+        prev_oi = oi_usd
+    write_json_atomic(rows[-lookback:], path)
     print(f"已导出开仓量历史至 {path}")
 
 
@@ -719,49 +1026,52 @@ def export_liquidation_history(
     df: pd.DataFrame,
     path: str = "eth_liquidations_daily.json",
     lookback: Optional[int] = None,
+    store_path: str = HISTORY_STORE_PATH,
+    symbol: str = "ETH-USDT",
 ) -> None:
     """
-    导出多空爆仓聚合数据，并将新数据与既有历史合并，方便长期观察。
+    导出多空爆仓聚合数据：新数据按日 upsert 到历史库的 "{symbol}:liquidations" 序列，导出文件由库中最近 lookback 天（缺省为全部）生成，方便长期观察。
     """
     if df.empty:
         print("未获取到爆仓数据，跳过导出。")
         return
 
-    # 先读取磁盘上已有的历史，按日期去重
-    history: Dict[str, Dict[str, Any]] = {}
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                existing = json.load(f)
-            if isinstance(existing, list):
-                for entry in existing:
-                    date_str = entry.get("date")
-                    if isinstance(date_str, str) and date_str:
-                        history[date_str] = entry
-        except (OSError, json.JSONDecodeError) as exc:
-            print(f"读取历史爆仓数据失败：{exc}，将覆盖写入新数据。")
-
     subset = df.sort_index()
     if lookback:
         subset = subset.tail(lookback)
 
-    for idx, row in subset.iterrows():
-        date_str = idx.strftime("%Y-%m-%d")
-        history[date_str] = {
+    def column(name: str, digits: int) -> List[Optional[float]]:
+        if name not in subset:
+            return [0.0] * len(subset)
+        return _json_floats(subset[name], digits, len(subset))
+
+    fetched = [
+        {
             "date": date_str,
-            "long_liquidations_usd": round(float(row.get("liquidation_long_usd", 0.0)), 2),
-            "short_liquidations_usd": round(float(row.get("liquidation_short_usd", 0.0)), 2),
-            "long_liquidations_sz": round(float(row.get("liquidation_long_sz", 0.0)), 4),
-            "short_liquidations_sz": round(float(row.get("liquidation_short_sz", 0.0)), 4),
+            "long_liquidations_usd": long_usd,
+            "short_liquidations_usd": short_usd,
+            "long_liquidations_sz": long_sz,
+            "short_liquidations_sz": short_sz,
         }
-
-    sorted_dates = sorted(history.keys())
-    if lookback:
-        sorted_dates = sorted_dates[-lookback:]
-    rows = [history[date_str] for date_str in sorted_dates]
-
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(rows, f, ensure_ascii=False, indent=2)
+        for date_str, long_usd, short_usd, long_sz, short_sz in zip(
+            subset.index.strftime("%Y-%m-%d"),
+            column("liquidation_long_usd", 2),
+            column("liquidation_short_usd", 2),
+            column("liquidation_long_sz", 4),
+            column("liquidation_short_sz", 4),
+        )
+    ]
+    series = series_name(symbol, "liquidations")
+    with HistoryStore(store_path) as store:
+        # 首次使用历史库时导入磁盘上已有的导出文件
+        store.import_json(series, path, LIQUIDATION_HISTORY_FIELDS)
+        changed = store.upsert(series, fetched, LIQUIDATION_HISTORY_FIELDS)
+        if not changed and os.path.exists(path):
+            print(f"爆仓聚合数据无变化，保留 {path}")
+            return
+        rows = store.query(series, limit=lookback, fields=LIQUIDATION_HISTORY_FIELDS)
+
+    write_json_atomic(rows, path)
     print(f"已导出爆仓聚合数据至 {path}")
 
 def plot_price_volume_rsi(
@@ -771,13 +1081,15 @@ def plot_price_volume_rsi(
     ma_windows: Optional[Iterable[int]] = None,
     plot_mas: bool = True,
     atr_period: int = 14,
+    metadata: Optional[Dict[str, str]] = None,
 ) -> None:
     """
     绘制收盘价 + 布林带、成交量、RSI 指标。
-    如传入 output_path，会将图像写入对应文件。
+    如传入 output_path，会将图像写入对应文件；metadata 写入 PNG 文本块。
     """
     if df.empty:
         raise ValueError("No data available for plotting.")
+    plt, mdates, Patch = _require_pyplot()
 
     ma_windows_list = list(ma_windows) if ma_windows is not None else []
 
@@ -1136,7 +1448,7 @@ def plot_price_volume_rsi(
     fig.autofmt_xdate()
     plt.tight_layout()
     if output_path:
-        fig.savefig(output_path, dpi=150)
+        fig.savefig(output_path, dpi=150, metadata=metadata)
     if show:
         plt.show()
     else:
@@ -1149,6 +1461,7 @@ def plot_open_interest_and_liquidations(
     liquidation_df: pd.DataFrame,
     output_path: str = "eth_open_interest_liquidations.png",
     show: bool = False,
+    metadata: Optional[Dict[str, str]] = None,
 ) -> None:
     """
     绘制收盘价叠加开仓量，并在图上注记近期爆仓规模。
@@ -1156,6 +1469,7 @@ def plot_open_interest_and_liquidations(
     if oi_df.empty:
         print("无开仓量数据，跳过开仓量图。")
         return
+    plt = _require_pyplot()[0]
 
     plot_start: Optional[pd.Timestamp] = None
     plot_end: Optional[pd.Timestamp] = None
@@ -1241,72 +1555,302 @@ def plot_open_interest_and_liquidations(
     fig.autofmt_xdate()
     plt.tight_layout()
     if output_path:
-        fig.savefig(output_path, dpi=150)
+        fig.savefig(output_path, dpi=150, metadata=metadata)
     if show:
         plt.show()
     else:
         plt.close(fig)
 
 
-def main() -> None:
-    exchange = build_exchange()
+def _png_text_chunks(path: str) -> Dict[str, str]:
+    """
+    读取 PNG 中位于图像数据之前的 tEXt 块（Matplotlib 将 savefig 的 metadata 写在这里）。
+    """
+    chunks: Dict[str, str] = {}
+    try:
+        with open(path, "rb") as f:
+            if f.read(8) != b"\x89PNG\r\n\x1a\n":
+                return chunks
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                length, kind = struct.unpack(">I4s", header)
+                if kind in (b"IDAT", b"IEND"):
+                    break
+                data = f.read(length)
+                f.seek(4, os.SEEK_CUR)
+                if kind == b"tEXt":
+                    key, _, value = data.partition(b"\x00")
+                    chunks[key.decode("latin-1")] = value.decode("latin-1")
+    except OSError:
+        return {}
+    return chunks
+
+
+def chart_input_hash(plot_name: str, frames: Iterable[pd.DataFrame], params: Dict[str, Any]) -> str:
+    """
+    图表输入指纹：绘图函数名、样式版本、每个输入表的列名与逐行哈希（含索引）以及绘图参数。
+    """
+    digest = hashlib.sha256(f"{plot_name}:{CHART_STYLE_VERSION}".encode("utf-8"))
+    for frame in frames:
+        digest.update(json.dumps([str(c) for c in frame.columns]).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
 
-    df = fetch_daily_ohlcv(exchange)
-    print(f"获取到日线条数: {len(df)}，时间范围: {df.index.min()} ~ {df.index.max()}")
+
+def _render_chart(plot_name: str, args: Tuple[Any, ...], params: Dict[str, Any], output_path: str, digest: str) -> str:
+    """
+    绘图进程入口：按名称调用本模块的绘图函数，并把输入指纹写入 PNG 元数据。
+    """
+    plot = globals()[plot_name]
+    plot(*args, output_path=output_path, show=False, metadata={CHART_HASH_KEY: digest}, **params)
+    return output_path
+
+
+def submit_charts(
+    jobs: Iterable[Tuple[str, Tuple[pd.DataFrame, ...], Dict[str, Any], str]],
+    executor: Optional[Executor] = None,
+) -> Dict[str, Optional[Future]]:
+    """
+    提交绘图任务 (绘图函数名, 输入表, 绘图参数, 输出路径)。
+    已有 PNG 记录的输入指纹与本次一致时直接跳过（返回 None），不重绘也不改写文件；
+    executor 为空时在当前进程内同步绘制。
+    """
+    pending: Dict[str, Optional[Future]] = {}
+    for plot_name, frames, params, output_path in jobs:
+        digest = chart_input_hash(plot_name, frames, params)
+        if _png_text_chunks(output_path).get(CHART_HASH_KEY) == digest:
+            pending[output_path] = None
+            continue
+        if executor is None:
+            future: Future = Future()
+            try:
+                future.set_result(_render_chart(plot_name, frames, params, output_path, digest))
+            except Exception as exc:
+                future.set_exception(exc)
+        else:
+            future = executor.submit(_render_chart, plot_name, frames, params, output_path, digest)
+        pending[output_path] = future
+    return pending
+
+
+def collect_charts(pending: Dict[str, Optional[Future]], timeout: float = CHART_TIMEOUT) -> Dict[str, str]:
+    """
+    等待绘图任务完成（总计不超过 timeout 秒），返回每个输出路径的状态：skipped / rendered / failed / timeout。
+    """
+    status: Dict[str, str] = {}
+    deadline = time.monotonic() + timeout
+    for output_path, future in pending.items():
+        if future is None:
+            status[output_path] = "skipped"
+            print(f"图表输入未变化，跳过绘制：{output_path}")
+            continue
+        try:
+            future.result(timeout=max(0.0, deadline - time.monotonic()))
+            status[output_path] = "rendered"
+            print(f"已绘制图表：{output_path}")
+        except FutureTimeoutError:
+            future.cancel()
+            status[output_path] = "timeout"
+            print(f"图表绘制超过 {timeout:g}s，放弃等待：{output_path}")
+        except Exception as exc:
+            status[output_path] = "failed"
+            print(f"图表绘制失败 {output_path}：{exc}")
+    return status
+
+
+def chart_executor(max_workers: int = CHART_WORKERS) -> Optional[ProcessPoolExecutor]:
+    """
+    绘图进程池。调用方可能在其它线程仍持有锁（HTTP 连接池、SQLite、stdout）时创建进程池，
+    因此不使用 fork，改由 forkserver（不可用时为 spawn）启动干净的子进程；_render_chart 为模块级函数，可按名称导入。
+    """
+    if max_workers <= 1 or not plotting_available():
+        return None
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+
+
+def shutdown_chart_executor(executor: ProcessPoolExecutor, grace: float = 5.0) -> None:
+    """
+    关闭绘图进程池（在 collect_charts 之后调用）：取消未开始的任务，超过 grace 秒仍未退出的绘图进程直接终止。
+    """
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in multiprocessing.active_children():
+        process.join(timeout=grace)
+        if process.is_alive():
+            print(f"绘图进程 {process.pid} 未按时退出，强制终止。")
+            process.terminate()
+
+
+def join_open_interest(df: pd.DataFrame, oi_history: pd.DataFrame, ccy: str) -> pd.DataFrame:
+    df = df.join(oi_history[["open_interest_usd", "perp_volume_usd"]], how="left")
+    df["open_interest_usd_ma_7"] = df["open_interest_usd"].rolling(window=7, min_periods=1).mean()
+    df[f"open_interest_{ccy.lower()}"] = df["open_interest_usd"] / df["close"]
+    return df
+
+
+def _fetch_instrument(
+    exchange: ccxt.okx, ccy: str, proxy_url: Optional[str] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    拉取单个品种的日线（去除未收盘当日）、开仓量历史与 30 天爆仓聚合。
+    开仓量与爆仓失败时返回空表，不影响该品种的指标与信号导出。
+    """
+    df = fetch_daily_ohlcv(exchange, symbol=f"{ccy}/USDT")
     if len(df) > 0:
         df = df.iloc[:-1].copy()
-    print(f"去除未收盘当日后条数: {len(df)}")
-    df = add_bollinger_bands(df)
-    df = add_rsi_indicators(df, periods=[6, 14, 24])
-    df = add_macd_indicators(df)
-    df = add_dmi_indicators(df)
-    df = add_atr_indicator(df, period=14)
-    ma_windows = [5, 10, 20, 60, 120, 180, 200, 250, 360]
-    df = add_price_moving_averages(df, windows=ma_windows)
-    df = add_volume_indicators(df, ma_window=20)
-    df = add_price_percentile(df, window=20)
+    try:
+        oi_history = fetch_open_interest_volume_history(ccy=ccy, limit=180, proxy_url=proxy_url)
+    except (requests.RequestException, RuntimeError, ValueError) as exc:
+        print(f"{ccy} 开仓量历史获取失败：{exc}")
+        oi_history = pd.DataFrame(columns=["open_interest_usd", "perp_volume_usd"])
+    try:
+        liquidation_daily = fetch_liquidation_aggregates(uly=f"{ccy}-USDT", hours=24 * 30, proxy_url=proxy_url)
+    except (requests.RequestException, RuntimeError, ValueError) as exc:
+        print(f"{ccy} 爆仓数据获取失败：{exc}")
+        liquidation_daily = pd.DataFrame(columns=["liquidation_long_usd", "liquidation_short_usd"])
+    return df, oi_history, liquidation_daily
+
+
+def run_batch(
+    symbols: Iterable[str],
+    export_dir: str = BATCH_EXPORT_DIR,
+    max_workers: int = BATCH_MAX_WORKERS,
+    ma_windows: Iterable[int] = DEFAULT_MA_WINDOWS,
+    proxy_url: Optional[str] = None,
+    charts: bool = True,
+) -> Dict[str, pd.DataFrame]:
+    """
+    多品种批量流程：在有界线程池中并发拉取各品种的 K 线、开仓量与爆仓数据，
+    在 (symbol, datetime) 面板上一次计算全部指标，再按品种导出至 export_dir/<品种>/
+    （signals_60d.json、atr_metrics.json、open_interest_history.json、liquidations_daily.json），
+    charts 为真时各品种图表（daily.png、open_interest_liquidations.png）在进程池中与导出并行绘制。
+    单个品种拉取失败时跳过该品种。
+    ccxt 实例按品种各建一个并共享已加载的市场信息，避免跨线程共用同一实例的限速状态。
+    """
+    symbols = [s.upper() for s in symbols]
+    ma_windows = list(ma_windows)
+    base_exchange = build_exchange(proxy_url)
+    base_exchange.load_markets()
+
+    def fetch(ccy: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        exchange = build_exchange(proxy_url)
+        exchange.set_markets(base_exchange.markets, base_exchange.currencies)
+        return _fetch_instrument(exchange, ccy, proxy_url)
+
+    fetched: Dict[str, Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols))), thread_name_prefix="batch") as executor:
+        futures = {ccy: executor.submit(fetch, ccy) for ccy in symbols}
+        for ccy, future in futures.items():
+            try:
+                fetched[ccy] = future.result()
+            except Exception as exc:
+                print(f"{ccy} 数据获取失败，已跳过：{exc}")
+    candles = {ccy: data[0] for ccy, data in fetched.items() if not data[0].empty}
+    if not candles:
+        raise RuntimeError("批量模式下所有品种均未获取到日线数据。")
+
+    panel = add_indicator_set(IndicatorPanel(candles), ma_windows)
+    frames: Dict[str, pd.DataFrame] = {}
+    for ccy in candles:
+        df = panel.frame(ccy)
+        _, oi_history, liquidation_daily = fetched[ccy]
+        if not oi_history.empty:
+            df = join_open_interest(df, oi_history, ccy)
+        if not liquidation_daily.empty:
+            df = df.join(liquidation_daily, how="left")
+        frames[ccy] = df
+
+    executor = chart_executor() if charts else None
+    try:
+        pending: Dict[str, Optional[Future]] = {}
+        if charts and plotting_available():
+            jobs = []
+            for ccy, df in frames.items():
+                out_dir = os.path.join(export_dir, ccy.lower())
+                os.makedirs(out_dir, exist_ok=True)
+                jobs.append(
+                    (
+                        "plot_price_volume_rsi",
+                        (df,),
+                        {"ma_windows": list(ma_windows), "plot_mas": False, "atr_period": 14},
+                        os.path.join(out_dir, "daily.png"),
+                    )
+                )
+                jobs.append(
+                    (
+                        "plot_open_interest_and_liquidations",
+                        (df, fetched[ccy][1], fetched[ccy][2]),
+                        {},
+                        os.path.join(out_dir, "open_interest_liquidations.png"),
+                    )
+                )
+            pending = submit_charts(jobs, executor)
+
+        for ccy, df in frames.items():
+            _, oi_history, liquidation_daily = fetched[ccy]
+            out_dir = os.path.join(export_dir, ccy.lower())
+            os.makedirs(out_dir, exist_ok=True)
+            if not oi_history.empty:
+                export_open_interest_history(
+                    oi_history, path=os.path.join(out_dir, "open_interest_history.json"), symbol=f"{ccy}-USDT"
+                )
+            if not liquidation_daily.empty:
+                export_liquidation_history(
+                    liquidation_daily, path=os.path.join(out_dir, "liquidations_daily.json"), symbol=f"{ccy}-USDT"
+                )
+            export_recent_signals(df, path=os.path.join(out_dir, "signals_60d.json"), lookback=60)
+            export_atr_metrics(df, period=14, lookback=360, path=os.path.join(out_dir, "atr_metrics.json"))
+        collect_charts(pending)
+    finally:
+        if executor is not None:
+            shutdown_chart_executor(executor)
+    return frames
 
-    oi_history = fetch_open_interest_volume_history(limit=180)
-    if oi_history.empty:
-        print("未获取到开仓量历史数据。")
-    else:
-        df = df.join(oi_history[["open_interest_usd", "perp_volume_usd"]], how="left")
-        df["open_interest_usd_ma_7"] = df["open_interest_usd"].rolling(window=7, min_periods=1).mean()
-        df["open_interest_eth"] = df["open_interest_usd"] / df["close"]
-        export_open_interest_history(oi_history)
 
-    liquidation_daily = fetch_liquidation_aggregates(hours=24 * 30)
-    if liquidation_daily.empty:
-        print("未获取到爆仓聚合数据。")
-    else:
-        df = df.join(liquidation_daily, how="left")
-        export_liquidation_history(liquidation_daily)
+def compute_indicators(df: pd.DataFrame, exchange_id: str, ma_windows: Iterable[int] = DEFAULT_MA_WINDOWS) -> pd.DataFrame:
+    """
+    按 INDICATOR_MODE 计算 ETH 日线指标：full 为全量计算，incremental 从 INDICATOR_STATE_DIR 的状态续算。
+    """
+    if INDICATOR_MODE == "incremental":
+        state_prefix = os.path.join(INDICATOR_STATE_DIR, f"{exchange_id}_ETH-USDT_1d")
+        return update_indicator_frame(df, f"{state_prefix}.state.json", f"{state_prefix}.npz")
+    return add_indicator_set(df, ma_windows)
 
-    export_recent_signals(df, lookback=60)
-    # 导出 ATR 指标至 360 天，以满足前端 360 天可视化需求
-    export_atr_metrics(df, period=14, lookback=360, path="atr_metrics.json")
 
-    low_high_mask = ((df["price_percentile_20"] < 0.10) & (df["volume_ratio_ma_20"] > 2.0)).fillna(False)
-    high_high_mask = ((df["price_percentile_20"] > 0.90) & (df["volume_ratio_ma_20"] > 2.0)).fillna(False)
+def daily_chart_jobs(
+    df: pd.DataFrame,
+    oi_history: pd.DataFrame,
+    liquidation_daily: pd.DataFrame,
+    ma_windows: Iterable[int] = DEFAULT_MA_WINDOWS,
+) -> List[Tuple[str, Tuple[Any, ...], Dict[str, Any], str]]:
+    """
+    ETH 日报的两张图（供 submit_charts 使用）。
+    """
+    return [
+        (
+            "plot_price_volume_rsi",
+            (df,),
+            {"ma_windows": list(ma_windows), "plot_mas": False, "atr_period": 14},
+            "eth_okx_daily.png",
+        ),
+        (
+            "plot_open_interest_and_liquidations",
+            (df, oi_history, liquidation_daily),
+            {},
+            "eth_open_interest_liquidations.png",
+        ),
+    ]
 
-    if plt is not None:
-        plot_price_volume_rsi(
-            df,
-            output_path="eth_okx_daily.png",
-            ma_windows=ma_windows,
-            plot_mas=False,
-            atr_period=14,
-        )
 
-        plot_open_interest_and_liquidations(
-            df,
-            oi_df=oi_history,
-            liquidation_df=liquidation_daily,
-            output_path="eth_open_interest_liquidations.png",
-            show=False,
-        )
-    else:
-        print("跳过绘图：Matplotlib/Numpy 未安装或未正确加载。")
+def print_volume_summary(df: pd.DataFrame) -> None:
+    """
+    打印最新交易日的量能、布林带斜率与放量信号计数。
+    """
+    low_high_mask = ((df["price_percentile_20"] < 0.10) & (df["volume_ratio_ma_20"] > 2.0)).fillna(False)
+    high_high_mask = ((df["price_percentile_20"] > 0.90) & (df["volume_ratio_ma_20"] > 2.0)).fillna(False)
 
     latest = df.dropna(subset=["close", "volume", "volume_ma_20", "prev_volume_ratio_ma_20"]).iloc[-1]
     prev_ratio = latest["prev_volume_ratio_ma_20"]
@@ -1323,5 +1867,67 @@ def main() -> None:
     print("高位放量信号数量:", int(high_high_mask.sum()))
 
 
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="拉取 OKX 日线与衍生品数据，计算指标并导出 JSON / 图表。")
+    parser.add_argument("--data-only", action="store_true", default=DATA_ONLY, help="只导出数据，不绘图（不导入 matplotlib）")
+    args = parser.parse_args(argv)
+    charts = not args.data_only
+
+    if BATCH_SYMBOLS:
+        frames = run_batch(BATCH_SYMBOLS, charts=charts)
+        for ccy, df in frames.items():
+            print(f"{ccy}: {len(df)} 根日线，最新收盘 {df['close'].iloc[-1]:,.4f}（{df.index[-1]:%Y-%m-%d}）")
+        okx_stats = format_okx_stats()
+        if okx_stats:
+            print(okx_stats)
+        return
+
+    exchange = build_exchange()
+
+    df = fetch_daily_ohlcv(exchange)
+    print(f"获取到日线条数: {len(df)}，时间范围: {df.index.min()} ~ {df.index.max()}")
+    if len(df) > 0:
+        df = df.iloc[:-1].copy()
+    print(f"去除未收盘当日后条数: {len(df)}")
+    ma_windows = DEFAULT_MA_WINDOWS
+    df = compute_indicators(df, exchange.id, ma_windows)
+
+    oi_history = fetch_open_interest_volume_history(limit=180)
+    if oi_history.empty:
+        print("未获取到开仓量历史数据。")
+    else:
+        df = join_open_interest(df, oi_history, "ETH")
+        export_open_interest_history(oi_history)
+
+    liquidation_daily = fetch_liquidation_aggregates(hours=24 * 30)
+    if liquidation_daily.empty:
+        print("未获取到爆仓聚合数据。")
+    else:
+        df = df.join(liquidation_daily, how="left")
+        export_liquidation_history(liquidation_daily)
+
+    # 图表在进程池中与 JSON 导出并行绘制，输入未变化的图表直接跳过
+    executor = chart_executor() if charts else None
+    try:
+        pending: Dict[str, Optional[Future]] = {}
+        if charts and plotting_available():
+            pending = submit_charts(daily_chart_jobs(df, oi_history, liquidation_daily, ma_windows), executor)
+        elif charts:
+            print("跳过绘图：Matplotlib/Numpy 未安装或未正确加载。")
+
+        export_recent_signals(df, lookback=60)
+        # 导出 ATR 指标至 360 天，以满足前端 360 天可视化需求
+        export_atr_metrics(df, period=14, lookback=360, path="atr_metrics.json")
+        collect_charts(pending)
+    finally:
+        if executor is not None:
+            shutdown_chart_executor(executor)
+
+    print_volume_summary(df)
+    okx_stats = format_okx_stats()
+    if okx_stats:
+        print(okx_stats)
+
+
 if __name__ == "__main__":
     main()